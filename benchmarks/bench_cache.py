@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+## Checks cachedOpen() against a local HTTP server instead of corona.help, in a temporary cache directory
+## The server serves the saved page twice: '/etag' with an ETag (and answers If-None-Match with 304),
+## '/plain' without ETag or Last-Modified. It counts the requests, so it can be checked that a page
+## within httpcache_ttl doesn't reach the server, that an expired one is revalidated with a 304 and read
+## from the cache, and that a page without validators is cached until the TTL as well.
+## Also reports how long a fetch takes in each of those cases.
+## Usage: python3 benchmarks/bench_cache.py [rounds]
+
+import http.server
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import dashboard
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'corona.help.html'), 'rb') as pagefile:
+    page = pagefile.read()
+etag = '"corona-1"'
+requests = [] ## (path, status) of every request the server answered
+
+class PageHandler(http.server.BaseHTTPRequestHandler):
+    '''PageHandler: Documentation
+    Stands in for corona.help: GET /etag and GET /plain'''
+    def do_GET(self):
+        if self.path == '/etag' and self.headers.get('If-None-Match') == etag:
+            requests.append((self.path, 304))
+            self.send_response(304)
+            self.end_headers()
+            return
+        requests.append((self.path, 200))
+        self.send_response(200)
+        if self.path == '/etag':
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+    def log_message(self, *args):
+        pass
+
+def fetch(url):
+    '''fetch(url): Documentation
+    Reads url through cachedOpen() like collectCorona() does, returns (body, milliseconds it took)'''
+    start = time.perf_counter()
+    with dashboard.cachedOpen(url) as response:
+        body = response.read()
+    return body, (time.perf_counter() - start) * 1000
+
+def expire():
+    '''expire(): Documentation
+    Lets the TTL of everything in the cache pass, by moving back its last check'''
+    for name in os.listdir(dashboard.httpcache_dir):
+        if name.endswith('.json'):
+            metapath = os.path.join(dashboard.httpcache_dir, name)
+            with open(metapath) as metafile:
+                meta = json.load(metafile)
+            meta['checked'] -= dashboard.httpcache_ttl + 1
+            dashboard.writeCacheMeta(metapath, meta)
+
+def check(url, path, rounds):
+    '''check(url, path, rounds): Documentation
+    Runs the cases on one page and asserts what reached the server, returns the median ms per case'''
+    times = {'download': [], 'TTL hit': [], 'revalidate': []}
+    for _ in range(rounds):
+        for name in os.listdir(dashboard.httpcache_dir):
+            os.remove(os.path.join(dashboard.httpcache_dir, name))
+        del requests[:]
+        body, took = fetch(url)
+        assert body == page and requests == [(path, 200)], "First fetch of {}: {}".format(path, requests)
+        times['download'].append(took)
+        body, took = fetch(url)
+        assert body == page and len(requests) == 1, "Within the TTL {} reached the server: {}".format(path, requests)
+        times['TTL hit'].append(took)
+        expire()
+        body, took = fetch(url)
+        expected = (path, 304) if path == '/etag' else (path, 200)
+        assert body == page and requests[1:] == [expected], "After the TTL {}: {}".format(path, requests)
+        times['revalidate'].append(took)
+    return {name: sorted(values)[len(values) // 2] for name, values in times.items()}
+
+if __name__ == '__main__':
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    with tempfile.TemporaryDirectory() as cachedir:
+        dashboard.httpcache_dir = cachedir
+        print("Server:     {}, page of {} KiB, cache in {}".format(base, len(page) // 1024, cachedir))
+        for path in ('/etag', '/plain'):
+            times = check(base + path, path, rounds)
+            print("{:<11} download {download:6.2f} ms  TTL hit {TTL hit:6.2f} ms  after the TTL {revalidate:6.2f} ms".format(path, **times))
+    server.shutdown()
@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+## Measures the per-tick cost of the updateOften() collectors
+## Compares the old way (forking 'uptime -p', 'ps -A' and 'free -t -m') with the
+## /proc readers in dashboard.py (procRead() and friends)
+## Usage: python3 benchmarks/bench_collectors.py [ticks]
+
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import dashboard
+
+def legacyTick():
+    '''legacyTick(): Documentation
+    The uptime, processes and memory part of updateOften() as it was before V0.10'''
+    uptime = subprocess.run(['uptime', '-p'], stdout=subprocess.PIPE)
+    uptime = uptime.stdout.decode('utf-8').strip()[3:]
+    processlist = subprocess.run(['ps', '-A'], stdout=subprocess.PIPE)
+    processes = len(processlist.stdout.decode('utf-8').split('\n')) - 1
+    total_mem, used_mem = map(int, os.popen('free -t -m').readlines()[1].split()[1:3])
+    return uptime, processes, total_mem, used_mem
+
+def procTick():
+    '''procTick(): Documentation
+    The same values, read through the collectors in dashboard.py'''
+    uptime = dashboard.readUptime()
+    processes = dashboard.scanProcesses()
+    total_mem, used_mem = dashboard.readMeminfo()
+    dashboard.readLoadavg()
+    return uptime, processes, total_mem, used_mem
+
+def measure(tick, ticks):
+    '''measure(tick, ticks): Documentation
+    Runs tick() ticks times, returns (wall ms per tick, cpu ms per tick)
+    CPU time includes the children, so the forked commands are counted too'''
+    before = os.times()
+    start = time.perf_counter()
+    for _ in range(ticks):
+        tick()
+    wall = time.perf_counter() - start
+    after = os.times()
+    cpu = sum(after[:4]) - sum(before[:4])
+    return wall * 1000 / ticks, cpu * 1000 / ticks
+
+if __name__ == '__main__':
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print("Old:  ", legacyTick())
+    print("New:  ", procTick())
+    for name, tick in (('subprocess', legacyTick), ('/proc', procTick)):
+        wall, cpu = measure(tick, ticks)
+        print("{:<11} {:8.3f} ms wall  {:8.3f} ms cpu  per tick ({} ticks)".format(name, wall, cpu, ticks))
@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+## Compares the corona.help parsers on a saved copy of the page
+## The old one is the line-by-line loop of updateSemiOften() before V0.10, which reads the whole page,
+## splits it into lines and walks every <td> one character at a time. The new one is parseCorona().
+## Usage: python3 benchmarks/bench_corona.py [page.html] [rounds]
+## fixtures/corona.help.html is a reconstruction of the page as it looked in March 2020.
+
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import dashboard
+
+def legacyParse(stream):
+    '''legacyParse(stream): Documentation
+    The corona part of updateSemiOften() as it was before V0.10, returns its coronainfo'''
+    coronainfo = {}
+    html = stream.read()
+    html = html.decode('utf-8').split('\n')
+
+    lookNext = False
+    lookAfterNext = False
+    foundInfected = False
+    foundDeathcount = False
+    firstRound = True
+    foundChina = False
+    country_string = ""
+    for line in html:
+        try:
+            if lookNext == True:
+                lookNext = False
+                line = line.strip()
+                if line[:23] == '<td class="text-right">':
+                    i = 23
+                    number_string = ""
+                    while True:
+                        if line[i] != '<':
+                            number_string += line[i]
+                            i += 1
+                        else:
+                            break
+                    if country_string == 'Mainland China':
+                        if not foundChina:
+                            foundChina = True
+                            coronainfo['cn_inf'] = number_string
+                        else:
+                            firstRound = False
+                            coronainfo['cn_dead'] = number_string
+                    elif country_string == 'Italy':
+                        if firstRound:
+                            coronainfo['it_inf'] = number_string
+                        else:
+                            coronainfo['it_dead'] = number_string
+                    elif country_string == 'Netherlands':
+                        if firstRound:
+                            coronainfo['nl_inf'] = number_string
+                        else:
+                            coronainfo['nl_dead'] = number_string
+
+            elif lookAfterNext == True:
+                lookAfterNext = False
+                lookNext = True
+
+            elif line.strip()[:6] == '<td><a':
+                i = line.replace('>', '-', 1).find('>') + 1
+                country_string = ""
+                while True:
+                    if line[i] != '<':
+                        country_string += line[i]
+                        i += 1
+                    else:
+                        break
+                if country_string in ('Mainland China', 'Italy', 'Netherlands'):
+                    lookAfterNext = True
+            elif line.strip()[:4] == '<h1>':
+                number_string = ""
+                line = line.strip()
+                i = 4
+                while True:
+                    if line[i] != '<':
+                        number_string += line[i]
+                        i += 1
+                    else:
+                        break
+                if not foundInfected:
+                    foundInfected = True
+                    coronainfo['world_inf'] = number_string
+                else:
+                    if not foundDeathcount:
+                        foundDeathcount = True
+                        coronainfo['world_dead'] = number_string
+        except Exception as e:
+            pass
+    return coronainfo
+
+def streamParse(stream):
+    '''streamParse(stream): Documentation
+    parseCorona(), with its result put in coronainfo keys like collectCorona() does'''
+    parser = dashboard.parseCorona(stream)
+    coronainfo = {}
+    coronainfo['world_inf'], coronainfo['world_dead'] = parser.world
+    for country, key, label in dashboard.countries:
+        if country in parser.countries:
+            coronainfo[key + '_inf'], coronainfo[key + '_dead'] = parser.countries[country]
+    return coronainfo
+
+def measure(parse, page, rounds):
+    '''measure(parse, page, rounds): Documentation
+    Returns (best time in ms, peak traced memory in KiB) of parse() on the page.
+    The page is read from a file object in both cases, like it's read from the HTTP response.'''
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        parse(io.BufferedReader(io.BytesIO(page)))
+        took = time.perf_counter() - start
+        if best is None or took < best:
+            best = took
+    stream = io.BufferedReader(io.BytesIO(page)) # Created before tracing, the page itself isn't counted
+    tracemalloc.start()
+    parse(stream)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best * 1000, peak / 1024
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'corona.help.html')
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with open(path, 'rb') as pagefile:
+        page = pagefile.read()
+    print("Page: {} ({} KiB)".format(path, len(page) // 1024))
+    for name, parse in (('line loop', legacyParse), ('streaming', streamParse)):
+        print("{:<10} {}".format(name, sorted(parse(io.BytesIO(page)).items())))
+    for name, parse in (('line loop', legacyParse), ('streaming', streamParse)):
+        took, peak = measure(parse, page, rounds)
+        print("{:<10} {:8.2f} ms  {:8.1f} KiB peak".format(name, took, peak))
@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+## Simulates a fleet of agents sending to one aggregator, all on the local machine
+## Every simulated agent sends packSnapshots() packets over UDP to a FleetProtocol on one asyncio loop,
+## like agentLoop() and aggregatorLoop() do, but without waiting for real intervals.
+## Reports how many packets were handled and dropped, the CPU time per packet on the aggregator side,
+## the memory per agent and the cost of building a page of the table, and all of it, with fleetRows().
+## Usage: python3 benchmarks/bench_fleet.py [agents] [rounds]
+
+import asyncio
+import os
+import socket
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import dashboard
+import stubs
+
+def simulatedPacket(agent, round):
+    '''simulatedPacket(agent, round): Documentation
+    A packet like agentLoop() sends, with fleet_batch made up records for agent number agent'''
+    records = []
+    for sample in range(dashboard.fleet_batch):
+        tick = round * dashboard.fleet_batch + sample
+        records.append((time.time(), [40 + agent % 30 + tick % 5, 30.0 + agent % 50, 100 + agent % 40,
+                                      (tick % 10) / 10, 70.0, 5.0 + agent % 20]))
+    return dashboard.packSnapshots('sim-{:04d}'.format(agent), records)
+
+async def simulate(agents, rounds):
+    '''simulate(agents, rounds): Documentation
+    Sends rounds packets from every one of agents simulated agents, returns (protocol, nodes, cpu seconds, sent)'''
+    loop = asyncio.get_running_loop()
+    nodes = {}
+    transport, protocol = await loop.create_datagram_endpoint(lambda: dashboard.FleetProtocol(nodes), local_addr=('127.0.0.1', 0))
+    address = transport.get_extra_info('sockname')
+    senders = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(min(agents, 64))]
+    sent = 0
+    start = time.process_time()
+    for round in range(rounds):
+        for agent in range(agents):
+            senders[agent % len(senders)].sendto(simulatedPacket(agent, round), address)
+            sent += 1
+            ## Real agents don't all send at the same moment, and the transport reads one datagram per loop iteration
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.01)
+    ## Wait until everything that made it is received
+    waited = 0
+    while protocol.received + protocol.dropped < sent and waited < 100:
+        await asyncio.sleep(0.01)
+        waited += 1
+    cpu = time.process_time() - start
+    transport.close()
+    for sender in senders:
+        sender.close()
+    return protocol, nodes, cpu, sent
+
+if __name__ == '__main__':
+    agents = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print("Packet size: {} bytes ({} records)".format(len(simulatedPacket(0, 0)), dashboard.fleet_batch))
+
+    tracemalloc.start()
+    protocol, nodes, cpu, sent = asyncio.run(simulate(agents, rounds))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("Agents:     {} ({} kept)".format(agents, len(nodes)))
+    print("Packets:    {} sent, {} received, {} dropped, {} lost by the socket".format(sent, protocol.received, protocol.dropped, sent - protocol.received - protocol.dropped))
+    print("CPU:        {:.1f} us per packet, sending included".format(cpu * 1e6 / sent))
+    print("Memory:     {:.0f} bytes per agent ({} KiB for all of them, {} KiB peak)".format(current / max(1, len(nodes)), current // 1024, peak // 1024))
+
+    ## fleetRows() picks colours, which curses only hands out after initscr(), there's no screen here
+    stubs.installHeadlessCurses()
+    for first, count in ((0, 33), (0, None)):
+        start = time.perf_counter()
+        for _ in range(10):
+            rows = dashboard.fleetRows(nodes, first, count)
+        print("fleetRows(): {:.2f} ms for {} rows".format((time.perf_counter() - start) * 100, len(rows)))
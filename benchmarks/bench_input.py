@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+## Measures how fast the main loop of main() wakes up, with the InputWaiter it sleeps in
+## A pipe stands in for stdin: a thread writes a 'key' into it, or calls wake() like a finished job does (jobnotify),
+## and the time until wait() returns is measured. Also reports the CPU time the loop uses while nothing happens.
+## Usage: python3 benchmarks/bench_input.py [rounds]
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import dashboard
+
+def latencies(waiter, trigger, rounds, handled=None):
+    '''latencies(waiter, trigger, rounds, handled=None): Documentation
+    Calls trigger() on another thread rounds times, a few ms after the loop started waiting,
+    returns the sorted times in microseconds from the call until wait() returned.
+    handled() is called after every round, like the main loop reading the key.'''
+    times = []
+    for _ in range(rounds):
+        sent = []
+        thread = threading.Timer(0.002, lambda: (sent.append(time.perf_counter()), trigger()))
+        thread.start()
+        waiter.wait(1)
+        times.append((time.perf_counter() - sent[0]) * 1e6)
+        thread.join()
+        if handled != None:
+            handled()
+    return sorted(times)
+
+if __name__ == '__main__':
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    keyboard, typing = os.pipe()
+    waiter = dashboard.InputWaiter(keyboard)
+
+    def typeKey():
+        os.write(typing, b'h')
+
+    def readKey():
+        os.read(keyboard, 1) ## wait() leaves the keys for getkey()
+
+    for name, trigger, handled in (('key press', typeKey, readKey), ('wake()', waiter.wake, None)):
+        times = latencies(waiter, trigger, rounds, handled)
+        print("{:<10} p50 {:>6.0f} us  p99 {:>6.0f} us  max {:>6.0f} us".format(name, times[len(times) // 2], times[int(len(times) * 0.99)], times[-1]))
+
+    start = time.process_time()
+    began = time.monotonic()
+    waiter.wait(2)
+    print("Idle:      {:.2f} ms CPU while waiting {:.1f} s".format((time.process_time() - start) * 1000, time.monotonic() - began))
@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+## Measures ProcessTable.scan() on a fake /proc with many processes that keep starting and exiting
+## Every tick a part of the processes exits and new ones start (some of them reusing a PID), and the
+## others use some CPU. Reports the CPU time per scan next to process_budget, how many stat files a scan
+## got to, and whether the table stays as big as the amount of processes (no entries of exited processes left).
+## Usage: python3 benchmarks/bench_processes.py [processes] [ticks] [churn per tick] [budget in ms]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import dashboard
+import stubs
+
+if __name__ == '__main__':
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    churn = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    if len(sys.argv) > 4:
+        dashboard.process_budget = float(sys.argv[4]) / 1000
+    stubdir = stubs.installStubs()
+    try:
+        proc = dashboard.proc_root
+        running = {pid: 0 for pid in range(1, stubs.processes + 1)}
+        nextpid = stubs.processes + 1
+        while len(running) < processes:
+            running[nextpid] = 0
+            stubs.writeStat(proc, nextpid, 'worker-{}'.format(nextpid), 0)
+            nextpid += 1
+        table = dashboard.ProcessTable()
+        random.seed(1)
+        cpu = []
+        read = []
+        for tick in range(ticks):
+            ## Churn: some processes exit, as many start, a few of them on a PID that was just freed
+            for pid in random.sample(sorted(running), churn):
+                del running[pid]
+                stubs.shutil.rmtree(os.path.join(proc, str(pid)))
+            for _ in range(churn):
+                pid = nextpid if random.random() < 0.8 or len(running) == 0 else max(running) + 1
+                nextpid = max(nextpid, pid) + 1
+                running[pid] = 0
+                stubs.writeStat(proc, pid, 'worker-{}'.format(pid), 0, starttime=100 + tick)
+            for pid in random.sample(sorted(running), processes // 10):
+                running[pid] += random.randint(1, 50)
+                stubs.writeStat(proc, pid, 'worker-{}'.format(pid), running[pid])
+            start = time.thread_time()
+            table.scan()
+            cpu.append(time.thread_time() - start)
+            read.append(table.lastread)
+            assert table.count == len(running), (table.count, len(running))
+            assert len(table.entries) <= len(running), (len(table.entries), len(running))
+        cpu.sort()
+        print("Processes:  {} ({} exit and start per tick, {} ticks)".format(processes, churn, ticks))
+        print("CPU/scan:   {:.2f} ms median, {:.2f} ms max, budget {:.1f} ms for the stat files".format(cpu[len(cpu) // 2] * 1000, cpu[-1] * 1000, dashboard.process_budget * 1000))
+        print("Read/scan:  {:.0f} stat files on average, {} entries in the table at the end".format(sum(read) / len(read), len(table.entries)))
+    finally:
+        stubs.removeStubs(stubdir)
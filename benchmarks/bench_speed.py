@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+## Runs the built-in speed test (collectSpeed()) against a local HTTP server instead of the internet
+## The server answers '/down?bytes=N' with N bytes and takes any POST to '/up', optionally throttled to a rate,
+## so the result can be checked against a known speed, it fails when the upload or download comes out faster than that.
+## Also reports the memory allocated during a run (it should not
+## grow with the amount of bytes) and how quickly cancelSpeed() stops a test that would otherwise take the full budget.
+## Usage: python3 benchmarks/bench_speed.py [megabit/s, 0 for unthrottled] [megabytes per direction]
+
+import http.server
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import dashboard
+
+chunk = bytes(64 * 1024)
+rate = 0 ## Bytes per second the server sends and receives at, 0 for as fast as it can
+
+class SpeedHandler(http.server.BaseHTTPRequestHandler):
+    '''SpeedHandler: Documentation
+    Stands in for the speed test server: GET /down?bytes=N and POST /up'''
+    protocol_version = 'HTTP/1.1'
+
+    def throttle(self, start, done):
+        if rate:
+            time.sleep(max(0, start + done / rate - time.monotonic()))
+
+    def do_GET(self):
+        size = int(self.path.split('bytes=')[1]) if 'bytes=' in self.path else 0
+        self.send_response(200)
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        start = time.monotonic()
+        sent = 0
+        try:
+            while sent < size:
+                part = chunk[:min(len(chunk), size - sent)]
+                self.wfile.write(part)
+                sent += len(part)
+                self.throttle(start, sent)
+        except OSError:
+            pass ## The client stopped reading, like it does when its time is up
+
+    def do_POST(self):
+        ## speedTransfer() uploads a row of POSTs on one connection, each with a Content-Length
+        size = int(self.headers.get('Content-Length', 0))
+        start = time.monotonic()
+        received = 0
+        while received < size:
+            part = self.rfile.read(min(len(chunk), size - received))
+            if not part:
+                return ## The client stopped sending
+            received += len(part)
+            self.throttle(start, received)
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+def checkSpeed(values, limit):
+    '''checkSpeed(values, limit): Documentation
+    Fails when the download or upload speed in values is more than 5% above limit (bits per second)'''
+    for key in ('speed_down', 'speed_up'):
+        speed = float(values[key].split()[0]) * 1e6
+        assert speed <= limit * 1.05, "{} is {}, the server does {:.2f} Mbit/s".format(key, values[key], limit / 1e6)
+
+def run():
+    '''run(): Documentation
+    One speed test, returns (values, seconds it took)'''
+    start = time.monotonic()
+    values = dashboard.collectSpeed()
+    return values, time.monotonic() - start
+
+if __name__ == '__main__':
+    rate = float(sys.argv[1]) * 1e6 / 8 if len(sys.argv) > 1 else 80e6 / 8
+    dashboard.speed_bytes = int(float(sys.argv[2]) * 1024 * 1024) if len(sys.argv) > 2 else 8 * 1024 * 1024
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), SpeedHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    dashboard.speed_download_url = base + '/down?bytes={bytes}'
+    dashboard.speed_upload_url = base + '/up'
+    print("Server:     {}, {}".format(base, "{:.0f} Mbit/s".format(rate * 8 / 1e6) if rate else "unthrottled"))
+
+    values, seconds = run()
+    print("Result:     down {speed_down}, up {speed_up}, ping {ping} in {0:.2f} s".format(seconds, **values))
+    if rate:
+        checkSpeed(values, rate * 8)
+        ## With less time than it takes, the upload is ended early, what's still on its way mustn't count
+        budget = dashboard.speed_seconds
+        dashboard.speed_seconds = dashboard.speed_bytes / rate / 2
+        values, seconds = run()
+        dashboard.speed_seconds = budget
+        print("Cut short:  down {speed_down}, up {speed_up} in {0:.2f} s".format(seconds, **values))
+        checkSpeed(values, rate * 8)
+        ## Neither direction may wait past its budget for an answer, plus a bit for the connects
+        assert seconds <= 2 * dashboard.speed_bytes / rate / 2 + 1, "Cut short test took {:.2f} s".format(seconds)
+
+    tracemalloc.start()
+    run()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("Memory:     {} KiB peak for {} MiB each way".format(peak // 1024, dashboard.speed_bytes // 1048576))
+
+    ## Limited to 1 Mbit/s, a test would take the full speed_seconds, cancel it after half a second
+    rate = 1e6 / 8
+    threading.Timer(0.5, dashboard.cancelSpeed).start()
+    values, seconds = run()
+    print("Cancelled:  after {:.2f} s, down {speed_down}, up {speed_up} (budget {} s per direction)".format(seconds, dashboard.speed_seconds, **values))
+    server.shutdown()
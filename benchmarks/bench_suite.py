@@ -0,0 +1,169 @@
+#!/usr/bin/python3
+## Times every part of a dashboard tick on its own, against the stand-ins of stubs.py
+## The collectors read the fake /proc and run the fake commands, the corona parser reads the saved page
+## and the drawing functions draw on a HeadlessWindow. For every case the latency percentiles are measured,
+## and in a second (slower) pass the memory it allocates, under tracemalloc.
+## The results are saved as JSON, with --compare the results of another run (an older version) are shown next to them.
+## A run is labelled with 'git describe' of the tree it ran on (or --label), so runs of the same version can be told apart.
+## Usage: python3 benchmarks/bench_suite.py [--rounds N] [--label name] [--output results.json] [--compare old.json] [case ...]
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import dashboard
+import stubs
+
+resultsdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+def makeCases(window):
+    '''makeCases(window): Documentation
+    Returns the benchmark cases as a dict of name: function without arguments, in the order they're run'''
+    with open(os.path.join(stubs.fixtures, 'corona.help.html'), 'rb') as pagefile:
+        page = pagefile.read()
+
+    def dataWriterAll():
+        dashboard.forgetFields() ## Like after a clear, so every field is written
+        dashboard.dataWriter(window, updateall=True)
+
+    def collectUpdatesCold():
+        dashboard.aptindexes.clear() ## Like after apt downloaded new lists, every file is parsed again
+        dashboard.collectUpdates()
+
+    def drawChrome():
+        dashboard.chromelayer = None ## The first draw, after this uiDrawer() only copies the pad
+        dashboard.uiDrawer(window)
+
+    return {'updateOften': dashboard.updateOften,
+            'scanProcesses': dashboard.scanProcesses,
+            'collectNetwork': dashboard.collectNetwork,
+            'collectUpdates': dashboard.collectUpdates,
+            'collectUpdates(cold)': collectUpdatesCold,
+            'parseCorona': lambda: dashboard.parseCorona(io.BytesIO(page)),
+            'dataWriter': lambda: dashboard.dataWriter(window),
+            'dataWriter(updateall)': dataWriterAll,
+            'uiDrawer': lambda: dashboard.uiDrawer(window),
+            'uiDrawer(first)': drawChrome}
+
+def percentile(ordered, fraction):
+    '''percentile(ordered, fraction): Documentation
+    The value at fraction (0-1) of a sorted list, without interpolating'''
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def measure(function, rounds):
+    '''measure(function, rounds): Documentation
+    Runs function rounds times (after a few runs to warm up) and returns its latency statistics in microseconds'''
+    for _ in range(min(rounds, 5)):
+        function()
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter_ns()
+        function()
+        times.append(time.perf_counter_ns() - start)
+    times.sort()
+    return {'rounds': rounds,
+            'mean_us': sum(times) / len(times) / 1000,
+            'p50_us': percentile(times, 0.50) / 1000,
+            'p90_us': percentile(times, 0.90) / 1000,
+            'p99_us': percentile(times, 0.99) / 1000,
+            'max_us': times[-1] / 1000}
+
+def allocations(function, rounds):
+    '''allocations(function, rounds): Documentation
+    Runs function rounds times under tracemalloc, returns the peak memory of a call
+    and the memory that's still allocated after all of them, per call, in bytes'''
+    function()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    peak = 0
+    for _ in range(rounds):
+        start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        function()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - start)
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return {'alloc_peak_bytes': peak, 'retained_bytes_per_call': retained / rounds}
+
+def gitLabel():
+    '''gitLabel(): Documentation
+    Returns 'git describe' of the tree dashboard.py is in (the commit hash when there are no tags, with -dirty
+    for uncommitted changes), or the version of dashboard.py when that isn't a git checkout'''
+    try:
+        describe = subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=os.path.dirname(os.path.abspath(dashboard.__file__)),
+                                  stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+    except OSError:
+        return dashboard.__version__
+    return describe.stdout.strip() if describe.returncode == 0 and describe.stdout.strip() else dashboard.__version__
+
+def compare(results, old):
+    '''compare(results, old): Documentation
+    Prints the p50 and p99 of this run next to those of an older run, with the change in percent'''
+    print("\n{:<22} {:>21} {:>21}".format('Compared with ' + old.get('label', old['version']), 'p50 us (old > new)', 'p99 us (old > new)'))
+    for name, new in results['cases'].items():
+        if name not in old['cases']:
+            continue
+        line = "{:<22}".format(name)
+        for key in ('p50_us', 'p99_us'):
+            before = old['cases'][name][key]
+            change = (new[key] - before) / before * 100 if before else 0
+            line += " {:>8.1f} > {:>7.1f} {:>+4.0f}%".format(before, new[key], change)
+        print(line)
+
+if __name__ == '__main__':
+    arguments = argparse.ArgumentParser(description="Benchmarks the collectors, the corona parser and the drawing functions")
+    arguments.add_argument('--rounds', type=int, default=200, help="calls per case (default 200)")
+    arguments.add_argument('--label', help="name of this run in the results and in --compare (default: git describe, or the version)")
+    arguments.add_argument('--output', help="where to save the results (default benchmarks/results/<label>-<time>.json)")
+    arguments.add_argument('--compare', help="results of an earlier run to compare with")
+    arguments.add_argument('cases', nargs='*', help="only run these cases")
+    arguments = arguments.parse_args()
+
+    stubdir = stubs.installStubs()
+    window = stubs.installHeadlessCurses()
+    try:
+        ## Fill staticvars like the startup of main() does, the drawing functions need all of it.
+        ## In test mode, so the in-process speed test (collectSpeed()) is skipped and nothing is downloaded or uploaded
+        dashboard.testmode = True
+        dashboard.updateStaticInfo()
+        dashboard.updateDaily()
+        dashboard.updateSemiOften()
+        dashboard.updateOften()
+
+        results = {'label': arguments.label or gitLabel(),
+                   'version': dashboard.__version__,
+                   'python': platform.python_version(),
+                   'machine': platform.machine(),
+                   'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'cases': {}}
+        print("{:<22} {:>9} {:>9} {:>9} {:>9} {:>11} {:>11}".format('Case', 'p50 us', 'p90 us', 'p99 us', 'max us', 'peak bytes', 'kept/call'))
+        for name, function in makeCases(window).items():
+            if arguments.cases and name not in arguments.cases:
+                continue
+            case = measure(function, arguments.rounds)
+            case.update(allocations(function, min(arguments.rounds, 50)))
+            results['cases'][name] = case
+            print("{:<22} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f} {:>11} {:>11.1f}".format(name, case['p50_us'], case['p90_us'], case['p99_us'],
+                                                                                     case['max_us'], case['alloc_peak_bytes'], case['retained_bytes_per_call']))
+    finally:
+        stubs.removeStubs(stubdir)
+
+    output = arguments.output
+    if output == None:
+        os.makedirs(resultsdir, exist_ok=True)
+        output = os.path.join(resultsdir, '{}-{}.json'.format(results['label'].replace(os.sep, '_'), time.strftime('%Y%m%d-%H%M%S')))
+    with open(output, 'w') as resultsfile:
+        json.dump(results, resultsfile, indent=2)
+    print("Saved to " + output)
+
+    if arguments.compare:
+        with open(arguments.compare) as oldfile:
+            compare(results, json.load(oldfile))
@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+## Stand-ins for the things the benchmarks can't (or shouldn't) use for real
+## installStubs() points dashboard.py at a fake /proc (with a stat file per process) and thermal zone, the dpkg status and apt lists in fixtures/apt,
+## and puts fake 'hostname' and 'uname' commands first in the PATH, answering with the files in fixtures/.
+## The interfaces are the real ones of this machine, collectInterfaces() only asks the kernel over rtnetlink.
+## The wifi is read from fixtures/proc/net/wireless, the ioctls of WirelessStats get the answers of wirelessRequest().
+## The network probes and the corona.help download are replaced too.
+## HeadlessCurses replaces the curses module of dashboard.py, so the drawing functions can run without a terminal.
+
+import array
+import curses
+import os
+import shutil
+import struct
+import tempfile
+
+import dashboard
+
+fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+processes = 143 ## Process directories in the fake /proc, like a Pi running the dashboard
+
+## The fake commands: command: [(shell case pattern of the arguments, fixture file in fixtures/commands)]
+commands = {'hostname': [('*', 'hostname.txt')],
+            'uname':    [('*', 'uname-sr.txt')]}
+
+def installStubs():
+    '''installStubs(): Documentation
+    Builds the fake /proc, thermal zone and commands in a temporary directory and points dashboard.py at them,
+    and at the package lists in fixtures/apt.
+    The probes of collectNetwork() are replaced by fixed latencies and collectCorona() gets the saved page,
+    so nothing goes out on the network.
+    Returns the temporary directory, removeStubs() cleans it up.'''
+    directory = tempfile.mkdtemp(prefix='rpi_dashboard_bench_')
+    proc = os.path.join(directory, 'proc')
+    os.mkdir(proc)
+    for name in ('uptime', 'loadavg', 'meminfo', 'stat'):
+        shutil.copy(os.path.join(fixtures, 'proc', name), proc)
+    shutil.copytree(os.path.join(fixtures, 'proc', 'net'), os.path.join(proc, 'net'))
+    for pid in range(1, processes + 1):
+        writeStat(proc, pid, 'worker-{}'.format(pid), pid * 7)
+    dashboard.proc_root = proc
+    dashboard.thermal_path = os.path.join(fixtures, 'thermal_temp')
+    dashboard.procClose()
+    dashboard.dpkg_status = os.path.join(fixtures, 'apt', 'status')
+    dashboard.apt_lists = os.path.join(fixtures, 'apt', 'lists')
+    dashboard.aptindexes.clear()
+
+    bindir = os.path.join(directory, 'bin')
+    os.mkdir(bindir)
+    for command, answers in commands.items():
+        script = ['#!/bin/sh', 'case "$*" in']
+        for pattern, fixture in answers:
+            pattern = pattern if '*' in pattern else '"{}"'.format(pattern)
+            script.append('    {}) exec cat "{}" ;;'.format(pattern, os.path.join(fixtures, 'commands', fixture)))
+        script.append('esac')
+        path = os.path.join(bindir, command)
+        with open(path, 'w') as scriptfile:
+            scriptfile.write('\n'.join(script) + '\n')
+        os.chmod(path, 0o755)
+    os.environ['PATH'] = bindir + os.pathsep + os.environ['PATH']
+
+    dashboard.WirelessStats.request = wirelessRequest
+    dashboard.probeTargets = lambda targets: {target: 5.0 for target in targets}
+    dashboard.cachedOpen = lambda url, headers=None, need_body=True: open(os.path.join(fixtures, 'corona.help.html'), 'rb')
+    return directory
+
+def writeStat(proc, pid, name, ticks, starttime=100):
+    '''writeStat(proc, pid, name, ticks, starttime=100): Documentation
+    Makes (or overwrites) the directory and stat file of a fake process in proc, with ticks of CPU time
+    split over utime and stime. The other fields are the ones of an idle process.'''
+    os.makedirs(os.path.join(proc, str(pid)), exist_ok=True)
+    with open(os.path.join(proc, str(pid), 'stat'), 'w') as statfile:
+        statfile.write('{} ({}) S 1 {} {} 0 -1 4194560 120 0 0 0 {} {} 0 0 20 0 1 0 {} 12345678 {} 18446744073709551615\n'
+                       .format(pid, name, pid, pid, ticks // 2, ticks - ticks // 2, starttime, 200 + pid % 900))
+
+def wirelessRequest(stats, number, length=0):
+    '''wirelessRequest(stats, number, length=0): Documentation
+    Takes the place of WirelessStats.request(), answers the ioctls like the driver of a Pi connected to HomeNet'''
+    if number == dashboard.WirelessStats.SIOCGIWAP:
+        return struct.pack('=H6s8x', 1, bytes.fromhex('112233445566'))
+    if number == dashboard.WirelessStats.SIOCGIWESSID:
+        stats.buffer[:7] = array.array('B', b'HomeNet')
+        return struct.pack('PHH', 0, 7, 1).ljust(16, b'\0')
+    if number == dashboard.WirelessStats.SIOCGIWRANGE:
+        stats.buffer[44] = 70
+        return bytes(16)
+    if number == dashboard.WirelessStats.SIOCGIWRATE:
+        return struct.pack('=iBBH8x', 72200000, 0, 0, 0)
+    raise OSError(95, 'Operation not supported')
+
+def removeStubs(directory):
+    '''removeStubs(directory): Documentation
+    Removes what installStubs() made'''
+    dashboard.procClose()
+    shutil.rmtree(directory, ignore_errors=True)
+
+class HeadlessWindow:
+    '''HeadlessWindow(height, width): Documentation
+    Takes the place of a curses window: accepts the calls dashboard.py makes and counts them,
+    without a terminal. calls is the amount of calls, cells the characters that were written.'''
+    def __init__(self, height=40, width=60):
+        self.height = height
+        self.width = width
+        self.calls = 0
+        self.cells = 0
+
+    def addstr(self, *args):
+        self.calls += 1
+        text = [arg for arg in args if isinstance(arg, str)]
+        if text:
+            self.cells += len(text[0])
+
+    addnstr = addstr
+
+    def getmaxyx(self):
+        return self.height, self.width
+
+    def getbegyx(self):
+        return 0, 0
+
+    def getyx(self):
+        return 0, 0
+
+    def overwrite(self, destination, *args):
+        self.calls += 1
+        destination.calls += 1
+        destination.cells += self.height * self.width
+
+    overlay = overwrite
+
+    def _ignore(self, *args):
+        self.calls += 1
+
+    noutrefresh = refresh = clear = erase = touchwin = touchline = move = nodelay = keypad = _ignore
+
+class HeadlessCurses:
+    '''HeadlessCurses(): Documentation
+    Takes the place of the curses module in dashboard.py. The constants come from the real module,
+    the functions that need a terminal (initscr() first) are done here.'''
+    def __getattr__(self, name):
+        return getattr(curses, name)
+
+    def color_pair(self, number):
+        return number << 8
+
+    def newpad(self, height, width):
+        return HeadlessWindow(height, width)
+
+    def newwin(self, height, width, y=0, x=0):
+        return HeadlessWindow(height, width)
+
+    def doupdate(self):
+        pass
+
+    def curs_set(self, visibility):
+        pass
+
+def installHeadlessCurses():
+    '''installHeadlessCurses(): Documentation
+    Replaces the curses module of dashboard.py with HeadlessCurses, returns a HeadlessWindow to draw on'''
+    dashboard.curses = HeadlessCurses()
+    return HeadlessWindow()
@@ -19,42 +19,260 @@
 # 'Services' part of the program has been replaced with
 # Information about the Corona virus
 
+import array
+import asyncio
+import bisect
+import codecs
+import collections
+import concurrent.futures
+import errno
+import fcntl
+import hashlib
+import heapq
+import html
+import http.client
+import http.server
+import json
+import math
+import mmap
+import operator
 import os
 import curses
 import curses.textpad
+import queue
+import random
+import re
+import selectors
+import signal
+import socket
+import struct
 import subprocess
+import threading
 import time
 import urllib.request
-from sys import argv, version_info
+import zlib
+from sys import argv, stdin, version_info
 
 ### Variables
 __version__ = '0.9'
 staticvars = {'updateamount': 0, # Amount of updates
         'interval': 5, # updateOften() interval in seconds
         'semi_interval': 10, # updateSemiOften() interval in minutes
+        'daily_interval': 1440, # updateDaily() interval in minutes
         'internet_interval': 4, # Internet speed gets calculated once every X times updateSemiOften() runs
         'internet_count': 4, # The amount of times that updateSemiOften() has ran since calculating
         'nextupdate': 'normal', # The kind of update that's next, can be 'normal' or 'daily'
         'updatemin': 10 # The minutes left until the next update, whether that's 'normal' or 'daily'
         }
                 ## Is updated by updateStaticInfo(), updateDaily(), updateSemiOften() and updateOften()
-testmode = False ## Enable or disable updates and internet speed, as they halt the startup by about a minute
+testmode = False ## Disable the internet speed test, as it uses up to speed_bytes of real bandwidth each way
+launchtime = time.monotonic() ## When the dashboard was started, for the time to the first frame
+firstframe = None ## Seconds from launchtime until the first frame was on the screen, see main()
+startup_defer = 30 ## Seconds after the first frame before the slow checks (updates, speed test) are started, see startDeferred()
+speeddeferred = False ## True while the speed test waits for startDeferred(), see networkFollowUps()
+placeholder = '...' ## Shown for the values that haven't been collected yet, see fillPlaceholders()
+asyncmode = False ## Run the main loop on asyncio (asyncLoop()) instead of the selectors loop in main(), start with 'async'
 ## Due to updateDaily() and updateSemiOften() needing 'hour' and 'minute', which are updated in the function after it
 ## updateOften(), retrieve the hour and minute here once
 staticvars['hour']   = time.strftime("%H", time.localtime()) 
 staticvars['minute'] = time.strftime("%M", time.localtime())
-countries = ['Mainland China', 'Italy', 'Netherlands']
+## The countries in the CORONA VIRUS panel: (name on corona.help, key in coronainfo, name on the screen)
+## Any country on the page can be added, the panel has room for four of them
+countries = [('Netherlands', 'nl', 'Netherlands'),
+             ('Mainland China', 'cn', 'China'),
+             ('Italy', 'it', 'Italy')]
 coronainfo = {'world_inf': 'ERR',
-              'world_dead': 'ERR',
-              'nl_inf': 'ERR',
-              'nl_dead': 'ERR',
-              'cn_inf': 'ERR',
-              'cn_dead': 'ERR',
-              'it_inf': 'ERR',
-              'it_dead': 'ERR'}
+              'world_dead': 'ERR'}
+for country, key, label in countries:
+    coronainfo[key + '_inf'] = coronainfo[key + '_dead'] = 'ERR'
+corona_chunk = 16384 ## The corona.help page is parsed while it comes in, this many bytes at a time
+corona_url = 'https://corona.help/'
+## On-disk cache for downloaded pages, see cachedOpen()
+httpcache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'rpi_dashboard')
+httpcache_ttl = 300 ## Seconds a cached page is trusted without asking the server whether it changed
+httpcache_max_bytes = 4 * 1024 * 1024 ## The least recently checked pages are removed when the cache gets bigger than this
+http_timeout = 15 ## Seconds before a page download is given up
+## The speed test, see collectSpeed(): streams at most speed_bytes from the download url and to the upload url
+speed_download_url = 'https://speed.cloudflare.com/__down?bytes={bytes}' ## {bytes} is filled in with speed_bytes
+speed_upload_url = 'https://speed.cloudflare.com/__up'
+speed_bytes = 25 * 1024 * 1024 ## Most bytes per direction, enough for a few seconds at the speeds a Pi gets
+speed_seconds = 8 ## Most seconds per direction, the speed is worked out over what was done by then
+speed_chunk = 64 * 1024 ## Size of the buffer that's read into and sent from, the same one for the whole test
+speedcancel = threading.Event() ## Set by cancelSpeed() to stop a running speed test
+speedsocket = None ## The socket of the running speed test, so cancelSpeed() can break off a read or send that's waiting
+## Upgradable packages are counted from the dpkg status and the package lists apt already downloaded, see countUpgradable()
+dpkg_status = '/var/lib/dpkg/status'
+apt_lists = '/var/lib/apt/lists' ## The *_Packages files in here, apt's own daily timer keeps them up to date
+aptindexes = {} ## path: (mtime in ns, size, {(package, architecture): version}), only changed files are parsed again
+## Cheap checks for 'Internet Access', see probeTargets(): ('dns', host), ('tcp', 'host:port') or ('head', url)
+## The internet is reachable when any of them succeeds
+probe_targets = [('dns', 'google.com'),
+                 ('tcp', '1.1.1.1:443'),
+                 ('head', 'https://archlinux.org/')]
+vmf_target = ('tcp', '192.168.178.49:80') ## Veldkamp-Mainframe
+probe_timeout = 2.0 ## Seconds, for every probe, they all run at the same time
+probe_history = 20 ## Amount of results that are kept per target
+probehistory = {} ## target: deque of (time, latency in ms, None if it failed)
+probepool = concurrent.futures.ThreadPoolExecutor(max_workers=len(probe_targets) + 1, thread_name_prefix='probe')
+probespending = {} ## target: the future of its last probe, a target isn't probed again while that one still hangs
+## Kernel files read by the collectors, kept as variables so they can be pointed somewhere else
+proc_root = '/proc'
+thermal_path = '/sys/class/thermal/thermal_zone0/temp'
+procfiles = {} ## Open file descriptors of procRead(), so the files are only opened once
+## CPU usage from the counters in /proc/stat, see CpuStats
+cpu_history = 60 ## Readings of the counters that are kept, the usage over any of the last 60 ticks can be derived from them
+cpustats = None ## The CpuStats of updateOften(), made by readCpuStats()
+## Traffic per network interface from the counters in /proc/net/dev, see NetDevStats
+netdev_smoothing = 10 ## Seconds, time constant of the moving average of the rates (EWMA), a step in traffic is 63% there after this
+netdevstats = None ## The NetDevStats of updateOften(), made by readNetDev()
+## The process table, see ProcessTable. Its top consumers are shown with 'o'
+process_top = 10 ## Processes in the top list, at most 26 fit on the screen
+process_budget = 0.015 ## Seconds of CPU time a scan may spend on reading /proc/<pid>/stat, the rest is read on the next ticks
+processtable = None ## The ProcessTable of updateOften(), made by scanProcesses()
+## The network interfaces and their addresses, from rtnetlink, see InterfaceTable
+lan_interface = 'eth0' ## Shown as LAN IP and Eth MAC
+wlan_interface = 'wlan0' ## Shown as WLAN IP and Wifi MAC
+interfacetable = None ## The InterfaceTable, made by collectInterfaces(), kept up to date by watchInterfaces() while the dashboard runs
+## The wifi link of wlan_interface, from /proc/net/wireless and the wireless extension ioctls, see WirelessStats
+wireless_events = 20 ## Roams, drops and reconnects that are kept, the last one is shown behind the ESSID for a while
+wirelessstats = None ## The WirelessStats of updateOften(), made by readWireless()
+## The slow data groups run on a small pool of worker threads, see startJob()
+pool_workers = 3
+workerpool = concurrent.futures.ThreadPoolExecutor(max_workers=pool_workers, thread_name_prefix='collector')
+jobresults = queue.Queue() ## (job, values, problem) of every finished job, only read by the UI thread in applyResults()
+refreshing = set() ## The jobs that are running on the pool right now
+jobnotify = None ## Optional function that's called (on the worker thread) after a result was queued
+## The screen layout, compiled for the size of the terminal by compileLayout(). The first panel is the header,
+## the others are stacked below it, on a screen that's at least twice layout_width wide in columns next to each other.
+## A panel is (height, title, chrome, icon, fields):
+##   title:  shown in the border on the first row of the panel, None for a panel without a border
+##   chrome: the static text, [(row, column, text, colour pair, attributes)]
+##   icon:   (row, column, chrome), left out as a whole when it doesn't fit
+##   fields: {name: (row, column, width, label)}, the value goes behind the (bold) label, see showField()
+layout_width = 60 ## Columns of a panel, the TFT the layout was made for is 60 wide (and 40 high)
+layout_corona = [('Worldwide', 'world')] + [(label, key) for country, key, label in countries[:4]] ## The rows of the corona table
+layout = (
+    (4, None,
+     [(1, 0, " >" * 14 + " || " + "< " * 14, 6, curses.A_BOLD),
+      (2, 1, " >" * 5 + 38 * ' ' + "< " * 5, 6, curses.A_BOLD),
+      (2, 12, "Raspberry PI - Activity Monitor V", 5, 0),
+      (2, 45, __version__, 5, curses.A_BOLD),
+      (3, 31, "CORONA VIRUS SPECIAL EDITION", 1, 0)],
+     None,
+     {'input': (0, 1, 20, ''), 'clock': (0, 26, 8, '')}),
+    (14, "SYSTEM INFORMATION", [],
+     (2, 47, [(0, 0, " *  *#*  * ", 6, 0), (1, 0, "*** *#* ***", 6, 0), (2, 0, " *#######* ", 6, 0),
+              (3, 0, "  ##   ##  ", 6, 0), (4, 0, "**# +++ #**", 6, 0), (5, 0, "### + + ###", 6, 0),
+              (6, 0, "**# +++ #**", 6, 0), (7, 0, "  ##   ##  ", 6, 0), (8, 0, " *#######* ", 6, 0),
+              (9, 0, "*** *#* ***", 6, 0), (10, 0, " *  *#*  * ", 6, 0),
+              ## The centre in another colour
+              (4, 4, "+++", 6, curses.A_STANDOUT), (5, 4, "+ +", 6, curses.A_STANDOUT), (6, 4, "+++", 6, curses.A_STANDOUT),
+              (5, 5, " ", 0, 0)]),
+     {'hostname': (2, 1, 35, "Hostname: "), 'kernel': (3, 1, 37, "Kernel: "), 'cpu': (4, 1, 40, "CPU: "),
+      'processes': (5, 1, 34, "Processes: "), 'cputemp': (6, 1, 28, "CPU Temperature: "), 'memory': (7, 1, 37, "Memory: "),
+      'history_system': (8, 1, 43, ''), 'eth_bssid': (9, 1, 35, "Eth MAC : "), 'wifi_bssid': (10, 1, 35, "Wifi MAC: "),
+      'history_load': (11, 1, 43, ''), 'uptime': (12, 1, 37, "Uptime: ")}),
+    (10, "NETWORK STATUS", [],
+     (2, 48, [(0, 0, "//      \\\\", 4, curses.A_BOLD), (1, 0, "|| /><\\ ||", 4, curses.A_BOLD), (2, 0, "|| \\></ ||", 4, curses.A_BOLD),
+              (3, 0, "\\\\  ||  //", 4, curses.A_BOLD), (4, 0, "    ||", 4, curses.A_BOLD), (5, 0, "    ||", 4, curses.A_BOLD),
+              (6, 0, "   /||\\", 4, curses.A_BOLD),
+              ## The antennae in another colour
+              (1, 3, "/><\\", 1, 0), (2, 3, "\\></", 1, 0)]),
+     {'network_status': (0, 23, 13, ''), 'traffic_other': (1, 1, 56, ''),
+      'www_access': (2, 1, 30, "Internet Access: "), 'speed': (3, 1, 30, "Approx. speed: "),
+      'lipaddr': (4, 1, 16, "LAN IP : "), 'traffic_lan': (4, 27, 19, ''), 'wipaddr': (5, 1, 16, "WLAN IP: "), 'traffic_wlan': (5, 27, 19, ''),
+      'essid': (6, 1, 33, "Connected to: "), 'sig_pow': (7, 1, 28, "Signal Strength: "), 'sig_qua': (8, 1, 10, "Signal Quality :  "),
+      'history_network': (9, 1, 43, '')}),
+    (12, "CORONA VIRUS",
+     [(2, 1, "COUNTRY     | INFECTIONS | DEATHS |", 0, curses.A_BOLD),
+      (3, 1, "------------|------------|--------|", 0, curses.A_BOLD)]
+     + [(4 + row, 1, "{:<12}|            |        |".format(label[:12]), 0, curses.A_BOLD) for row, (label, key) in enumerate(layout_corona)],
+     (2, 49, [(0, 0, "    #", 2, curses.A_BOLD), (1, 0, " #  |  #", 2, curses.A_BOLD), (2, 0, "  \\>|</", 2, curses.A_BOLD),
+              (3, 0, "  ˇ/ \\ˇ", 2, curses.A_BOLD), (4, 0, "#--|+|--#", 2, curses.A_BOLD), (5, 0, "  ˇ\\_/ˇ", 2, curses.A_BOLD),
+              (6, 0, "  />|<\\", 2, curses.A_BOLD), (7, 0, " #  |  #", 2, curses.A_BOLD), (8, 0, "    #", 2, curses.A_BOLD)]
+             ## The 'knobs' in other colours, the 'ˇ' character is not supported, but instead shows a cube
+             + [(row, col, "#", 1, 0) for row, col in ((0, 4), (1, 1), (1, 7), (4, 0), (4, 8), (7, 1), (7, 7), (8, 4))]
+             + [(row, col, "ˇ", 5, 0) for row, col in ((2, 3), (2, 5), (3, 2), (3, 6), (5, 2), (5, 6), (6, 3), (6, 5))]
+             + [(4, 4, "+", 2, curses.A_STANDOUT)]),
+     dict([('corona_status', (0, 21, 13, ''))]
+          + [('corona_{}_inf'.format(key), (4 + row, 14, 11, '')) for row, (label, key) in enumerate(layout_corona)]
+          + [('corona_{}_dead'.format(key), (4 + row, 27, 7, '')) for row, (label, key) in enumerate(layout_corona)]
+          + [('updates', (9, 1, 30, "Updates: ")), ('interval', (10, 1, 30, 'Refresh Interval: ')), ('nextupdate', (11, 1, 40, 'Next update: '))])))
+layoutplans = {} ## (rows, columns): the LayoutPlan compiled for a screen of that size
+layoutplan = None ## The LayoutPlan of the screen as it is now, see useLayout()
+chromelayer = None ## Pad with the static UI parts, drawn once per layout and copied onto the screen by uiDrawer()
+popups = {} ## The submenu windows by their key, built once by buildPopup(), see getPopup()
+popup_sizes = {'u': (14, 48), 'h': (18, 48), 'i': (24, 46), 'v': (18, 52), 't': (12, 36), 'p': (28, 58), 'o': (process_top + 7, 50)} ## (height, width)
+## Metric history, see RingBuffer and sparkline()
+history_size = 120 ## Samples kept per metric, the often ones get one every interval (10 minutes at the default 5s)
+history = {} ## metric name: RingBuffer, filled by recordHistory()
+## The metrics in history, by the group they're sampled in: 'often' every interval, 'network' on every network check
+history_groups = {'often': ('cputemp', 'memory', 'processes', 'loadavg', 'sig_qua'),
+                  'network': ('www_latency',)}
+history_intervals = {'often': ('interval', 1), 'network': ('semi_interval', 60)} ## Time between the samples of a group, as (staticvars key, seconds per unit)
+## The history is also logged to disk, so it's still there after a restart, see MetricLog
+metriclog_dir = os.path.join(os.path.expanduser('~'), '.local', 'share', 'rpi_dashboard')
+metriclog_records = 4096 ## Records per segment file, about 5.5 hours of 'often' samples at the default interval
+metriclog_segments = 4 ## Segment files per group, when they're all full the oldest one is reused
+metriclog_flush = 60 ## Seconds between writing the new records out to the SD card
+metriclogs = {} ## history group: MetricLog, see openMetricLogs()
+sparkline_ramp = '_.-:=+*#%@' ## Levels of sparkline() from low to high, the TFT font doesn't have the unicode blocks
+## Optional Prometheus endpoint, start with 'metrics' (or 'metrics=<port>'), see startMetricsServer()
+metrics_port = 9105
+metrics_address = '' ## Listen on all interfaces, so the Pi can be scraped from the monitoring server
+metricsserver = None
+metricspage = b'' ## The /metrics page, made by publishMetrics() after every collection, scrapes only send it
+## Fleet mode: 'agent=<host>[:<port>]' (an IPv6 address in brackets when there's a port) sends the metrics to an aggregator instead of showing them (see agentLoop()),
+## 'aggregator[=<port>]' shows a table of all the Pis that send to it (see aggregatorLoop())
+fleet_port = 9106
+fleet_metrics = ('cputemp', 'memory', 'processes', 'loadavg', 'sig_qua', 'www_latency') ## The values in a record, in this order
+fleet_batch = 3 ## Records per packet, so an agent sends once every fleet_batch intervals
+fleet_history = 10 ## Temperature samples the aggregator keeps per agent, for the sparkline in the table
+fleet_stale = 60 ## Seconds without a packet before an agent is shown as stale
+fleet_max_nodes = 1000 ## Agents the aggregator keeps track of, packets of any more are dropped
+agentaddress = None ## (host, port) of the aggregator, when running as an agent
+fleetmagic = b'RPDF'
+fleetheader = struct.Struct('<4sBB') ## magic, version, length of the hostname. Then the hostname,
+fleetcounts = struct.Struct('<BB')   ## the amount of metrics per record and the amount of records, then the records
+screenfields = {} ## (y, x): the (text, attr) segments that field showed when it was last written, see writeSegments()
+## What dataWriter() wrote: counts of the frame being written, of the last frame and the totals
+framestats = {'frames': 0, 'fields': 0, 'cells': 0, 'bytes': 0,
+              'last_fields': 0, 'last_cells': 0, 'last_bytes': 0,
+              'total_fields': 0, 'total_cells': 0, 'total_bytes': 0}
+## How long every step of the collectors takes, see Timed. Shown with 'p' and on the /metrics page
+timing_window = 100 ## Runs per step the statistics are taken over
+timings = {} ## step name: StepTimer, in the order the steps first ran
+## The data groups are run by a Scheduler on time.monotonic() deadlines, see scheduleGroups()
+## group: (staticvars key of its interval, seconds per unit of that interval, jitter in seconds, catch-up policy)
+schedule_groups = {'often': ('interval', 1, 0, 'keep'),
+                   'semi':  ('semi_interval', 60, 5, 'skip'),
+                   'daily': ('daily_interval', 60, 300, 'skip')}
+scheduler = None ## The Scheduler of main(), made by scheduleGroups()
 ### End Variables
 
 ### Functions
+def collectStaticInfo():
+    '''collectStaticInfo(): Documentation
+    The data collection of updateStaticInfo(), without touching staticvars, so it can run on a worker thread.
+    Returns a dict with the new values for staticvars.'''
+    values = {}
+    # Hostname
+    with Timed('static hostname'):
+        hostname = subprocess.run(['hostname'], stdout=subprocess.PIPE)
+        hostname = hostname.stdout.decode('utf-8')
+        values['hostname'] = hostname.strip()
+    
+    # OS and Kernel
+    with Timed('static kernel'):
+        kernel = subprocess.run(['uname', '-sr'], stdout=subprocess.PIPE)
+        kernel = kernel.stdout.decode('utf-8').strip()
+        values['kernel'] = kernel
+
+    # BSSIDs, and the IPs that come with them
+    with Timed('static interfaces'):
+        values.update(collectInterfaces())
+    return values
+
 def updateStaticInfo():
     '''statmon.py updateStaticInfo() documentation:
     Function doesn't take variables.
@@ -63,23 +281,7 @@ def updateStaticInfo():
     This function is to be called at program startup and can be initiated manually by pressing 'shift+u'
     '''
     problem = False
-    # Hostname
-    hostname = subprocess.run(['hostname'], stdout=subprocess.PIPE)
-    hostname = hostname.stdout.decode('utf-8')
-    staticvars['hostname'] = hostname.strip()
-    
-    # OS and Kernel
-    kernel = subprocess.run(['uname', '-sr'], stdout=subprocess.PIPE)
-    kernel = kernel.stdout.decode('utf-8').strip()
-    staticvars['kernel'] = kernel
-
-    # BSSIDs
-    eth_bssid  = subprocess.run(['ip', 'addr', 'show', 'eth0'],  stdout=subprocess.PIPE).stdout.decode('utf-8').split('\n')[1]
-    wifi_bssid = subprocess.run(['ip', 'addr', 'show', 'wlan0'], stdout=subprocess.PIPE).stdout.decode('utf-8').split('\n')[1]
-    eth_bssid = eth_bssid[eth_bssid.find("link")+11:].split(' ')[0].strip()
-    wifi_bssid = wifi_bssid[wifi_bssid.find("link")+11:].split(' ')[0].strip()
-    staticvars['eth_bssid'] = eth_bssid
-    staticvars['wifi_bssid'] = wifi_bssid
+    staticvars.update(collectStaticInfo())
 
     ## End updateStaticInfo(), return True upon completion
     if problem:
@@ -87,38 +289,165 @@ def updateStaticInfo():
     else:
         return True
 
+def collectUpdates():
+    '''collectUpdates(): Documentation
+    The data collection of updateDaily(), without touching staticvars, so it can run on a worker thread.
+    Returns a dict with the new values for staticvars.
+    '''
+    values = {}
+    # Updates
+    ## Used to be 'sudo apt-get update' and 'apt list --upgradable', which took tens of seconds.
+    ## Now the package lists apt already has are compared with what's installed, nothing is downloaded
+    try:
+        values['updateamount'] = countUpgradable()
+    except OSError: ## No dpkg or apt on this machine, or they can't be read
+        values['updateamount'] = 'ERR'
+
+    return values
+
+def countUpgradable():
+    '''countUpgradable(): Documentation
+    Returns the amount of installed packages of which the package lists in apt_lists have a newer version,
+    like 'apt list --upgradable' does (without pinning). Reads dpkg_status and the *_Packages files through
+    packageIndex(), so a file is only parsed again when it changed, which is once a day at most.'''
+    with Timed('daily dpkg status'):
+        installed = packageIndex(dpkg_status, installed_only=True)
+    with Timed('daily apt lists'):
+        paths = [os.path.join(apt_lists, name) for name in sorted(os.listdir(apt_lists)) if name.endswith('_Packages')]
+        indexes = [packageIndex(path) for path in paths]
+    ## Forget the lists that were removed, a changed sources.list leaves them behind otherwise
+    for path in list(aptindexes):
+        if path != dpkg_status and path not in paths:
+            del aptindexes[path]
+
+    upgradable = 0
+    for package, version in installed.items():
+        for index in indexes:
+            available = index.get(package)
+            if available != None and compareVersions(available, version) > 0:
+                upgradable += 1
+                break
+    return upgradable
+
+def packageIndex(path, installed_only=False):
+    '''packageIndex(path, installed_only=False): Documentation
+    Returns the versions in a dpkg status or apt Packages file as {(package, architecture): version}, see readPackageIndex().
+    The result is kept in aptindexes and used again for as long as the modification time and size of the file stay the same.'''
+    info = os.stat(path)
+    cached = aptindexes.get(path)
+    if cached != None and cached[0] == info.st_mtime_ns and cached[1] == info.st_size:
+        return cached[2]
+    versions = readPackageIndex(path, installed_only)
+    aptindexes[path] = (info.st_mtime_ns, info.st_size, versions)
+    return versions
+
+def readPackageIndex(path, installed_only=False):
+    '''readPackageIndex(path, installed_only=False): Documentation
+    Parses a dpkg status or apt Packages file (stanzas of 'Field: value' lines, separated by an empty line)
+    into {(package, architecture): version}, with the highest version when a package is in there more than once.
+    Only the lines of the fields that are needed are decoded, the lists of Raspbian are tens of megabytes.
+    With installed_only the packages of which the Status isn't 'install ok installed' are skipped.'''
+    versions = {}
+    package = version = architecture = None
+    installed = not installed_only
+    with open(path, 'rb') as indexfile:
+        for line in indexfile:
+            if line == b'\n':
+                if package != None and version != None and installed:
+                    key = (package, architecture)
+                    if key not in versions or compareVersions(version, versions[key]) > 0:
+                        versions[key] = version
+                package = version = architecture = None
+                installed = not installed_only
+            elif line.startswith(b'Package: '):
+                package = line[9:].strip().decode('utf-8', 'replace')
+            elif line.startswith(b'Version: '):
+                version = line[9:].strip().decode('utf-8', 'replace')
+            elif line.startswith(b'Architecture: '):
+                architecture = line[14:].strip().decode('utf-8', 'replace')
+            elif installed_only and line.startswith(b'Status: '):
+                installed = line[8:].split() == [b'install', b'ok', b'installed']
+    ## The last stanza doesn't always end with an empty line
+    if package != None and version != None and installed:
+        key = (package, architecture)
+        if key not in versions or compareVersions(version, versions[key]) > 0:
+            versions[key] = version
+    return versions
+
+def compareVersions(first, second):
+    '''compareVersions(first, second): Documentation
+    Compares two Debian package versions ([epoch:]upstream[-revision]) like 'dpkg --compare-versions' does.
+    Returns a negative number when first is older, 0 when they're the same and a positive number when first is newer.'''
+    first_epoch, first_upstream, first_revision = splitVersion(first)
+    second_epoch, second_upstream, second_revision = splitVersion(second)
+    if first_epoch != second_epoch:
+        return first_epoch - second_epoch
+    return compareVersionParts(first_upstream, second_upstream) or compareVersionParts(first_revision, second_revision)
+
+def splitVersion(version):
+    '''splitVersion(version): Documentation
+    Returns (epoch, upstream, revision) of a Debian version, the epoch as an int, 0 and '' when they're left out.'''
+    epoch = 0
+    if ':' in version:
+        epoch, version = version.split(':', 1)
+        try:
+            epoch = int(epoch)
+        except ValueError:
+            epoch = 0
+    if '-' in version:
+        version, revision = version.rsplit('-', 1)
+    else:
+        revision = ''
+    return epoch, version, revision
+
+def versionOrder(character):
+    '''versionOrder(character): Documentation
+    The weight of a character in the non-digit parts of a version: '~' sorts before everything, even the end
+    of the part (so 1.0~rc1 is older than 1.0), then the end, then letters, then everything else.'''
+    if character == '~':
+        return -1
+    if character in '0123456789':
+        return 0
+    if character.isascii() and character.isalpha():
+        return ord(character)
+    return ord(character) + 256
+
+def compareVersionParts(first, second):
+    '''compareVersionParts(first, second): Documentation
+    The comparison of dpkg (verrevcmp()) for an upstream version or a revision: alternately a non-digit part,
+    compared character by character with versionOrder(), and a digit part, compared as a number.'''
+    digits = '0123456789'
+    i = j = 0
+    while i < len(first) or j < len(second):
+        while (i < len(first) and first[i] not in digits) or (j < len(second) and second[j] not in digits):
+            difference = (versionOrder(first[i]) if i < len(first) else 0) - (versionOrder(second[j]) if j < len(second) else 0)
+            if difference:
+                return difference
+            i += 1
+            j += 1
+        start = i
+        while i < len(first) and first[i] in digits:
+            i += 1
+        first_number = int(first[start:i] or 0)
+        start = j
+        while j < len(second) and second[j] in digits:
+            j += 1
+        second_number = int(second[start:j] or 0)
+        if first_number != second_number:
+            return 1 if first_number > second_number else -1
+    return 0
+
 def updateDaily():
     '''statmon.py updateDaily() documentation:
     Function doesn't take variables.
-    This function is to be called once every day, to check and retrieve updates
+    This function is to be called once every day, to count the packages that can be upgraded
     and other tasks that take too long or change too rarely to call every second
     This function is to be called at program startup and can be initiated manually by pressing 'u'
+    While the dashboard is running, the same work is done on the worker pool, see startDaily()
     '''
     problem = False
     global staticvars
-    global testmode
-    # Updates
-    if not testmode:
-        ## I'm using the deprecated apt-get commands, because apt reports an unstable CLI, which is not handy for scripts like this one
-        subprocess.run(['sudo', 'apt-get', 'update'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT) ## Run the apt-get update command to check for updates
-        updatelist = subprocess.run(['sudo', 'apt', 'list', '--upgradable'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT) ## Run list upgradable to list upgradable packages and read output
-        ## Redirect stderr to stdout to keep it from appearing in the program (apt update returns stderr if there is no internet)
-        updates = updatelist.stdout.decode('utf-8').split('\n')
-        updateamount = 0
-        for update in updates:
-            if update == '': # If the entire line is empty (the last one will be when splitting with \n) ignore it
-                pass
-            elif update[0] == 'N': # Sometimes, there are notes in the output which start with 'N'
-                pass
-            elif update[0] == 'W': # And catch the 'unstable CLI warning' too, while we're at it (doesn't work yet)
-                pass
-            elif update[0] == 'L': # The first entry of the output is 'Listing...', remove that
-                pass
-            else:
-                updateamount += 1
-        staticvars['updateamount'] = updateamount
-    else:
-        staticvars['updateamount'] = 'DISABLED'
+    staticvars.update(collectUpdates())
 
     # Save the time at which this was updated
     staticvars['daily_update_hour'] = staticvars['hour']
@@ -130,192 +459,689 @@ def updateDaily():
     else:
         return True
 
-def updateSemiOften():
-    '''updateSemiOften(): Documentation
-    This function retrieves info that needs to stay up-to-date, but shouldn't be updated
-    every few seconds. This function is supposed to be called every 10-15 minutes.
-    Data includes: 'pinging google to test internet connection' (don't do that every few seconds)
-    'nagging systemd for info about all services' and 'updating IP addresses'
-    '''
-    problem = False
-    global testmode
+def collectNetwork():
+    '''collectNetwork(): Documentation
+    The IP, internet access and service part of updateSemiOften(), without touching staticvars,
+    so it can run on a worker thread. Returns a dict with the new values for staticvars.'''
+    values = {}
     #IP
-    ## Retrieve interfaces with IP addresses
-    ip_ifs = subprocess.run(['ip', '-4', 'addr'], stdout=subprocess.PIPE)
-    ip_ifs = ip_ifs.stdout.decode('utf-8').split('\n')
-    interfaces = []
-    for intf,line in enumerate(ip_ifs):
-        if line != '': # There is always a trailing '' at the end of every STDOUT. Thanks to that, line[0] shits itself
-            if line[0] != ' ':
-                line = line[3:] # Remove the interface number, colon and whitespace of this way-too-verbose piece of garbage command
-                line = line[:line.find(":")] # Find the first instance of ":" and remove it and everything behind it
-                interfaces.append(line)
-
-    ## WLan IP, only retrieve if connectivity
-    if 'wlan0' in interfaces:
-        wipaddr = subprocess.run(['ip', '-4', 'addr', 'show', 'wlan0'], stdout=subprocess.PIPE)
-        wipaddr = wipaddr.stdout.decode('utf-8')
-        wipaddr = wipaddr[wipaddr.find('inet')+5:wipaddr.find('inet')+19] # Only works if the IP is exactly 14 characters long (which it always is with my DHCP shitpile)
-        staticvars['wipaddr'] = wipaddr.strip()
-    else:
-        staticvars['wipaddr'] = 'Not connected'
-    ## Eth IP, only retrieve if connectivity
-    if 'eth0' in interfaces:
-        lipaddr = subprocess.run(['ip', '-4', 'addr', 'show', 'wlan0'], stdout=subprocess.PIPE)
-        lipaddr = lipaddr.stdout.decode('utf-8')
-        lipaddr = lipaddr[lipaddr.find('inet')+5:lipaddr.find('inet')+19] # Only works if the IP is exactly 14 characters long (which it always is with my DHCP shitpile)
-        staticvars['lipaddr'] = lipaddr.strip()
-    else:
-        staticvars['lipaddr'] = 'Not connected'
-
-    # Internet access
-    try:
-        if urllib.request.urlopen("https://google.com/").getcode() == 200:
-            staticvars['www_access'] = 'Established'
-        if urllib.request.urlopen("https://archlinux.org/").getcode() == 200:
-            staticvars['www_access'] = 'Established'
-    except OSError:
-        staticvars['www_access'] = 'Disconnected'
-    except urllib.error.URLError:
-        staticvars['www_access'] = 'Disconnected'
-    except:
-        staticvars['www_access'] = 'ERROR'
-    else:
-        staticvars['www_access'] = 'Established'
-
-    # Internet speed
-    if not testmode:
-        if staticvars['internet_count'] >= staticvars['internet_interval']:
-            staticvars['internet_count'] = 1
-            staticvars['speed_up'] = 'ERR'
-            staticvars['speed_down'] = 'ERR'
-            staticvars['ping'] = 'ERR'
-            if staticvars['www_access'] == 'Established':
-                try: # if internet access suddenly dies, the program crashes
-                    speed = subprocess.run(['speedtest-cli'], stdout=subprocess.PIPE)
-                    speed = speed.stdout.decode('utf-8').split("\n")
-                    for line in speed:
-                        if line.find("Upload:") != -1:
-                            staticvars['speed_up'] = line[8:]
-                        elif line.find("Download:") != -1:
-                            staticvars['speed_down'] = line[10:]
-                        elif line.find("Hosted by") != -1:
-                            staticvars['ping'] = line[line.find(":")+1:]
-                except:
-                    pass # DONT DO THE CRASHEROO
-        else:
-            staticvars['internet_count'] += 1
+    with Timed('network ip'):
+        ## Used to fork 'ip -4 addr' three times, and read the LAN IP of wlan0. While watchInterfaces() runs
+        ## the InterfaceTable is already up to date, otherwise it's one netlink request
+        values.update(collectInterfaces())
+
+    # Internet access, and the Veldkamp-Mainframe at the same time
+    with Timed('network probes'):
+        latencies = probeTargets(probe_targets + [vmf_target])
+    reachable = [latencies[target] for target in probe_targets if latencies[target] is not None]
+    if reachable:
+        values['www_access'] = 'Established'
+        values['www_latency'] = min(reachable)
     else:
-        staticvars['speed_up'] = staticvars['speed_down'] = staticvars['ping'] = 'DISABLED'
+        values['www_access'] = 'Disconnected'
+        values['www_latency'] = None
 
     # Apache Process status
     ### COMING LATER
-    staticvars['apache_stat'] = 'Inactive'
+    values['apache_stat'] = 'Inactive'
 
     # SSL service status
     ### COMING LATER
-    staticvars['ssl_stat'] = 'Inactive'
+    values['ssl_stat'] = 'Inactive'
 
     # FTP service status
     ### COMING LATER
-    staticvars['ftp_stat'] = 'Inactive'
+    values['ftp_stat'] = 'Inactive'
 
     # Veldkamp-Mainframe ping
+    if latencies[vmf_target] is not None:
+        values['vmf_stat'] = 'Online'
+    else:
+        values['vmf_stat'] = 'Offline'
+
+    return values
+
+class InterfaceTable:
+    '''InterfaceTable(): Documentation
+    The network interfaces with their MAC and IPv4 addresses, read from an rtnetlink (NETLINK_ROUTE) socket
+    that's subscribed to the link and IPv4 address events of the kernel. refresh() asks for all of it (a dump),
+    after that read() applies the events as they come in, so a new DHCP lease is known the moment it's there.'''
+    ## From linux/netlink.h and linux/rtnetlink.h
+    NLMSG_ERROR, NLMSG_DONE = 2, 3
+    RTM_NEWLINK, RTM_DELLINK, RTM_GETLINK, RTM_NEWADDR, RTM_DELADDR, RTM_GETADDR = 16, 17, 18, 20, 21, 22
+    NLM_F_REQUEST, NLM_F_DUMP = 0x1, 0x300
+    RTMGRP_LINK, RTMGRP_IPV4_IFADDR = 0x1, 0x10
+    IFLA_ADDRESS, IFLA_IFNAME = 1, 3
+    IFA_ADDRESS, IFA_LOCAL = 1, 2
+    header = struct.Struct('=IHHII') ## nlmsghdr: length, type, flags, sequence, port
+    linkinfo = struct.Struct('=BxHiII') ## ifinfomsg: family, device type, index, flags, change
+    addrinfo = struct.Struct('=BBBBi') ## ifaddrmsg: family, prefix length, flags, scope, index
+    attribute = struct.Struct('=HH') ## rtattr: length, type
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.names = {} ## index: name
+        self.macs = {} ## index: MAC address
+        self.addresses = {} ## index: [IPv4 addresses], in the order the kernel sent them
+        self.sequence = 0
+        self.watching = False ## True while watchInterfaces() reads the socket, nobody else may then
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        self.sock.bind((0, self.RTMGRP_LINK | self.RTMGRP_IPV4_IFADDR))
+
+    def refresh(self):
+        '''Replaces the table with a dump of the links and addresses, returns True if anything changed'''
+        with self.lock:
+            before = self.snapshot()
+            self.names.clear()
+            self.macs.clear()
+            self.addresses.clear()
+            self.dump(self.RTM_GETLINK)
+            self.dump(self.RTM_GETADDR)
+            return self.snapshot() != before
+
+    def dump(self, kind):
+        '''Requests a dump of kind (RTM_GETLINK or RTM_GETADDR) and handles the answers until it's done.
+        Events that come in meanwhile are handled too.'''
+        self.sequence += 1
+        self.sock.send(self.header.pack(self.header.size + 4, kind, self.NLM_F_REQUEST | self.NLM_F_DUMP, self.sequence, 0)
+                       + struct.pack('=B3x', socket.AF_UNSPEC))
+        while not self.handle(self.sock.recv(65536)):
+            pass
+
+    def read(self):
+        '''Waits for the next events on the socket and applies them, returns True if the table changed.
+        When the kernel had to drop events, because the socket's buffer was full, the table is dumped again.'''
+        try:
+            data = self.sock.recv(65536)
+        except OSError as error:
+            if error.errno != errno.ENOBUFS:
+                raise
+            return self.refresh()
+        with self.lock:
+            before = self.snapshot()
+            self.handle(data)
+            return self.snapshot() != before
+
+    def handle(self, data):
+        '''Applies the netlink messages in data to the table, returns True if the dump that was asked for last is done'''
+        done = False
+        offset = 0
+        while offset + self.header.size <= len(data):
+            length, kind, flags, sequence, port = self.header.unpack_from(data, offset)
+            if length < self.header.size:
+                break
+            body = offset + self.header.size
+            end = offset + length
+            if kind == self.NLMSG_DONE:
+                done = done or sequence == self.sequence
+            elif kind == self.NLMSG_ERROR:
+                error = struct.unpack_from('=i', data, body)[0]
+                if error:
+                    raise OSError(-error, os.strerror(-error))
+            elif kind == self.RTM_DELLINK:
+                index = self.linkinfo.unpack_from(data, body)[2]
+                self.names.pop(index, None)
+                self.macs.pop(index, None)
+                self.addresses.pop(index, None)
+            elif kind == self.RTM_NEWLINK:
+                index = self.linkinfo.unpack_from(data, body)[2]
+                attributes = self.attributes(data, body + self.linkinfo.size, end)
+                if self.IFLA_IFNAME in attributes:
+                    self.names[index] = attributes[self.IFLA_IFNAME].rstrip(b'\0').decode('utf-8', 'replace')
+                if self.IFLA_ADDRESS in attributes:
+                    self.macs[index] = ':'.join('{:02x}'.format(byte) for byte in attributes[self.IFLA_ADDRESS])
+            elif kind in (self.RTM_NEWADDR, self.RTM_DELADDR):
+                family, prefix, flags, scope, index = self.addrinfo.unpack_from(data, body)
+                attributes = self.attributes(data, body + self.addrinfo.size, end)
+                address = attributes.get(self.IFA_LOCAL, attributes.get(self.IFA_ADDRESS))
+                if family == socket.AF_INET and address != None:
+                    address = socket.inet_ntoa(address)
+                    addresses = self.addresses.setdefault(index, [])
+                    if kind == self.RTM_NEWADDR and address not in addresses:
+                        addresses.append(address)
+                    elif kind == self.RTM_DELADDR and address in addresses:
+                        addresses.remove(address)
+            offset += (length + 3) & ~3
+        return done
+
+    def attributes(self, data, offset, end):
+        '''Returns the rtattrs from offset to end in data as a dict of type: value (bytes)'''
+        found = {}
+        while offset + self.attribute.size <= end:
+            length, kind = self.attribute.unpack_from(data, offset)
+            if length < self.attribute.size:
+                break
+            found[kind] = data[offset + self.attribute.size:offset + length]
+            offset += (length + 3) & ~3
+        return found
+
+    def snapshot(self):
+        '''What the table holds now, to see whether it changed'''
+        return sorted((name, self.macs.get(index), tuple(self.addresses.get(index, ()))) for index, name in self.names.items())
+
+    def interface(self, name):
+        '''Returns (MAC address, [IPv4 addresses]) of the interface called name, (None, []) when there's no such interface'''
+        with self.lock:
+            for index, known in self.names.items():
+                if known == name:
+                    return self.macs.get(index), list(self.addresses.get(index, ()))
+        return None, []
+
+def collectInterfaces():
+    '''collectInterfaces(): Documentation
+    The IP and MAC addresses of lan_interface and wlan_interface, from the InterfaceTable (made the first time).
+    While watchInterfaces() runs the table is always up to date, otherwise the kernel is asked again, without forking anything.
+    Returns a dict with the new values for staticvars.'''
+    global interfacetable
     try:
-        urllib.request.urlopen("http://192.168.178.49").getcode()
+        if interfacetable == None:
+            interfacetable = InterfaceTable()
+            interfacetable.refresh()
+        elif not interfacetable.watching:
+            interfacetable.refresh()
+    except OSError: ## No rtnetlink, this isn't Linux
+        return {'lipaddr': 'ERR', 'wipaddr': 'ERR', 'eth_bssid': 'ERR', 'wifi_bssid': 'ERR'}
+    values = {}
+    for name, ipkey, mackey in ((lan_interface, 'lipaddr', 'eth_bssid'), (wlan_interface, 'wipaddr', 'wifi_bssid')):
+        mac, addresses = interfacetable.interface(name)
+        values[ipkey] = addresses[0] if addresses else 'Not connected'
+        values[mackey] = mac if mac != None else 'N/A'
+    return values
+
+def startInterfaceWatch():
+    '''startInterfaceWatch(): Documentation
+    Starts watchInterfaces() on a thread of its own, once collectInterfaces() made the InterfaceTable.
+    Returns False when there's no table (no rtnetlink), the network check then keeps asking for the addresses.'''
+    if interfacetable == None or interfacetable.watching:
+        return False
+    interfacetable.watching = True
+    threading.Thread(target=watchInterfaces, args=(interfacetable,), name='interfaces', daemon=True).start()
+    return True
+
+def watchInterfaces(table):
+    '''watchInterfaces(table): Documentation
+    Runs on its own thread, started by startInterfaceWatch(), and waits for the link and address events of the kernel.
+    Whenever they change the table, the values of collectInterfaces() go on jobresults as the 'interfaces' job,
+    like a job of the worker pool, so applyResults() shows a new address right away instead of at the next network check.'''
+    try:
+        while True:
+            if table.read():
+                runJob('interfaces')
     except OSError:
-        staticvars['vmf_stat'] = 'Offline'
-    except urllib.error.URLError:
-        staticvars['vmf_stat'] = 'Offline'
+        pass ## The socket broke, collectInterfaces() goes back to asking on every network check
+    finally:
+        table.watching = False
+
+def probeTargets(targets):
+    '''probeTargets(targets): Documentation
+    Probes all targets (see probe_targets) at the same time on probepool, and waits no longer than probe_timeout.
+    A target of which the last probe is still hanging (a getaddrinfo() can take longer) isn't probed again:
+    it keeps its worker busy, so a new probe would wait behind it, and it's left out of probehistory, as it's unknown.
+    That way every probe that's started has a worker of its own.
+    Every result is added to probehistory. Returns {target: latency in ms, or None if it failed or is still running}'''
+    futures = {}
+    latencies = {}
+    for target in targets:
+        if target in probespending and not probespending[target].done():
+            latencies[target] = None
+        else:
+            futures[target] = probespending[target] = probepool.submit(probe, target)
+    concurrent.futures.wait(futures.values(), timeout=probe_timeout + 0.5)
+    now = time.time()
+    for target, future in futures.items():
+        latency = None
+        if future.done() and future.exception() is None:
+            latency = future.result()
+        latencies[target] = latency
+        if target not in probehistory:
+            probehistory[target] = collections.deque(maxlen=probe_history)
+        probehistory[target].append((now, latency))
+    return latencies
+
+def probe(target):
+    '''probe(target): Documentation
+    Runs one probe and returns its latency in ms, raises an OSError (or any other exception) if it failed.
+    'dns' resolves a host name, 'tcp' opens (and closes) a TCP connection, 'head' sends a HEAD request,
+    which counts as a success with any HTTP status, as the server was reached.
+    DNS lookups can't be given a timeout, probeTargets() stops waiting for them instead.'''
+    kind, address = target
+    start = time.monotonic()
+    with Timed(kind + ' ' + address.split('//')[-1].rstrip('/')):
+        if kind == 'dns':
+            socket.getaddrinfo(address, None)
+        elif kind == 'tcp':
+            host, port = address.rsplit(':', 1)
+            socket.create_connection((host, int(port)), timeout=probe_timeout).close()
+        elif kind == 'head':
+            request = urllib.request.Request(address, method='HEAD', headers={'User-Agent': 'Mozilla/5.0'})
+            try:
+                urllib.request.urlopen(request, timeout=probe_timeout).close()
+            except urllib.error.HTTPError:
+                pass # The server answered, so it's reachable
+        else:
+            raise ValueError("Unknown probe kind: " + kind)
+    return round((time.monotonic() - start) * 1000)
+
+def collectSpeed():
+    '''collectSpeed(): Documentation
+    Measures the internet speed, in-process: the latency (TCP connect time) and the download and upload speed,
+    by streaming at most speed_bytes for at most speed_seconds per direction, see speedTransfer().
+    Used to run speedtest-cli, which took a good 20-40 seconds and couldn't be stopped, this can, with cancelSpeed().
+    Returns a dict with the new values for staticvars. Whether it's time to run it (internet_interval) is decided by the caller.'''
+    values = {'speed_up': 'ERR', 'speed_down': 'ERR', 'ping': 'ERR'}
+    speedcancel.clear()
+    buffer = memoryview(bytearray(speed_chunk))
+    try:
+        with Timed('semi speed download'):
+            latency, received, seconds = speedTransfer(speed_download_url.format(bytes=speed_bytes), buffer, upload=False)
+        values['ping'] = "{:.1f} ms".format(latency * 1000)
+        values['speed_down'] = "{:.2f} Mbit/s".format(received * 8 / seconds / 1e6)
+        with Timed('semi speed upload'):
+            latency, sent, seconds = speedTransfer(speed_upload_url, buffer, upload=True)
+        values['speed_up'] = "{:.2f} Mbit/s".format(sent * 8 / seconds / 1e6)
+    except (OSError, http.client.HTTPException, ValueError, ZeroDivisionError):
+        pass # No internet, a server that doesn't want to, or it was cancelled
+    return values
+
+def speedTransfer(url, buffer, upload):
+    '''speedTransfer(url, buffer, upload): Documentation
+    Downloads from url (GET), or uploads to it (POST), until speed_bytes are done, speed_seconds have passed
+    or cancelSpeed() was called. Every chunk goes through buffer (a memoryview): downloads are read into it
+    with readinto(), uploads are sent from it, so nothing is allocated per chunk.
+    An upload is a row of POSTs on the same connection, each twice as big as the one before, and only counts
+    what the server answered for: what's still in a socket buffer when the time is up isn't uploaded.
+    A POST that isn't answered before the deadline isn't waited for, so both directions keep to speed_seconds.
+    Returns (connect time, bytes, seconds), the time counts from the request, so the connect isn't in the speed,
+    for an upload it's the time of the last answer.
+    Raises OSError when it was cancelled before anything was done, or the server didn't answer any of the upload in time.'''
+    global speedsocket
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise ValueError("Speed test url isn't http(s): " + url)
+    connectiontype = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    connection = connectiontype(parts.netloc, timeout=speed_seconds)
+    path = parts.path + ('?' + parts.query if parts.query else '')
+    done = 0
+    seconds = 0
+    try:
+        start = time.monotonic()
+        connection.connect()
+        latency = time.monotonic() - start
+        speedsocket = connection.sock
+        start = time.monotonic()
+        deadline = start + speed_seconds
+        if upload:
+            size = len(buffer) // 2
+            while done < speed_bytes and not speedcancel.is_set() and time.monotonic() < deadline:
+                size = min(size * 2, speed_bytes - done)
+                if done:
+                    ## No bigger than what fits in the time left at the speed so far, or it's never answered
+                    size = max(len(buffer), min(size, int(done / seconds * (deadline - time.monotonic()))))
+                try:
+                    connection.sock.settimeout(max(0.001, deadline - time.monotonic())) ## Nothing may wait past the deadline
+                    connection.putrequest('POST', path)
+                    connection.putheader('User-Agent', 'Mozilla/5.0')
+                    connection.putheader('Content-Type', 'application/octet-stream')
+                    connection.putheader('Content-Length', str(size))
+                    connection.endheaders()
+                    left = size
+                    while left and not speedcancel.is_set() and time.monotonic() < deadline:
+                        chunk = buffer[:min(len(buffer), left)]
+                        connection.sock.sendall(chunk)
+                        left -= len(chunk)
+                    if left:
+                        break ## Time's up (or cancelled) halfway, this one doesn't count
+                    response = connection.getresponse()
+                    response.read()
+                except OSError:
+                    break ## Not sent or answered in time, this one doesn't count
+                if response.status != 200:
+                    raise http.client.HTTPException("Speed test upload answered {}".format(response.status))
+                done += size
+                seconds = time.monotonic() - start
+            if done == 0 and not speedcancel.is_set():
+                raise OSError("The speed test server didn't answer any of the upload in time")
+        else:
+            connection.request('GET', path, headers={'User-Agent': 'Mozilla/5.0'})
+            response = connection.getresponse()
+            if response.status != 200:
+                raise http.client.HTTPException("Speed test download answered {}".format(response.status))
+            while done < speed_bytes and not speedcancel.is_set() and time.monotonic() < deadline:
+                count = response.readinto(buffer)
+                if not count:
+                    break
+                done += count
+            seconds = time.monotonic() - start
+    except OSError:
+        if not speedcancel.is_set() or done == 0:
+            raise
+        if not upload:
+            seconds = time.monotonic() - start ## Cancelled while waiting, what was done until then still counts
+    finally:
+        speedsocket = None
+        connection.close()
+    if speedcancel.is_set() and done == 0:
+        raise OSError("Speed test cancelled")
+    return latency, done, seconds
+
+def cancelSpeed():
+    '''cancelSpeed(): Documentation
+    Stops a running speed test (from any thread): speedTransfer() stops after the chunk it's on,
+    and a read or send that's waiting for the network is broken off by shutting down the socket.'''
+    speedcancel.set()
+    sock = speedsocket
+    if sock != None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+def collectCorona():
+    '''collectCorona(): Documentation
+    Scrapes the numbers of the countries in countries from https://corona.help/
+    Returns a dict with the new values for coronainfo, all 'ERR' if it failed.'''
+    values = {}
+    # Corona info
+    try:
+        ## https://corona.help does not like Python, so we give it the finger and call ourself Firefox
+        ## If the page didn't change since it was parsed last time, there's nothing to do (None), unless
+        ## there's nothing to show yet (after a restart), then the cached copy is parsed
+        with Timed('semi corona fetch'):
+            response = cachedOpen(corona_url, {'User-Agent': 'Mozilla/5.0'}, need_body=(coronainfo['world_inf'] in ('ERR', placeholder)))
+        if response is None:
+            return values
+        with response, Timed('semi corona parse'):
+            parser = parseCorona(response)
     except:
-        staticvars['vmf_stat'] = 'ERROR'
+        for key in coronainfo.keys():
+            values[key] = 'ERR'
     else:
-        staticvars['vmf_stat'] = 'Online'
+        values['world_inf'], values['world_dead'] = parser.world
+        for country, key, label in countries:
+            if country in parser.countries:
+                values[key + '_inf'], values[key + '_dead'] = parser.countries[country]
+
+    return values
+
+def cachedOpen(url, headers=None, need_body=True):
+    '''cachedOpen(url, headers=None, need_body=True): Documentation
+    Opens url through the on-disk cache in httpcache_dir, returns a file object to read the page from.
+    Within httpcache_ttl seconds of the last check, the server isn't asked at all, after that it's asked with
+    If-None-Match/If-Modified-Since whether the page changed. When it didn't (or the TTL hasn't passed),
+    None is returned, unless need_body is True, then the cached copy is returned. A page without ETag or
+    Last-Modified is cached as well, it's only fetched completely again once the TTL passed.
+    A new page is saved while it's being read, and only kept if it was read completely.
+    Errors of urllib (no internet, HTTP errors other than 304) are raised like urlopen() does.'''
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    bodypath = os.path.join(httpcache_dir, key + '.body')
+    metapath = os.path.join(httpcache_dir, key + '.json')
+    try:
+        with open(metapath) as metafile:
+            meta = json.load(metafile)
+        if not os.path.exists(bodypath):
+            meta = None
+    except (OSError, ValueError):
+        meta = None
+
+    if meta is not None and time.time() - meta['checked'] < httpcache_ttl:
+        return open(bodypath, 'rb') if need_body else None
+
+    request = urllib.request.Request(url, headers=dict(headers or {}))
+    if meta is not None:
+        if meta.get('etag'):
+            request.add_header('If-None-Match', meta['etag'])
+        if meta.get('last_modified'):
+            request.add_header('If-Modified-Since', meta['last_modified'])
+    try:
+        response = urllib.request.urlopen(request, timeout=http_timeout)
+    except urllib.error.HTTPError as error:
+        if error.code != 304 or meta is None:
+            raise
+        error.close()
+        meta['checked'] = time.time()
+        writeCacheMeta(metapath, meta)
+        return open(bodypath, 'rb') if need_body else None
+
+    meta = {'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'checked': time.time()}
+    return CacheWriter(response, bodypath, metapath, meta)
+
+def writeCacheMeta(metapath, meta):
+    '''writeCacheMeta(metapath, meta): Documentation
+    Writes the metadata of a cached page, through a temporary file so it's never half written.'''
+    with open(metapath + '.tmp', 'w') as metafile:
+        json.dump(meta, metafile)
+    os.replace(metapath + '.tmp', metapath)
+
+def evictCache(keep=None):
+    '''evictCache(keep=None): Documentation
+    Removes the least recently checked pages from httpcache_dir until it's no bigger than httpcache_max_bytes.
+    The page with metadata file keep is left alone.'''
+    entries = []
+    total = 0
+    with os.scandir(httpcache_dir) as scan:
+        for entry in scan:
+            if not entry.name.endswith('.json'):
+                continue
+            metapath = entry.path
+            bodypath = metapath[:-5] + '.body'
+            try:
+                size = os.path.getsize(bodypath)
+                with open(metapath) as metafile:
+                    checked = json.load(metafile)['checked']
+            except (OSError, ValueError, KeyError):
+                size, checked = 0, 0
+            total += size
+            entries.append((checked, metapath, bodypath, size))
+    entries.sort()
+    for checked, metapath, bodypath, size in entries:
+        if total <= httpcache_max_bytes:
+            break
+        if metapath == keep:
+            continue
+        for path in (metapath, bodypath):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= size
+
+class CacheWriter:
+    '''CacheWriter(response, bodypath, metapath, meta): Documentation
+    Wraps an HTTP response: everything that's read from it is also written to a temporary file, which
+    becomes the cached copy (with meta) once the response was read until the end and closed.'''
+    def __init__(self, response, bodypath, metapath, meta):
+        self.response = response
+        self.bodypath = bodypath
+        self.metapath = metapath
+        self.meta = meta
+        self.complete = False
+        try:
+            os.makedirs(httpcache_dir, exist_ok=True)
+            self.tempfile = open(bodypath + '.tmp', 'wb')
+        except OSError:
+            response.close() ## Nobody else has it to close
+            raise
+
+    def read(self, size=-1):
+        data = self.response.read(size)
+        self.tempfile.write(data)
+        if not data or size is None or size < 0:
+            self.complete = True
+        return data
+
+    def close(self):
+        self.response.close()
+        self.tempfile.close()
+        if self.complete:
+            os.replace(self.bodypath + '.tmp', self.bodypath)
+            writeCacheMeta(self.metapath, self.meta)
+            evictCache(keep=self.metapath)
+        else:
+            os.remove(self.bodypath + '.tmp')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is not None:
+            self.complete = False
+        self.close()
+
+def parseCorona(stream):
+    '''parseCorona(stream): Documentation
+    Parses the corona.help page from stream (anything with a read(n)) while it comes in, corona_chunk bytes
+    at a time, so the whole page never has to be in memory, and finds all numbers in one pass. Returns the CoronaParser after it's done.'''
+    parser = CoronaParser(country for country, key, label in countries)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    while True:
+        chunk = stream.read(corona_chunk)
+        if not chunk:
+            break
+        parser.feed(decoder.decode(chunk))
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    return parser
+
+class CoronaParser:
+    '''CoronaParser(wanted): Documentation
+    Incremental parser for the corona.help page, feed() it the page in pieces of any size, then close() it.
+    The first two <h1>'s on the page are the worldwide infections and deaths. Below that are two tables,
+    infections and deaths, in which every row starts with a <td><a> with the country, followed by
+    its number in a <td class="text-right">. A country's first number is its infections, the second its deaths.
+    When done, world is (infected, dead) and countries is {country: (infected, dead)} for the wanted countries.
+    Numbers that weren't found are 'ERR'.
+    Only the h1, tr, td and a tags matter, they are found with one regex (tagpattern), everything between them
+    is skipped without looking at it, so this is a lot faster than html.parser, which handles every tag.'''
+    tagpattern = re.compile(r'<(/?)(h1|tr|td|a)\b([^>]*)>')
+    innertags = re.compile(r'<[^>]*>')
+
+    def __init__(self, wanted):
+        self.wanted = set(wanted)
+        self.world = ('ERR', 'ERR')
+        self.countries = {}
+        self.buffer = '' # What's left of the last feed(), starting at a '<' that might not be complete yet
+        self.headers = [] # Texts of the <h1>'s
+        self.numbers = {} # Country: list of the numbers found for it so far
+        self.collecting = None # What the text after the last tag is: 'h1', 'country', 'number' or None if not needed
+        self.text = [] # The pieces of text of what is being collected
+        self.in_td = False
+        self.country = None # Country of the current table row
+        self.counted = False # Whether the number of the current row was found already
+
+    def feed(self, data):
+        data = self.buffer + data
+        ## Everything up to the last '<' can be handled, a tag can't be cut in half there
+        end = data.rfind('<')
+        if end == -1:
+            end = len(data)
+        self.buffer = data[end:]
+        self.handle(data, end)
+
+    def close(self):
+        self.handle(self.buffer, len(self.buffer))
+        self.buffer = ''
+        headers = self.headers + ['ERR', 'ERR']
+        self.world = (headers[0], headers[1])
+        for country, numbers in self.numbers.items():
+            numbers = numbers + ['ERR', 'ERR']
+            self.countries[country] = (numbers[0], numbers[1])
+
+    def handle(self, data, end):
+        position = 0
+        for tag in self.tagpattern.finditer(data, 0, end):
+            if self.collecting is not None:
+                self.text.append(data[position:tag.start()])
+            position = tag.end()
+            closing, name, attrs = tag.groups()
+            if closing:
+                if name == 'td':
+                    self.in_td = False
+                    if self.collecting == 'number':
+                        self.endText()
+                elif name == 'a' and self.collecting == 'country':
+                    self.endText()
+                elif name == 'h1' and self.collecting == 'h1':
+                    self.endText()
+            elif name == 'tr':
+                self.country = None
+                self.counted = False
+            elif name == 'td':
+                self.in_td = True
+                if self.country is not None and not self.counted and 'text-right' in attrs:
+                    self.collecting = 'number'
+            elif name == 'a':
+                if self.in_td and self.country is None and self.collecting is None:
+                    self.collecting = 'country'
+            elif name == 'h1' and len(self.headers) < 2:
+                self.collecting = 'h1'
+        if self.collecting is not None:
+            self.text.append(data[position:end])
+
+    def endText(self):
+        text = html.unescape(self.innertags.sub('', ''.join(self.text))).strip()
+        if self.collecting == 'h1':
+            self.headers.append(text)
+        elif self.collecting == 'country':
+            self.country = text
+        elif self.collecting == 'number':
+            self.counted = True
+            if self.country in self.wanted:
+                self.numbers.setdefault(self.country, []).append(text)
+        self.collecting = None
+        self.text = []
+
+def networkFollowUps():
+    '''networkFollowUps(): Documentation
+    Decides which jobs have to follow a finished collectNetwork(), out of 'speed' and 'corona'.
+    When the speed test is disabled or there is no internet, the speed values are set here directly.
+    Returns a list of job names (see jobs)'''
+    followups = []
+    # Internet speed
+    if not testmode:
+        if speeddeferred:
+            pass ## Right after startup, startDeferred() starts it
+        elif speedDue():
+            if staticvars['www_access'] == 'Established':
+                followups.append('speed')
+            else:
+                staticvars['speed_up'] = staticvars['speed_down'] = staticvars['ping'] = 'ERR'
+    else:
+        staticvars['speed_up'] = staticvars['speed_down'] = staticvars['ping'] = 'DISABLED'
 
     # Corona info
     if staticvars['www_access'] == 'Established':
-        try:
-            request = urllib.request.Request("https://corona.help/", headers={'User-Agent': 'Mozilla/5.0'}) # https://corona.help does not like Python, so we give it the finger and call ourself Firefox
-            html = urllib.request.urlopen(request).read()
-            html = html.decode('utf-8').split('\n')
-
-            lookNext = False
-            lookAfterNext = False
-            foundInfected = False
-            foundDeathcount = False
-            firstRound = True
-            foundChina = False
-            country_string = ""
-            for line in html:
-                try:
-                    if lookNext == True:
-                        lookNext = False
-                        line = line.strip()
-                        if line[:23] == '<td class="text-right">':
-                            i = 23
-                            number_string = ""
-                            while True:
-                                if line[i] != '<':
-                                    number_string += line[i]
-                                    i += 1
-                                else:
-                                    break
-                            if country_string == 'Mainland China':
-                                if not foundChina:
-                                    foundChina = True
-                                    coronainfo['cn_inf'] = number_string
-                                else:
-                                    firstRound = False
-                                    coronainfo['cn_dead'] = number_string
-                            elif country_string == 'Italy':
-                                if firstRound:
-                                    coronainfo['it_inf'] = number_string
-                                else:
-                                    coronainfo['it_dead'] = number_string
-                            elif country_string == 'Netherlands':
-                                if firstRound:
-                                    coronainfo['nl_inf'] = number_string
-                                else:
-                                    coronainfo['nl_dead'] = number_string
-
-                    elif lookAfterNext == True: # Skip the next one (probably </td>) and then check
-                        lookAfterNext = False
-                        lookNext = True
-
-                    elif line.strip()[:6] == '<td><a':
-                        # Change the first '>', because we want to find the second one
-                        i = line.replace('>', '-', 1).find('>') + 1
-                        country_string = ""
-                        while True:
-                            if line[i] != '<':
-                                country_string += line[i]
-                                i += 1
-                            else:
-                                break
-                        if country_string in countries:
-                            lookAfterNext = True
-                    elif line.strip()[:4] == '<h1>': # There are only 3 lines in the document with the first header
-                        number_string = ""
-                        line = line.strip()
-                        i = 4
-                        while True:
-                            if line[i] != '<':
-                                number_string += line[i]
-                                i += 1
-                            else:
-                                break
-                        if not foundInfected:
-                            foundInfected = True
-                            coronainfo['world_inf'] = number_string
-                        else:
-                            if not foundDeathcount:
-                                foundDeathcount = True
-                                coronainfo['world_dead'] = number_string
-                except Exception as e: ## If somehow this throws an error, we don't need the line anyway
-                    pass
-        except:
-            for key in coronainfo.keys():
-                coronainfo[key] = 'ERR'
+        followups.append('corona')
+    return followups
+
+def speedDue():
+    '''speedDue(): Documentation
+    Keeps count of the updateSemiOften() runs, returns True once every internet_interval runs,
+    which is when the internet speed should be measured.'''
+    if staticvars['internet_count'] >= staticvars['internet_interval']:
+        staticvars['internet_count'] = 1
+        return True
+    staticvars['internet_count'] += 1
+    return False
+
+def updateSemiOften():
+    '''updateSemiOften(): Documentation
+    This function retrieves info that needs to stay up-to-date, but shouldn't be updated
+    every few seconds. This function is supposed to be called every 10-15 minutes.
+    Data includes: 'pinging google to test internet connection' (don't do that every few seconds)
+    'nagging systemd for info about all services' and 'updating IP addresses'
+    While the dashboard is running, the same work is done on the worker pool, see startSemiOften()
+    '''
+    problem = False
+    staticvars.update(collectNetwork())
+    recordHistory('network')
+
+    # Internet speed and Corona info, both need the internet access that was just checked
+    for job in networkFollowUps():
+        function, target = jobs[job]
+        target.update(function())
 
     # Save the time at which this was updated
     staticvars['semi_update_hour'] = staticvars['hour']
@@ -331,769 +1157,2511 @@ def updateOften():
     '''updateOften(): Documentation
     This retrieves the info that's updated every few seconds.
     I didn't plan to make this a function, but it is going to look a lot cleaner
-    in the function that prints everything to the screen.'''
+    in the function that prints everything to the screen.
+    Everything in here is read straight from /proc and /sys through procRead(), because
+    forking 'uptime', 'ps' and 'free' every tick cost more CPU than the numbers are worth.'''
     problem = False
     # Uptime
-    uptime = subprocess.run(['uptime', '-p'], stdout=subprocess.PIPE)
-    uptime = uptime.stdout.decode('utf-8').strip()
-    staticvars['uptime'] = uptime[3:] # Output is 'up x hours, xx minutes' - remove the 'up '
+    try:
+        with Timed('often uptime'):
+            staticvars['uptime'] = readUptime()
+    except (OSError, ValueError, IndexError):
+        staticvars['uptime'] = 'ERR'
+        problem = True
 
     # Processes
-    processlist = subprocess.run(['ps', '-A'], stdout=subprocess.PIPE)
-    processlist = processlist.stdout.decode('utf-8').split('\n')
-    staticvars['processes'] = len(processlist) -1
+    try:
+        with Timed('often processes'):
+            staticvars['processes'] = scanProcesses()
+            top = processtable.top(1)
+            staticvars['top_process'] = "{} {:.0f}%".format(top[0].name, top[0].cpu) if top else ''
+    except OSError:
+        staticvars['processes'] = 'ERR'
+        staticvars['top_process'] = ''
+        problem = True
+
+    # CPU usage
+    try:
+        with Timed('often cpu'):
+            usage = readCpuStats()
+        if usage != None:
+            staticvars['cpu'] = round(usage[0][0])
+            staticvars['cpu_iowait'] = round(usage[0][1], 1)
+            staticvars['cpu_steal'] = round(usage[0][2], 1)
+            staticvars['cpu_cores'] = [round(busy) for busy, iowait, steal in usage[1:]]
+    except (OSError, ValueError):
+        staticvars['cpu'] = 'ERR'
+        staticvars['cpu_cores'] = []
+
+    # Network traffic
+    try:
+        with Timed('often net dev'):
+            staticvars['net_rates'] = readNetDev()
+    except (OSError, ValueError):
+        staticvars['net_rates'] = {}
+
+    # Load average
+    try:
+        with Timed('often loadavg'):
+            staticvars['loadavg'] = readLoadavg()
+    except (OSError, ValueError, IndexError):
+        staticvars['loadavg'] = 'ERR'
 
     # CPU Temp
-    with open('/sys/class/thermal/thermal_zone0/temp', 'r') as cputempfile:
-        cputemp = cputempfile.read()
-    cputemp = cputemp.strip()
     try:
-        cputemp = round(int(cputemp) / 1000, 1)
-    except ValueError:
+        with Timed('often cputemp'):
+            cputemp = procRead(thermal_path).strip()
+            cputemp = round(int(cputemp) / 1000, 1)
+    except (OSError, ValueError):
         cputemp = 'ERR'
     staticvars['cputemp'] = cputemp
 
     # Memory
-    staticvars['total_mem'], staticvars['used_mem'] = map(int, os.popen('free -t -m').readlines()[1].split()[1:3])
+    try:
+        with Timed('often memory'):
+            staticvars['total_mem'], staticvars['used_mem'] = readMeminfo()
+    except (OSError, ValueError, KeyError):
+        problem = True
 
     # Signal strength internet/wifi
-    if staticvars['wipaddr'] != 'Not connected':
-        try:
-            staticvars['essid'] = staticvars['sig_pow'] = staticvars['sig_qua'] = 'ERROR'
-            iw_output = subprocess.run(['iwconfig', 'wlan0'], stdout=subprocess.PIPE)
-            iw_output = iw_output.stdout.decode('utf-8').split('\n')
-            staticvars['essid'] = iw_output[0][iw_output[0].find("ESSID") + 7:].strip().strip('"')
-            staticvars['sig_pow'] = iw_output[5][iw_output[5].find("Signal level") + 13:].strip()
-            signal_qual = iw_output[5][iw_output[5].find("Quality")+8:iw_output[5].find("70")-1]
-            signal_percentage = int(signal_qual) * 10 / 7
-            staticvars['sig_qua'] = str(int(round(signal_percentage,0))) + '%'
-        except:
-            pass # Don't crash when the internet suddenly dies
+    ## Used to fork 'iwconfig wlan0' every tick, now it's a read of /proc/net/wireless and two ioctls
+    try:
+        with Timed('often wireless'):
+            link = readWireless()
+    except (OSError, ValueError, IndexError):
+        staticvars['essid'] = staticvars['sig_pow'] = staticvars['sig_qua'] = 'ERR'
+        staticvars['bitrate'] = ''
+        problem = True
     else:
-        staticvars['sig_pow'] = staticvars['sig_qua'] = 'N/A' 
-        staticvars['essid'] = 'Nothing'
+        if link == None:
+            staticvars['sig_pow'] = staticvars['sig_qua'] = 'N/A'
+            staticvars['essid'] = 'Nothing'
+            staticvars['bitrate'] = ''
+        else:
+            staticvars['essid'] = link['essid'] if link['essid'] != None else 'ERR'
+            staticvars['sig_pow'] = "{:.0f} dBm".format(link['level'])
+            staticvars['sig_qua'] = "{:.0f}%".format(link['quality'])
+            staticvars['bitrate'] = "{:.0f} Mbit/s".format(link['bitrate'] / 1e6) if link['bitrate'] else ''
+    staticvars['wifi_event'] = wirelessEvent()
 
     # Time
     staticvars['hour'] = time.strftime("%H", time.localtime())
     staticvars['minute'] = time.strftime("%M", time.localtime())
 
+    # History, for the sparklines
+    recordHistory('often')
+    publishMetrics()
+
     if problem:
         return False
     else:
         return True
 
+def procRead(path):
+    '''procRead(path): Documentation
+    Returns the contents of a /proc or /sys file as a string.
+    The file is opened once and its descriptor is kept in procfiles, every next call
+    re-reads it from offset 0 with os.pread(), so a tick costs a single read() syscall
+    instead of an open/read/close (or a fork/exec of some command line tool).'''
+    fd = procfiles.get(path)
+    if fd is None:
+        fd = os.open(path, os.O_RDONLY)
+        procfiles[path] = fd
+    chunks = []
+    offset = 0
+    while True:
+        try:
+            chunk = os.pread(fd, 4096, offset)
+        except OSError:
+            ## The file went away (or the descriptor went stale), forget about it so it's reopened next time
+            del procfiles[path]
+            os.close(fd)
+            raise
+        chunks.append(chunk)
+        if len(chunk) < 4096:
+            break
+        offset += len(chunk)
+    return b''.join(chunks).decode('utf-8')
+
+def procClose():
+    '''procClose(): Documentation
+    Closes all file descriptors that were opened by procRead().'''
+    for fd in procfiles.values():
+        os.close(fd)
+    procfiles.clear()
+
+def readUptime():
+    '''readUptime(): Documentation
+    Reads /proc/uptime and returns it formatted the way 'uptime -p' did, without the 'up '.'''
+    return formatUptime(float(procRead(proc_root + '/uptime').split()[0]))
+
+def formatUptime(seconds):
+    '''formatUptime(seconds): Documentation
+    Formats an amount of seconds like 'uptime -p' does: '1 week, 2 days, 3 hours, 1 minute'.
+    Parts that are zero are left out, if everything is zero, '0 minutes' is returned.'''
+    minutes = int(seconds) // 60
+    parts = []
+    for name, size in (('week', 10080), ('day', 1440), ('hour', 60), ('minute', 1)):
+        amount = minutes // size
+        minutes -= amount * size
+        if amount:
+            parts.append(str(amount) + ' ' + name + ('s' if amount != 1 else ''))
+    if not parts:
+        return '0 minutes'
+    return ', '.join(parts)
+
+def readMeminfo():
+    '''readMeminfo(): Documentation
+    Reads /proc/meminfo and returns (total, used) in MiB, the same numbers 'free -m' shows.
+    Used memory is total minus available, falls back to free+buffers+cached on kernels without MemAvailable.'''
+    meminfo = {}
+    for line in procRead(proc_root + '/meminfo').split('\n'):
+        name, _, value = line.partition(':')
+        if value:
+            meminfo[name] = int(value.split()[0]) # Values are in kB
+    if 'MemAvailable' in meminfo:
+        available = meminfo['MemAvailable']
+    else:
+        available = meminfo['MemFree'] + meminfo['Buffers'] + meminfo['Cached']
+    return meminfo['MemTotal'] // 1024, (meminfo['MemTotal'] - available) // 1024
+
+class CpuStats:
+    '''CpuStats(): Documentation
+    Keeps the last cpu_history readings of the CPU time counters in /proc/stat: the 'cpu' line (all cores
+    together) and a 'cpuN' line per core, 8 counters each (user, nice, system, idle, iowait, irq, softirq, steal,
+    in clock ticks). A reading is one flat array.array of unsigned 64 bit ints, so the deltas between two
+    readings are worked out in one go for all cores, and usage() can give the usage over any amount of ticks
+    without reading the file again. Cores that go offline are left out of /proc/stat, the history starts over then.'''
+    fields = 8
+
+    def __init__(self):
+        self.readings = collections.deque(maxlen=cpu_history) ## (time.monotonic(), array of counters)
+        self.cores = 0
+
+    def read(self):
+        '''Reads /proc/stat and keeps the counters'''
+        counters = array.array('Q')
+        cores = -1
+        for line in procRead(proc_root + '/stat').split('\n'):
+            if not line.startswith('cpu'):
+                break ## The cpu lines come first
+            counters.extend(int(value) for value in line.split()[1:self.fields + 1])
+            cores += 1
+        if cores != self.cores:
+            self.readings.clear()
+            self.cores = cores
+        self.readings.append((time.monotonic(), counters))
+
+    def usage(self, ticks=1):
+        '''Returns the usage between the last reading and the one ticks readings before it (or the oldest one),
+        as a list of (busy, iowait, steal) percentages: first all cores together, then every core.
+        None when there's only one reading yet.'''
+        if len(self.readings) < 2:
+            return None
+        old = self.readings[max(0, len(self.readings) - 1 - ticks)][1]
+        new = self.readings[-1][1]
+        deltas = list(map(operator.sub, new, old))
+        usage = []
+        for start in range(0, len(deltas), self.fields):
+            user, nice, system, idle, iowait, irq, softirq, steal = deltas[start:start + self.fields]
+            total = sum(deltas[start:start + self.fields])
+            if total <= 0:
+                usage.append((0.0, 0.0, 0.0))
+            else:
+                usage.append(((total - idle - iowait) * 100 / total, iowait * 100 / total, steal * 100 / total))
+        return usage
+
+class NetDevStats:
+    '''NetDevStats(): Documentation
+    Turns the byte and packet counters of every interface in /proc/net/dev into rates per second:
+    received and sent bytes and packets, smoothed with an exponentially weighted moving average (EWMA)
+    with a time constant of netdev_smoothing seconds, so a single busy tick doesn't make the numbers jump.
+    The weight follows the actual time between two reads, so a late tick doesn't count for more than it should.
+    Interfaces that appear start at their first rate, the ones that disappear are forgotten, and a counter
+    that went down (the interface was reset) starts the interface over.'''
+    def __init__(self):
+        self.counters = {} ## interface: (time.monotonic(), (rx bytes, tx bytes, rx packets, tx packets))
+        self.rates = {} ## interface: [rx bytes/s, tx bytes/s, rx packets/s, tx packets/s], smoothed
+
+    def read(self):
+        '''Reads /proc/net/dev and updates the rates, returns them'''
+        now = time.monotonic()
+        seen = set()
+        for line in procRead(proc_root + '/net/dev').split('\n')[2:]:
+            interface, _, values = line.partition(':')
+            values = values.split()
+            if len(values) < 10:
+                continue
+            interface = interface.strip()
+            counters = (int(values[0]), int(values[8]), int(values[1]), int(values[9]))
+            seen.add(interface)
+            previous = self.counters.get(interface)
+            self.counters[interface] = (now, counters)
+            if previous == None or now <= previous[0]:
+                continue
+            elapsed = now - previous[0]
+            deltas = list(map(operator.sub, counters, previous[1]))
+            if min(deltas) < 0:
+                self.rates.pop(interface, None)
+                continue
+            rates = [delta / elapsed for delta in deltas]
+            if interface not in self.rates:
+                self.rates[interface] = rates
+            else:
+                weight = 1 - math.exp(-elapsed / netdev_smoothing)
+                self.rates[interface] = [old + weight * (rate - old) for old, rate in zip(self.rates[interface], rates)]
+        for interface in [interface for interface in self.counters if interface not in seen]:
+            del self.counters[interface]
+            self.rates.pop(interface, None)
+        return self.rates
+
+def readNetDev():
+    '''readNetDev(): Documentation
+    Reads /proc/net/dev with the NetDevStats (made the first time), returns a copy of the smoothed rates
+    per interface: {interface: (rx bytes/s, tx bytes/s, rx packets/s, tx packets/s)}'''
+    global netdevstats
+    if netdevstats == None:
+        netdevstats = NetDevStats()
+    return {interface: tuple(rates) for interface, rates in netdevstats.read().items()}
+
+def formatRate(rate):
+    '''formatRate(rate): Documentation
+    A rate in bytes per second in at most 6 characters, like '512B', '12.3K' or '1.2M' '''
+    for unit, size in (('G', 1 << 30), ('M', 1 << 20), ('K', 1 << 10)):
+        if rate >= size:
+            return "{:.1f}{}".format(rate / size, unit) if rate < 100 * size else "{:.0f}{}".format(rate / size, unit)
+    return "{:.0f}B".format(rate)
+
+def trafficText(rates):
+    '''trafficText(rates): Documentation
+    The received and sent bytes per second of an interface as shown on the screen, or '' without rates'''
+    if rates == None:
+        return ''
+    return u'\N{DOWNWARDS ARROW}' + formatRate(rates[0]) + ' ' + u'\N{UPWARDS ARROW}' + formatRate(rates[1])
+
+class WirelessStats:
+    '''WirelessStats(interface): Documentation
+    The wifi link of interface: the quality and signal level from /proc/net/wireless, the access point, ESSID,
+    bit rate and the scale of the quality from the wireless extension ioctls, the calls iwconfig makes, without forking it.
+    The access point is asked on every read, the ESSID and the scale only when it changed. Changes of the access point,
+    and the link going away and coming back, are kept in events, so a roam or a drop can be seen afterwards.'''
+    SIOCGIWRANGE, SIOCGIWAP, SIOCGIWESSID, SIOCGIWRATE = 0x8B0B, 0x8B15, 0x8B1B, 0x8B21 ## From linux/wireless.h
+    range_size = 2048 ## Room for a struct iw_range, max_qual.qual is byte 44 of it
+    essid_size = 33 ## IW_ESSID_MAX_SIZE, and the terminating zero some drivers add
+
+    def __init__(self, interface):
+        self.interface = interface
+        self.name = interface.encode('utf-8')[:15]
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.buffer = array.array('B', bytes(self.range_size)) ## The ioctls that return more than 16 bytes write in here
+        self.connected = False
+        self.ap = None ## MAC address of the access point
+        self.essid = None
+        self.max_quality = None ## Quality the driver counts up to, None when it doesn't say
+        self.events = collections.deque(maxlen=wireless_events) ## (time.time(), 'roam', 'drop' or 'connect', access point)
+
+    def read(self):
+        '''Returns the link as a dict of essid, level (dBm), quality (percent) and bitrate (bit/s, None when unknown),
+        or None when interface isn't connected'''
+        values = None
+        try:
+            lines = procRead(proc_root + '/net/wireless').split('\n')[2:]
+        except FileNotFoundError: ## There's no wifi (driver) at all
+            lines = []
+        for line in lines:
+            interface, _, fields = line.partition(':')
+            if interface.strip() == self.interface:
+                values = fields.split()
+                break
+        ap = self.accessPoint() if values != None else None
+        if values == None or ap == False:
+            if self.connected:
+                self.events.append((time.time(), 'drop', self.ap))
+            self.connected = False
+            return None
+        if not self.connected and self.events:
+            self.events.append((time.time(), 'connect', ap))
+        elif self.connected and ap != self.ap:
+            self.events.append((time.time(), 'roam', ap))
+        if ap != self.ap or not self.connected:
+            self.ap = ap
+            self.essid = self.readEssid()
+            self.max_quality = self.readMaxQuality()
+        self.connected = True
+        quality, level = (float(value.rstrip('.')) for value in values[1:3])
+        if self.max_quality:
+            quality = quality / self.max_quality * 100
+        else: ## No scale from the driver, cfg80211 makes the quality out of the level the same way: -110 to -40 dBm
+            quality = (level + 110) / 70 * 100
+        return {'essid': self.essid, 'level': level, 'quality': min(100, max(0, quality)), 'bitrate': self.readBitrate()}
+
+    def request(self, number, length=0):
+        '''Makes a wireless extension ioctl and returns the 16 bytes of the answer (union iwreq_data).
+        With a length, it points the driver at buffer for the rest of the answer, up to length bytes.'''
+        request = bytearray(struct.pack('16sPHH', self.name, self.buffer.buffer_info()[0], length, 0).ljust(32, b'\0'))
+        fcntl.ioctl(self.sock.fileno(), number, request)
+        return bytes(request[16:])
+
+    def accessPoint(self):
+        '''The MAC address of the access point, None when the driver doesn't say, False when it isn't associated'''
+        try:
+            ap = self.request(self.SIOCGIWAP)[2:8] ## struct sockaddr, the address is the start of sa_data
+        except OSError:
+            return None
+        if ap in (bytes(6), b'\x44' * 6, b'\xff' * 6): ## What drivers answer when they're not associated
+            return False
+        return ':'.join('{:02x}'.format(byte) for byte in ap)
+
+    def readEssid(self):
+        try:
+            length = struct.unpack_from('PH', self.request(self.SIOCGIWESSID, self.essid_size))[1]
+        except OSError:
+            return None
+        return self.buffer[:min(length, self.essid_size)].tobytes().rstrip(b'\0').decode('utf-8', 'replace')
+
+    def readMaxQuality(self):
+        try:
+            self.request(self.SIOCGIWRANGE, self.range_size)
+        except OSError:
+            return None
+        return self.buffer[44] or None
+
+    def readBitrate(self):
+        try:
+            return struct.unpack_from('i', self.request(self.SIOCGIWRATE))[0] or None
+        except OSError:
+            return None
+
+def readWireless():
+    '''readWireless(): Documentation
+    Reads the link of wlan_interface with the WirelessStats (made the first time), returns WirelessStats.read()'''
+    global wirelessstats
+    if wirelessstats == None or wirelessstats.interface != wlan_interface:
+        wirelessstats = WirelessStats(wlan_interface)
+    return wirelessstats.read()
+
+def wirelessEvent():
+    '''wirelessEvent(): Documentation
+    The last roam, drop or reconnect of the wifi as shown behind the ESSID, like 'roamed 3m ago',
+    as long as it's within the history on the screen, '' otherwise'''
+    if wirelessstats == None or not wirelessstats.events:
+        return ''
+    when, kind, ap = wirelessstats.events[-1]
+    ago = time.time() - when
+    if ago > history_size * staticvars['interval']:
+        return ''
+    words = {'roam': 'roamed', 'drop': 'dropped', 'connect': 'back'}
+    return "{} {}m ago".format(words[kind], int(ago // 60)) if ago >= 60 else "{} {}s ago".format(words[kind], int(ago))
+
+def readCpuStats():
+    '''readCpuStats(): Documentation
+    Reads /proc/stat with the CpuStats (made the first time), returns its usage() since the last tick'''
+    global cpustats
+    if cpustats == None:
+        cpustats = CpuStats()
+    cpustats.read()
+    return cpustats.usage()
+
+def cpuBars(cores, width):
+    '''cpuBars(cores, width): Documentation
+    Returns the writeSegments() segments of a bar per core, in at most width characters, cores is a list of busy percentages.
+    A core gets '[###   ]' when there's room for that, otherwise a single sparkline_ramp character.'''
+    if not cores:
+        return ()
+    barwidth = min(8, width // len(cores) - 2)
+    segments = []
+    if barwidth < 2:
+        ramp = ''.join(sparkline_ramp[min(len(sparkline_ramp) - 1, int(busy * len(sparkline_ramp) / 100))] for busy in cores[:width])
+        return ((ramp, curses.color_pair(6)),)
+    for busy in cores:
+        filled = int(round(busy * barwidth / 100))
+        segments.append(('[', curses.A_DIM))
+        segments.append(('#' * filled, curses.color_pair(1) if busy >= 80 else curses.color_pair(6)))
+        segments.append((' ' * (barwidth - filled) + ']', curses.A_DIM))
+    return segments
+
+def readLoadavg():
+    '''readLoadavg(): Documentation
+    Reads /proc/loadavg and returns the 1, 5 and 15 minute load averages as a string like "0.15 0.10 0.05"'''
+    return ' '.join(procRead(proc_root + '/loadavg').split()[:3])
+
+class ProcessEntry:
+    '''ProcessEntry(pid, starttime): Documentation
+    What ProcessTable knows about one process: its name, CPU ticks and resident memory at the last time
+    its stat file was read (sampled, a time.monotonic()), and the CPU usage in percent since the read before that.'''
+    __slots__ = ('pid', 'starttime', 'name', 'ticks', 'rss', 'cpu', 'sampled')
+
+    def __init__(self, pid, starttime):
+        self.pid = pid
+        self.starttime = starttime
+        self.name = ''
+        self.ticks = 0
+        self.rss = 0
+        self.cpu = 0.0
+        self.sampled = None
+
+class ProcessTable:
+    '''ProcessTable(): Documentation
+    Keeps a ProcessEntry for every process in proc_root, for the CPU usage and memory of the top list ('o').
+    Every scan() lists the PID directories (os.scandir(), cheap), drops the entries of the processes that exited,
+    so the table never holds more than what's running, and then reads /proc/<pid>/stat for as many processes as
+    process_budget allows, continuing where the last scan stopped. With a few hundred processes on a Pi, a tick
+    only reads part of them, but as every entry keeps the time of its own last read, its CPU usage stays right.
+    A PID that was reused by a new process is recognised by its start time.'''
+    def __init__(self):
+        self.entries = {} ## pid: ProcessEntry
+        self.count = 0
+        self.nextpid = 0 ## Where the next scan starts reading
+        self.lastread = 0 ## Stat files read by the last scan
+        self.clock_ticks = os.sysconf('SC_CLK_TCK')
+        self.page_size = os.sysconf('SC_PAGE_SIZE')
+
+    def scan(self):
+        '''Lists the processes and reads the stat files of as many of them as the budget allows, returns the amount of processes'''
+        with os.scandir(proc_root) as directory:
+            pids = sorted(int(entry.name) for entry in directory if entry.name.isdigit())
+        self.count = len(pids)
+        running = set(pids)
+        for pid in [pid for pid in self.entries if pid not in running]:
+            del self.entries[pid]
+
+        ## Round robin, starting with the first PID the last scan didn't get to
+        first = bisect.bisect_left(pids, self.nextpid)
+        order = pids[first:] + pids[:first]
+        deadline = time.thread_time() + process_budget
+        self.lastread = 0
+        for pid in order:
+            if self.lastread % 16 == 0 and self.lastread and time.thread_time() > deadline:
+                self.nextpid = pid
+                break
+            self.readStat(pid)
+            self.lastread += 1
+        else:
+            self.nextpid = 0
+        return self.count
+
+    def readStat(self, pid):
+        '''Reads /proc/<pid>/stat into the entry of pid, processes that exit in the meantime are left out'''
+        try:
+            fd = os.open(os.path.join(proc_root, str(pid), 'stat'), os.O_RDONLY)
+            try:
+                stat = os.read(fd, 1024)
+            finally:
+                os.close(fd)
+            ## The name is between parentheses and can contain spaces and parentheses itself
+            name, fields = stat.rsplit(b')', 1)
+            name = name.split(b'(', 1)[1]
+            fields = fields.split()
+            ticks = int(fields[11]) + int(fields[12]) ## utime + stime
+            starttime = int(fields[19])
+            rss = int(fields[21]) ## Resident pages, the same counter as the second field of statm
+        except (OSError, ValueError, IndexError):
+            self.entries.pop(pid, None)
+            return
+        now = time.monotonic()
+        entry = self.entries.get(pid)
+        if entry == None or entry.starttime != starttime:
+            entry = self.entries[pid] = ProcessEntry(pid, starttime)
+            entry.name = name.decode('utf-8', 'replace')
+        elif now > entry.sampled:
+            entry.cpu = (ticks - entry.ticks) / self.clock_ticks / (now - entry.sampled) * 100
+        entry.ticks = ticks
+        entry.rss = rss * self.page_size
+        entry.sampled = now
+
+    def top(self, n, key='cpu'):
+        '''Returns the n processes that use the most CPU ('cpu') or memory ('rss'), the most first.
+        heapq.nlargest() keeps a heap of n entries, instead of sorting the whole table'''
+        return heapq.nlargest(n, self.entries.values(), key=operator.attrgetter(key))
+
+def scanProcesses():
+    '''scanProcesses(): Documentation
+    Scans the processes with the ProcessTable (made the first time), returns the amount of processes'''
+    global processtable
+    if processtable == None:
+        processtable = ProcessTable()
+    return processtable.scan()
+
+## The jobs that can run on the worker pool: name: (collector function, dict that receives its values)
+jobs = {'static':  (collectStaticInfo, staticvars),
+        'updates': (collectUpdates, staticvars),
+        'network': (collectNetwork, staticvars),
+        'interfaces': (collectInterfaces, staticvars),
+        'speed':   (collectSpeed, staticvars),
+        'corona':  (collectCorona, coronainfo)}
+
+def startJob(job):
+    '''startJob(job): Documentation
+    Runs a job (see jobs) on the worker pool, unless it's already running.
+    The result comes back through jobresults, and is only applied by applyResults() on the UI thread.
+    Returns True if the job was started.'''
+    if job in refreshing:
+        return False
+    refreshing.add(job)
+    workerpool.submit(runJob, job)
+    return True
+
+def runJob(job):
+    '''runJob(job): Documentation
+    Runs on a worker thread. Calls the collector of job and puts its values on jobresults.'''
+    problem = False
+    try:
+        values = jobs[job][0]()
+    except Exception:
+        values = {}
+        problem = True
+    jobresults.put((job, values, problem))
+    if jobnotify is not None:
+        jobnotify()
+
+def startSemiOften():
+    '''startSemiOften(): Documentation
+    The worker pool version of updateSemiOften(), returns right away.
+    The network job runs first, speed and corona are started when its results are in.'''
+    # Save the time at which this was started, so it isn't started again while it runs
+    staticvars['semi_update_hour'] = staticvars['hour']
+    staticvars['semi_update_minute'] = staticvars['minute']
+    startJob('network')
+
+def startDeferred():
+    '''startDeferred(): Documentation
+    Starts the slow checks that main() leaves until startup_defer seconds after the first frame:
+    the upgradable packages and the speed test. The speed test needs to know whether there's internet,
+    when the network job isn't done yet, networkFollowUps() starts it when it is.'''
+    global speeddeferred
+    speeddeferred = False
+    startDaily()
+    if not testmode and 'network' not in refreshing and staticvars['www_access'] == 'Established' and speedDue():
+        startJob('speed')
+
+def fillPlaceholders():
+    '''fillPlaceholders(): Documentation
+    Fills the values that are collected on the worker pool with placeholder, so the screen can be drawn
+    before the first results are in. Values that are already there are kept.'''
+    for key in ('hostname', 'kernel', 'eth_bssid', 'wifi_bssid', 'updateamount', 'wipaddr', 'lipaddr', 'www_access', 'www_latency',
+                'speed_down', 'speed_up', 'ping', 'semi_update_hour', 'semi_update_minute', 'daily_update_hour', 'daily_update_minute'):
+        if key not in staticvars or key == 'updateamount':
+            staticvars[key] = placeholder
+    for key, value in coronainfo.items():
+        if value == 'ERR':
+            coronainfo[key] = placeholder
+
+def startDaily():
+    '''startDaily(): Documentation
+    The worker pool version of updateDaily(), returns right away.'''
+    # Save the time at which this was started, so it isn't started again while it runs
+    staticvars['daily_update_hour'] = staticvars['hour']
+    staticvars['daily_update_minute'] = staticvars['minute']
+    startJob('updates')
+
+class RingBuffer:
+    '''RingBuffer(capacity): Documentation
+    Fixed size history of one metric. The samples are C doubles in an array.array, 8 bytes each,
+    allocated once: when it's full the oldest sample is overwritten, so it never grows.
+    Samples that couldn't be read are stored as NaN, so the samples stay one interval apart.'''
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.samples = array.array('d', bytes(8 * capacity))
+        self.head = 0 ## Where the next sample goes
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        self.samples[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def recent(self, n):
+        '''Returns (at most) the last n samples as a list, oldest first'''
+        n = min(n, self.count)
+        start = (self.head - n) % self.capacity
+        if start + n <= self.capacity:
+            return self.samples[start:start + n].tolist()
+        return self.samples[start:].tolist() + self.samples[:self.head].tolist()
+
+def metricValue(name):
+    '''metricValue(name): Documentation
+    Returns the current value of a metric in history as a float, or NaN when it couldn't be read.
+    Most of them are kept in staticvars as something that's meant for the screen, like '74%'.'''
+    try:
+        if name == 'memory': ## Used memory in percent
+            return int(staticvars['used_mem']) / int(staticvars['total_mem']) * 100
+        elif name == 'loadavg': ## 1 minute load average
+            return float(staticvars['loadavg'].split()[0])
+        elif name == 'sig_qua':
+            return float(staticvars['sig_qua'].rstrip('%'))
+        else: ## cputemp, processes, www_latency
+            return float(staticvars[name])
+    except (KeyError, ValueError, TypeError, AttributeError, IndexError, ZeroDivisionError):
+        return float('nan')
+
+def historyRing(name):
+    '''historyRing(name): Documentation
+    Returns the RingBuffer of a metric in history, it's created the first time.'''
+    if name not in history:
+        history[name] = RingBuffer(history_size)
+    return history[name]
+
+def recordHistory(group):
+    '''recordHistory(group): Documentation
+    Appends the current value of each of the metrics of a group in history_groups to its RingBuffer,
+    and to the metric log of the group, if it could be opened.'''
+    values = [metricValue(name) for name in history_groups[group]]
+    for name, value in zip(history_groups[group], values):
+        historyRing(name).append(value)
+    if group in metriclogs:
+        try:
+            metriclogs[group].append(time.time(), values)
+        except (OSError, ValueError):
+            del metriclogs[group] ## Keep going without it, the history in memory is still there
+
+def sparkline(ring, width, low=None, high=None):
+    '''sparkline(ring, width, low=None, high=None): Documentation
+    Renders the last width samples of a RingBuffer (or None) as exactly width characters of sparkline_ramp,
+    oldest on the left. low and high are the values of the lowest and the highest level, when they're None
+    they're taken from the samples that are shown. Missing samples are shown as a space.'''
+    if ring == None:
+        return width * ' '
+    samples = ring.recent(width)
+    known = [sample for sample in samples if sample == sample] ## NaN isn't equal to itself
+    if not known:
+        return width * ' '
+    if low == None:
+        low = min(known)
+    if high == None:
+        high = max(known)
+    top = len(sparkline_ramp) - 1
+    line = ''
+    for sample in samples:
+        if sample != sample:
+            line += ' '
+        elif high <= low:
+            line += sparkline_ramp[top // 2]
+        else:
+            line += sparkline_ramp[min(max(int(round((sample - low) / (high - low) * top)), 0), top)]
+    return line.rjust(width)
+
+class ScheduledJob:
+    '''ScheduledJob(name, interval, jitter, catchup): Documentation
+    One job of a Scheduler. due is the deadline it's planned on, deadline is the same plus its jitter.
+    sequence tells which heap entry is the current one, older entries are skipped when they come up.'''
+    __slots__ = ('name', 'interval', 'jitter', 'catchup', 'due', 'deadline', 'sequence')
+
+    def __init__(self, name, interval, jitter, catchup):
+        self.name = name
+        self.interval = interval
+        self.jitter = jitter
+        self.catchup = catchup
+        self.due = self.deadline = 0.0
+        self.sequence = 0
+
+class Scheduler:
+    '''Scheduler(clock=time.monotonic): Documentation
+    Runs jobs on deadlines of a monotonic clock, kept in a heap (heapq) of (deadline, sequence, name), so the job
+    that's due first is always on top and a loop can sleep exactly until then (timeout()).
+    Changing the system time, or NTP setting it after boot (the Pi has no RTC), doesn't move any deadline.
+    Every job has its own interval in seconds and a jitter: a random 0-jitter seconds added to every deadline,
+    so a fleet of Pis doesn't run its network checks at the same second. When a job is run late (a submenu was open,
+    the Pi was busy) its catch-up policy decides when it's due next:
+    'skip': an interval after it ran, 'keep': the next deadline on its original grid, the missed runs are dropped,
+    'all': an interval after the deadline it missed, so every missed run is done, one after the other.'''
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.queue = []
+        self.jobs = {} ## name: ScheduledJob
+        self.sequence = 0
+
+    def add(self, name, interval, jitter=0, catchup='skip', delay=None):
+        '''Adds (or replaces) a job, it's first due after delay seconds, or after its interval when delay is None'''
+        if catchup not in ('skip', 'keep', 'all'):
+            raise ValueError("Unknown catch-up policy: " + str(catchup))
+        self.jobs[name] = ScheduledJob(name, interval, jitter, catchup)
+        self.plan(self.jobs[name], self.clock() + (interval if delay == None else delay))
+
+    def once(self, name, delay):
+        '''Adds a job that's due once, after delay seconds. It's forgotten after due() returned it'''
+        self.jobs[name] = ScheduledJob(name, None, 0, 'skip')
+        self.plan(self.jobs[name], self.clock() + delay)
+
+    def plan(self, job, due):
+        '''Puts a job in the heap for deadline due (and its jitter), the entry it had before is left to go stale'''
+        job.due = due
+        job.deadline = due + (random.uniform(0, job.jitter) if job.jitter > 0 else 0)
+        self.sequence += 1
+        job.sequence = self.sequence
+        heapq.heappush(self.queue, (job.deadline, job.sequence, job.name))
+
+    def setInterval(self, name, interval):
+        '''Changes the interval of a job, its next deadline is moved to an interval after the last time it was due'''
+        job = self.jobs[name]
+        if interval != job.interval:
+            last = job.due - job.interval
+            job.interval = interval
+            self.plan(job, max(last + interval, self.clock()))
+
+    def reset(self, name):
+        '''For a job that was run outside of the scheduler (forced by the user): it's next due an interval from now'''
+        job = self.jobs[name]
+        self.plan(job, self.clock() + job.interval)
+
+    def clean(self):
+        '''Removes the stale entries from the top of the heap'''
+        while self.queue and (self.queue[0][2] not in self.jobs or self.queue[0][1] != self.jobs[self.queue[0][2]].sequence):
+            heapq.heappop(self.queue)
+
+    def timeout(self):
+        '''Returns the seconds until the next job is due, 0 when one is already due, None without jobs'''
+        self.clean()
+        if not self.queue:
+            return None
+        return max(0.0, self.queue[0][0] - self.clock())
+
+    def remaining(self, name):
+        '''Returns the seconds until a job is due, negative when it's late'''
+        return self.jobs[name].deadline - self.clock()
+
+    def due(self):
+        '''Returns the names of the jobs that are due, the first deadline first, and plans their next run.
+        A job is only returned once per call, an 'all' job that missed more runs is due again right away.'''
+        now = self.clock()
+        names = []
+        self.clean()
+        while self.queue and self.queue[0][0] <= now:
+            names.append(heapq.heappop(self.queue)[2])
+            self.clean()
+        for name in names:
+            job = self.jobs[name]
+            if job.interval == None: ## once()
+                del self.jobs[name]
+                continue
+            if job.catchup == 'skip':
+                due = now + job.interval
+            elif job.catchup == 'keep':
+                due = job.due + job.interval * ((now - job.due) // job.interval + 1)
+            else: ## 'all'
+                due = job.due + job.interval
+            self.plan(job, due)
+        return names
+
+def scheduleGroups():
+    '''scheduleGroups(): Documentation
+    Makes the Scheduler of main() with a job for every data group in schedule_groups,
+    they're first due an interval from now, as main() runs all of them at startup.'''
+    global scheduler
+    scheduler = Scheduler()
+    for group, (key, unit, jitter, catchup) in schedule_groups.items():
+        scheduler.add(group, staticvars[key] * unit, jitter, catchup)
+
+def updateIntervals():
+    '''updateIntervals(): Documentation
+    Gives the jobs of the scheduler the intervals in staticvars, for after they were changed in the 'i' submenu'''
+    for group, (key, unit, jitter, catchup) in schedule_groups.items():
+        scheduler.setInterval(group, staticvars[key] * unit)
+
+class StepTimer:
+    '''StepTimer(name): Documentation
+    The timings of one step of a collector: the durations of the last timing_window runs in a RingBuffer
+    (in milliseconds), and how often it ran and failed in total.'''
+    def __init__(self, name):
+        self.name = name
+        self.durations = RingBuffer(timing_window)
+        self.last = float('nan')
+        self.count = 0
+        self.failures = 0
+
+    def record(self, milliseconds, failed=False):
+        self.durations.append(milliseconds)
+        self.last = milliseconds
+        self.count += 1
+        if failed:
+            self.failures += 1
+
+    def stats(self):
+        '''Returns a dict with the last duration, and the p50, p95 and max of the window, in milliseconds'''
+        ordered = sorted(self.durations.recent(timing_window))
+        if not ordered:
+            return {'last': self.last, 'p50': self.last, 'p95': self.last, 'max': self.last}
+        return {'last': self.last,
+                'p50': ordered[min(len(ordered) - 1, len(ordered) // 2)],
+                'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                'max': ordered[-1]}
+
+class Timed:
+    '''Timed(name): Documentation
+    Context manager that times the code in it as a step of a collector, in the StepTimer of name in timings.
+    An exception is counted as a failure of the step and isn't caught, the collectors handle those themselves.
+    Can be used on the worker threads, a step only runs on one thread at a time.'''
+    __slots__ = ('timer', 'start')
+
+    def __init__(self, name):
+        self.timer = timings.get(name)
+        if self.timer == None:
+            self.timer = timings.setdefault(name, StepTimer(name))
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, kind, problem, traceback):
+        self.timer.record((time.perf_counter() - self.start) * 1000, kind != None)
+        return False
+
+class MetricLog:
+    '''MetricLog(basepath, names): Documentation
+    Append-only log of the metrics names on disk, in metriclog_segments segment files basepath.<n>.log.
+    The segment files are preallocated and memory mapped, a record is the time (uint32) and a float32 per metric,
+    after a 32 byte header: magic, names checksum, amount of metrics, records, records used, sequence number.
+    Appending only writes into the mapping, the pages are written out by flush(), at most every metriclog_flush
+    seconds (and by close()), there's no fsync per sample. When a segment is full, the oldest one is reused.'''
+    magic = 0x4c445052 ## 'RPDL'
+    headerwords = 8
+
+    def __init__(self, basepath, names):
+        self.names = names
+        self.width = len(names) + 1 ## Record size in 4 byte words
+        self.checksum = zlib.crc32(','.join(names).encode('utf-8'))
+        self.dirty = False
+        self.lastflush = time.monotonic()
+        self.segments = [] ## (mapping, words, floats): the mapping of a segment as uint32 and as float32
+        for number in range(metriclog_segments):
+            self.segments.append(self.openSegment('{}.{}.log'.format(basepath, number)))
+        ## Continue in the segment with the highest sequence number (the time can't be trusted, the Pi has no RTC)
+        self.current = max(self.segments, key=lambda segment: segment[1][5])
+
+    def openSegment(self, path):
+        size = 4 * (self.headerwords + metriclog_records * self.width)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)
+            os.posix_fallocate(fd, 0, size) ## Claim the blocks now, a full SD card shouldn't crash a write to the mapping
+            mapping = mmap.mmap(fd, size)
+        finally:
+            os.close(fd) ## The mapping keeps the file open
+        words = memoryview(mapping).cast('I')
+        header = (self.magic, self.checksum, len(self.names), metriclog_records)
+        if tuple(words[0:4]) != header: ## New, or written with other metrics or another size: start over
+            words[0:self.headerwords] = array.array('I', header + (0, 0, 0, 0))
+        return (mapping, words, memoryview(mapping).cast('f'))
+
+    def __len__(self):
+        return sum(segment[1][4] for segment in self.segments)
+
+    def append(self, timestamp, values):
+        mapping, words, floats = self.current
+        if words[4] >= metriclog_records:
+            mapping.flush()
+            sequence = words[5] + 1
+            ## The oldest other segment, one that was never used goes before the one with the same (zero) sequence number
+            others = [segment for segment in self.segments if segment is not self.current] or self.segments
+            self.current = min(others, key=lambda segment: (segment[1][5], segment[1][4]))
+            mapping, words, floats = self.current
+            words[4] = 0
+            words[5] = sequence
+        base = self.headerwords + words[4] * self.width
+        words[base] = int(timestamp)
+        floats[base + 1:base + self.width] = array.array('f', values)
+        words[4] += 1 ## Only counts the record once it's complete
+        self.dirty = True
+        if time.monotonic() - self.lastflush >= metriclog_flush:
+            self.flush()
+
+    def recent(self, n):
+        '''Returns the last (at most) n records, oldest first, in chunks of (times, columns) per segment.
+        These are strided memoryviews straight into the mapping, columns has one per metric, nothing is copied.'''
+        chunks = []
+        for mapping, words, floats in sorted(self.segments, key=lambda segment: segment[1][5], reverse=True):
+            count = min(words[4], n)
+            if count > 0:
+                start = self.headerwords + (words[4] - count) * self.width
+                stop = self.headerwords + words[4] * self.width
+                columns = [floats[start + metric:stop:self.width] for metric in range(1, self.width)]
+                chunks.insert(0, (words[start:stop:self.width], columns))
+            n -= count
+            if n <= 0:
+                break
+        return chunks
+
+    def flush(self):
+        if self.dirty:
+            self.current[0].flush()
+            self.dirty = False
+        self.lastflush = time.monotonic()
+
+    def close(self):
+        for mapping, words, floats in self.segments:
+            mapping.flush()
+            words.release()
+            floats.release()
+            mapping.close()
+        self.segments = []
+
+def openMetricLogs():
+    '''openMetricLogs(): Documentation
+    Opens the metric log of every group in history_groups and loads its last history_size records into history,
+    so the sparklines are already filled after a restart. Where intervals were missed (the dashboard, or the Pi, was off)
+    NaN samples are put in between, also for the time since the last record, so the graphs show the gap.
+    Returns the amount of records that were loaded.
+    When the logs can't be opened, the history is only kept in memory.'''
+    loaded = 0
+    try:
+        os.makedirs(metriclog_dir, exist_ok=True)
+        for group, names in history_groups.items():
+            metriclogs[group] = MetricLog(os.path.join(metriclog_dir, 'metrics-' + group), names)
+    except (OSError, ValueError):
+        closeMetricLogs()
+        return 0
+    now = time.time()
+    for group, log in metriclogs.items():
+        key, unit = history_intervals[group]
+        interval = staticvars[key] * unit
+        rings = [historyRing(name) for name in log.names]
+        last = None
+        for times, columns in log.recent(history_size):
+            for row, moment in enumerate(times):
+                if last != None:
+                    fillGap(rings, moment - last, interval)
+                last = moment
+                for ring, column in zip(rings, columns):
+                    ring.append(column[row])
+            loaded += len(times)
+        if last != None:
+            fillGap(rings, now - last, interval)
+    return loaded
+
+def fillGap(rings, gap, interval):
+    '''fillGap(rings, gap, interval): Documentation
+    Appends a NaN to every RingBuffer in rings for each interval that was missed in gap seconds'''
+    missed = min(history_size, int(gap / interval + 0.5) - 1)
+    for _ in range(missed):
+        for ring in rings:
+            ring.append(math.nan)
+
+def closeMetricLogs():
+    '''closeMetricLogs(): Documentation
+    Writes out and closes the metric logs, called when the program exits.'''
+    for log in metriclogs.values():
+        log.close()
+    metriclogs.clear()
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    '''MetricsHandler: Documentation
+    Answers GET /metrics with metricspage. A scrape only sends what publishMetrics() made last,
+    it never collects anything itself, so it doesn't matter how many scrapers there are.'''
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        page = metricspage
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+    def log_message(self, format, *args):
+        pass ## stderr is the curses screen
+
+def startMetricsServer():
+    '''startMetricsServer(): Documentation
+    Starts serving /metrics on metrics_port, on a thread of its own. Raises OSError when the port can't be used.'''
+    global metricsserver
+    metricsserver = http.server.ThreadingHTTPServer((metrics_address, metrics_port), MetricsHandler)
+    publishMetrics()
+    threading.Thread(target=metricsserver.serve_forever, name='metrics', daemon=True).start()
+
+def publishMetrics():
+    '''publishMetrics(): Documentation
+    Makes the /metrics page (Prometheus text format) out of staticvars and coronainfo, once per collection.
+    Values that couldn't be collected ('ERR', 'N/A') are left out. Does nothing when the server isn't running.'''
+    global metricspage
+    if metricsserver == None:
+        return
+    lines = []
+    addMetric(lines, 'rpi_dashboard_info', 'Dashboard version and the host it runs on',
+              [({'version': __version__, 'hostname': staticvars.get('hostname', ''), 'kernel': staticvars.get('kernel', '')}, 1)])
+    addMetric(lines, 'rpi_cpu_temperature_celsius', 'CPU temperature', [({}, staticvars.get('cputemp'))])
+    cpu = [({'cpu': 'all', 'mode': mode}, staticvars.get(key)) for mode, key in (('busy', 'cpu'), ('iowait', 'cpu_iowait'), ('steal', 'cpu_steal'))]
+    cpu += [({'cpu': str(core), 'mode': 'busy'}, busy) for core, busy in enumerate(staticvars.get('cpu_cores', []))]
+    addMetric(lines, 'rpi_cpu_usage_percent', 'CPU time spent busy, waiting for IO and stolen by the hypervisor, over the last interval', cpu)
+    rates = staticvars.get('net_rates', {})
+    addMetric(lines, 'rpi_network_bytes_per_second', 'Traffic per interface, moving average',
+              [({'interface': interface, 'direction': direction}, rates[interface][index]) for interface in rates for index, direction in ((0, 'receive'), (1, 'transmit'))])
+    addMetric(lines, 'rpi_network_packets_per_second', 'Packets per interface, moving average',
+              [({'interface': interface, 'direction': direction}, rates[interface][index]) for interface in rates for index, direction in ((2, 'receive'), (3, 'transmit'))])
+    addMetric(lines, 'rpi_memory_total_bytes', 'Total memory',
+              [({}, metricNumber(staticvars.get('total_mem'), 1048576))])
+    addMetric(lines, 'rpi_memory_used_bytes', 'Used memory, not counting buffers and cache',
+              [({}, metricNumber(staticvars.get('used_mem'), 1048576))])
+    addMetric(lines, 'rpi_processes', 'Amount of processes', [({}, staticvars.get('processes'))])
+    loadavg = str(staticvars.get('loadavg', '')).split()
+    addMetric(lines, 'rpi_load_average', 'Load average',
+              [({'period': period}, value) for period, value in zip(('1m', '5m', '15m'), loadavg)])
+    addMetric(lines, 'rpi_internet_up', 'Whether the internet can be reached',
+              [({}, 1 if staticvars.get('www_access') == 'Established' else 0)])
+    addMetric(lines, 'rpi_internet_latency_seconds', 'Fastest internet probe of the last network check',
+              [({}, metricNumber(staticvars.get('www_latency'), 0.001))])
+    speeds = []
+    for direction, key in (('down', 'speed_down'), ('up', 'speed_up')):
+        value = str(staticvars.get(key, ''))
+        for unit, factor in (('Gbit/s', 1e9), ('Mbit/s', 1e6), ('Kbit/s', 1e3), ('bit/s', 1)):
+            if value.endswith(unit):
+                speeds.append(({'direction': direction}, metricNumber(value[:-len(unit)], factor)))
+                break
+    addMetric(lines, 'rpi_internet_speed_bits_per_second', 'Result of the last speed test', speeds)
+    addMetric(lines, 'rpi_wifi_signal_dbm', 'Wifi signal strength', [({}, metricNumber(str(staticvars.get('sig_pow', '')).replace('dBm', '')))])
+    addMetric(lines, 'rpi_wifi_signal_quality_percent', 'Wifi signal quality', [({}, metricNumber(str(staticvars.get('sig_qua', '')).rstrip('%')))])
+    addMetric(lines, 'rpi_wifi_bitrate_bits_per_second', 'Wifi bit rate', [({}, metricNumber(str(staticvars.get('bitrate', '')).replace('Mbit/s', ''), 1e6))])
+    if wirelessstats != None:
+        addMetric(lines, 'rpi_wifi_events', 'Wifi roams, drops and reconnects that are kept',
+                  [({'kind': kind}, sum(1 for event in wirelessstats.events if event[1] == kind)) for kind in ('roam', 'drop', 'connect')])
+    addMetric(lines, 'rpi_updates_available', 'Packages that can be upgraded', [({}, staticvars.get('updateamount'))])
+    places = [('Worldwide', 'world')] + [(label, key) for country, key, label in countries]
+    addMetric(lines, 'corona_infections', 'Corona virus infections according to corona.help',
+              [({'country': label}, metricNumber(str(coronainfo[key + '_inf']).replace(',', ''))) for label, key in places])
+    addMetric(lines, 'corona_deaths', 'Corona virus deaths according to corona.help',
+              [({'country': label}, metricNumber(str(coronainfo[key + '_dead']).replace(',', ''))) for label, key in places])
+    addMetric(lines, 'rpi_dashboard_first_frame_seconds', 'Time from the start of the dashboard until the first frame was shown', [({}, firstframe)])
+    steps = [(timer.name, timer.stats()) for timer in list(timings.values())]
+    addMetric(lines, 'rpi_dashboard_step_seconds', 'Duration of a step of the collectors, over the last runs',
+              [({'step': name, 'stat': stat}, metricNumber(stats[stat], 0.001)) for name, stats in steps for stat in ('last', 'p50', 'p95', 'max')])
+    addMetric(lines, 'rpi_dashboard_step_failures', 'Times a step of the collectors failed since the start',
+              [({'step': timer.name}, timer.failures) for timer in list(timings.values())])
+    metricspage = '\n'.join(lines).encode('utf-8') + b'\n'
+
+def addMetric(lines, name, helptext, samples):
+    '''addMetric(lines, name, helptext, samples): Documentation
+    Adds a gauge to the lines of the /metrics page, samples is a list of (labels, value).
+    Samples of which the value isn't a number are skipped, without samples the gauge is left out.'''
+    samplelines = []
+    for labels, value in samples:
+        value = metricNumber(value)
+        if value == None:
+            continue
+        if labels:
+            labeltext = ','.join('{}="{}"'.format(label, str(text).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                                 for label, text in labels.items())
+            samplelines.append('{}{{{}}} {}'.format(name, labeltext, repr(value)))
+        else:
+            samplelines.append('{} {}'.format(name, repr(value)))
+    if samplelines:
+        lines.append('# HELP {} {}'.format(name, helptext))
+        lines.append('# TYPE {} gauge'.format(name))
+        lines.extend(samplelines)
+
+def metricNumber(value, factor=1):
+    '''metricNumber(value, factor=1): Documentation
+    Returns value (a number, or a string with one) times factor as a float, or None when it isn't a number.'''
+    try:
+        return float(value) * factor
+    except (TypeError, ValueError):
+        return None
+
+def applyResults(monitor):
+    '''applyResults(monitor): Documentation
+    Takes the finished jobs off jobresults, puts their values in place and redraws their panel. Doesn't wait,
+    jobnotify tells the main loop when there's something to take off.
+    Only to be called from the UI thread, returns the amount of results that were applied.'''
+    applied = 0
+    while True:
+        try:
+            job, values, problem = jobresults.get_nowait()
+        except queue.Empty:
+            break
+        jobs[job][1].update(values)
+        refreshing.discard(job)
+        if job == 'network':
+            recordHistory('network')
+        if job == 'network' and not problem:
+            for followup in networkFollowUps():
+                startJob(followup)
+        dataWriter(monitor, updateall=(job in ('static', 'interfaces')), daily=(job == 'updates'),
+                   network=(job in ('network', 'speed')), corona=(job == 'corona'))
+        applied += 1
+    if applied:
+        publishMetrics()
+    return applied
+
+class InputWaiter:
+    '''InputWaiter(fileno): Documentation
+    Lets the main loop sleep until the first of: input on fileno (stdin), a wake() (a job of the worker pool is done,
+    see jobnotify), a resize of the terminal or a timeout. It waits in a selectors.DefaultSelector (epoll) on fileno
+    and the read end of a pipe, wake() writes a byte into the pipe, so it can be called from any thread.
+    terminalResized() is the SIGWINCH handler, it sets resized and wakes the loop, which can't happen in curses:
+    its own handler only makes getkey() return a KEY_RESIZE, and the loop isn't in getkey() while it waits.'''
+    def __init__(self, fileno):
+        self.reader, self.writer = os.pipe()
+        os.set_blocking(self.reader, False)
+        os.set_blocking(self.writer, False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(fileno, selectors.EVENT_READ)
+        self.selector.register(self.reader, selectors.EVENT_READ)
+        self.resized = False
+
+    def wake(self):
+        '''Makes wait() return now, or right away the next time it's called'''
+        try:
+            os.write(self.writer, b'\0')
+        except BlockingIOError: ## The pipe is full, so wait() returns anyway
+            pass
+
+    def terminalResized(self, signum, frame):
+        '''The handler of SIGWINCH'''
+        self.resized = True
+        self.wake()
+
+    def wait(self, timeout):
+        '''Waits up to timeout seconds (None: until something happens) and empties the pipe'''
+        self.selector.select(timeout)
+        try:
+            while os.read(self.reader, 64):
+                pass
+        except BlockingIOError:
+            pass
+
+def resizeTerminal():
+    '''resizeTerminal(): Documentation
+    Tells curses the size of the terminal, for when SIGWINCH is handled here instead of by curses.
+    When it changed, curses has a KEY_RESIZE ready for the next getkey().'''
+    size = os.get_terminal_size(stdin.fileno())
+    curses.resizeterm(size.lines, size.columns)
+
+def initColours():
+    '''initColours(): Documentation
+    Sets up the colour pairs the screens use, 1 to 7: red, green, yellow, blue, magenta, cyan and white'''
+    curses.init_pair(1, curses.COLOR_RED, curses.COLOR_BLACK)
+    curses.init_pair(2, curses.COLOR_GREEN, curses.COLOR_BLACK)
+    curses.init_pair(3, curses.COLOR_YELLOW, curses.COLOR_BLACK)
+    curses.init_pair(4, curses.COLOR_BLUE, curses.COLOR_BLACK)
+    curses.init_pair(5, curses.COLOR_MAGENTA, curses.COLOR_BLACK)
+    curses.init_pair(6, curses.COLOR_CYAN, curses.COLOR_BLACK)
+    curses.init_pair(7, curses.COLOR_WHITE, curses.COLOR_BLACK)
+
 def main(monitor): ## Main function
     '''statmon.py main(monitor) documentation:
     Function takes one set variable, do not change this.
     This function is to be initiated from the curses.wrapper() function.
     This function is the main program.
     '''
-    monitor.clear()
+    global firstframe, speeddeferred, jobnotify
+    clearScreen(monitor)
     # Curses setup
     curses.noecho() # Necessary for reading key inputs
     curses.cbreak() # Don't wait for enter after keystroke
     monitor.keypad(True) # Let curses handle escape sequences
    
-    # Startup functions
-    pause = False
-    monitor.addstr(1,0,10*' ' + " > > > > > RPI Status Monitor < < < < < " + 10*' ', curses.A_BOLD)
-    monitor.addstr(4,0,">>> Running updateStaticInfo()... ")
-    monitor.refresh()
-    ok = updateStaticInfo()
-    if ok:
-        monitor.addstr("SUCCESS")
-    else:
-        pause = True
-        monitor.addstr("FAILURE")
-    monitor.addstr(6,0,">>> Running updateDaily()... ")
-    monitor.refresh()
-    ok = updateDaily()
-    if ok:
-        monitor.addstr("SUCCESS")
-    else:
-        pause = True
-        monitor.addstr("FAILURE")
-    monitor.addstr(8,0,">>> Running updateSemiOften()... ")
-    monitor.refresh()
-    ok = updateSemiOften()
-    if ok:
-        monitor.addstr("SUCCESS")
-    else:
-        pause = True
-        monitor.addstr("FAILURE")
-    monitor.addstr(10,0,">>> Running updateOften()... ")
-    monitor.refresh()
-    ok = updateOften()
-    if ok:
-        monitor.addstr("SUCCESS")
-    else:
-        pause = True
-        monitor.addstr("FAILURE")
-    monitor.refresh()
-    # Initialising colours
-    monitor.addstr(12,0,">>> Initialising terminal colours... ")
-    curses.init_pair(1, curses.COLOR_RED, curses.COLOR_BLACK)
-    curses.init_pair(2, curses.COLOR_GREEN, curses.COLOR_BLACK)
-    curses.init_pair(3, curses.COLOR_YELLOW, curses.COLOR_BLACK)
-    curses.init_pair(4, curses.COLOR_BLUE, curses.COLOR_BLACK)
-    curses.init_pair(5, curses.COLOR_MAGENTA, curses.COLOR_BLACK)
-    curses.init_pair(6, curses.COLOR_CYAN, curses.COLOR_BLACK)
-    curses.init_pair(7, curses.COLOR_WHITE, curses.COLOR_BLACK)
-    monitor.addstr("DONE")
-    # End Startup functions
-    if pause:
-        monitor.addstr(37,0,">>> Warning: error detected while executing one or more")
-        monitor.addstr(38,0,"functions. Press any key to continue")
-        monitor.getkey()
-    monitor.clear()
-
-    # Turn off the cursor (visibility)
-    curses.curs_set(0)
-
-    # Drawing the screen
+    # Startup
+    ## Progressive: the screen is drawn right away, with the local numbers (a few ms of /proc reads) and placeholders
+    ## for everything else. The other collectors run on the worker pool and fill in their panels as they finish,
+    ## the slow ones (updates, speed test) only start startup_defer seconds later, see startDeferred()
+    initColours()
+    curses.curs_set(0) # Turn off the cursor (visibility)
+    useLayout(*monitor.getmaxyx())
+    openMetricLogs() ## Before the first sample, the history is loaded from it
+    fillPlaceholders()
+    staticvars.update(collectInterfaces()) ## One netlink request, the addresses are known before the first frame
+    startInterfaceWatch()
+    updateOften()
     uiDrawer(monitor)
     dataWriter(monitor, updateall=True)
-    monitor.refresh()
+    curses.doupdate()
+    firstframe = time.monotonic() - launchtime
+    timings.setdefault('startup first frame', StepTimer('startup first frame')).record(firstframe * 1000)
+
+    speeddeferred = True
+    startJob('static')
+    startSemiOften()
+    panelStatus(monitor)
+    monitor.noutrefresh()
+    curses.doupdate()
 
     # Main program loop
     ## Turn off waiting for keypress
     monitor.nodelay(True)
+    scheduleGroups()
+    scheduler.once('deferred', startup_defer)
+    if asyncmode:
+        asyncio.run(asyncLoop(monitor))
+        return False
+    waiter = InputWaiter(stdin.fileno())
+    jobnotify = waiter.wake
+    signal.signal(signal.SIGWINCH, waiter.terminalResized)
+    waiter.wake() ## For the results that came in before jobnotify was set
     while True:
-        ## Sleep for the duration of the interval
-        curses.napms(1000*staticvars['interval'])
-        ## Add a little indication of when it's updating
-        monitor.addstr(0,29,"::", curses.color_pair(3) | curses.A_STANDOUT)
+        ## Sleep until a key is pressed, a job of the worker pool is done, the terminal is resized or a data group is due,
+        ## whichever comes first, so keys are handled right away without the groups losing their cadence
+        waiter.wait(scheduler.timeout())
+        if waiter.resized:
+            waiter.resized = False
+            resizeTerminal()
+        if applyResults(monitor):
+            curses.doupdate()
+        due = dueUpdates()
+        if due:
+            ## Add a little indication of when it's updating
+            showBusy(monitor, True)
         ## Check for keypress
         input_found = False
         while True:                             #> Loop through STDIN until there's nothing left
             try:                                #> and overwrite pressed_key every time there is input
                 pressed_key = monitor.getkey()  #> This way, we get the key that's pressed LAST
-            except curses.error:                #> Allowing you to change your input after having pressed
-                if not input_found:             #> some other key
-                    pressed_key = None          #> If you don't do this, if you smash the keyboard, your keypresses
-                break                           #> Are handled. One. by. one. by. one. by. one. VERY SLOWLY (time of interval)
+            except curses.error:                #> when a few of them came in at once
+                if not input_found:
+                    pressed_key = None
+                break
             else:
+                if pressed_key == 'KEY_RESIZE': #> Except a resize, the screen has to be laid out again whatever comes after it
+                    resizeScreen(monitor)
+                    if due:
+                        showBusy(monitor, True)
+                    curses.doupdate()
+                    pressed_key = None
                 input_found = True
-        
+        if not due and pressed_key == None:
+            continue
+
         ## Firstly, input handling
-        restore = ud_daily = ud_semi = ud_static = False
-        if pressed_key != None:
-            monitor.addstr(0,1,'Input: ' + str(pressed_key))
-            monitor.refresh()
-        if pressed_key == 'u': ## Force update something
-            ### Brings up submenu
-            restore = True
+        stop, ud_semi, ud_daily, ud_static = handleKey(monitor, pressed_key)
+        if stop:
+            return False
+        ## Secondly, updating
+        ### Forced updates count as a run, changed intervals move the deadlines
+        updateIntervals()
+        if ud_semi:
+            scheduler.reset('semi')
+        if ud_daily:
+            scheduler.reset('daily')
+        ud_semi = ud_semi or 'semi' in due
+        ud_daily = ud_daily or 'daily' in due
+
+        ### Updating, the slow groups are only started here, applyResults() shows them when they're done
+        if 'deferred' in due:
+            startDeferred()
+        if ud_semi:
+            startSemiOften()
+        if ud_daily:
+            startDaily()
+        if ud_static:
+            startJob('static')
+        if 'often' in due:
+            updateOften()
+        dataWriter(monitor)
+
+        ## Remove the indication after updating is complete, and flush everything that changed in one go
+        showBusy(monitor, False)
+        monitor.noutrefresh()
+        curses.doupdate()
 
-            submenu = curses.newwin(14,48,13,6)
+    # Testing
+    #fillscreen(monitor)
+    #showAllInfo(monitor)
+    #uiDrawer(monitor)
+    #dataWriter(monitor, updateall=True)
+    #testStyle(monitor)
+
+    monitor.refresh()
+    monitor.getkey()
+
+async def asyncLoop(monitor):
+    '''asyncLoop(monitor): Documentation
+    The main loop of the asyncio mode, which replaces the selectors loop in main() when started with 'async'.
+    A scheduler task runs the data groups when they're due: updateOften() on the loop itself (a few ms of /proc reads,
+    and the 'o' submenu scans the same ProcessTable), the slow ones on the worker pool (see startJob()),
+    so a running speed test or network check never holds up the clock, uptime or temperature.
+    Drawing is done by a single render task, which is also woken up when a job is done, and key presses
+    come in through a reader on stdin, like the selectors loop.'''
+    global jobnotify
+    loop = asyncio.get_running_loop()
+    draw = asyncio.Event()
+    rescheduled = asyncio.Event() ## Wakes the scheduler task when a key press changed the deadlines
+    keys = asyncio.Queue()
+
+    def readKeys():
+        ## Called by the event loop when stdin is readable, monitor is in nodelay mode
+        while True:
             try:
-                submenu.addstr(0,0,"+" + 46*'-' + "+", curses.A_STANDOUT | curses.color_pair(4))
-                submenu.addstr(0,17," Force Update ", curses.A_BOLD | curses.color_pair(4))
-                submenu.addstr(13,0,"+" + 46*'-' + "+", curses.A_STANDOUT | curses.color_pair(4))
+                keys.put_nowait(monitor.getkey())
             except curses.error:
-                pass
-            for i in range(1,13):
-                submenu.addstr(i,0,"|", curses.A_STANDOUT | curses.color_pair(4))
-                submenu.addstr(i,47,"|", curses.A_STANDOUT | curses.color_pair(4))
-            submenu.addstr(2,2,"Which data group would you like to update?")
-            submenu.addstr(3,2,"1) SemiOften (updated every 15 minutes)")
-            submenu.addstr(4,2,"  >IPs, Internet access, service statusses")
-            submenu.addstr(5,2,"2) Daily (updated daily)")
-            submenu.addstr(6,2,"  >OS Updates")
-            submenu.addstr(7,2,"3) Static (updated at program startup)")
-            submenu.addstr(8,2,"  >Hostname, OS, Kernel, BSSIDs")
-            submenu.addstr(9,2,"4) All")
-            submenu.addstr(11,2,"Please enter the number of the update group")
-            submenu.refresh()
+                break
 
-            ### Wait until input
-            #submenu.nodelay(False)
-            selection = submenu.getch()
-            if selection == ord('1'):
-                ud_semi = True
-            elif selection == ord('2'):
-                ud_daily = True
-            elif selection == ord('3'):
-                ud_static = True
-            elif selection == ord('4'):
-                ud_semi = ud_daily = ud_static = True
-
-        elif pressed_key == 'U': ## Force update all
-            ud_daily = ud_semi = ud_static = True
-
-        elif pressed_key == 'h': ## Bring up help screen
-            ### Brings up submenu
-            restore = True
-            
-            submenu = curses.newwin(16, 48, 12, 6)
-            try: # Curses throws an error when drawing the last character of a window, as the cursor has no place to go
-                submenu.addstr(0,0,"+" + 46* '-' + "+", curses.A_STANDOUT | curses.color_pair(4))
-                submenu.addstr(0,18," Help Menu ", curses.A_BOLD | curses.color_pair(4))
-                submenu.addstr(15,0,"+" + 46* '-' + "+", curses.A_STANDOUT | curses.color_pair(4))
-            except curses.error: # We're catching that error and ignoring the hell out of it
+    def terminalResized():
+        ## curses only finds out about a new size in getkey(), which isn't called until there's input, so it's told here.
+        ## resizeTerminal() has a KEY_RESIZE ready when the size changed, readKeys() passes it on
+        resizeTerminal()
+        readKeys()
+
+    async def scheduleTask():
+        while True:
+            try:
+                await asyncio.wait_for(rescheduled.wait(), scheduler.timeout())
+            except asyncio.TimeoutError:
                 pass
-            for i in range(1,15):
-                submenu.addstr(i,0,"|", curses.A_STANDOUT | curses.color_pair(4))
-                submenu.addstr(i,47,"|", curses.A_STANDOUT | curses.color_pair(4))
-            submenu.addstr(2,2,"Press 'q' or 'x' to exit the program")
-            submenu.addstr(3,2,"Press 'h' to bring up this menu")
-            submenu.addstr(4,2,"Press 'i' to set the refresh interval")
-            submenu.addstr(5,2,"Press 'v' to see program info and version")
-            submenu.addstr(6,2,"Press 'u' to update a data group")
-            submenu.addstr(7,2,"Press 'U' to update all data")
-            submenu.addstr(8,2,"Press 'd' to redraw the entire screen")
-            submenu.addstr(9,2,"Press 't' to see and use test functions")
-            submenu.addstr(11,2,"Pressing any of these keys now does nothing")
-            submenu.addstr(12,2,"Press any key to close this box, the press")
-            submenu.addstr(13,2,"the key you want")
+            rescheduled.clear()
+            due = dueUpdates()
+            if 'often' in due:
+                updateOften()
+            if 'semi' in due:
+                startSemiOften()
+            if 'daily' in due:
+                startDaily()
+            if 'deferred' in due:
+                startDeferred()
+            draw.set()
+
+    async def renderTask():
+        while True:
+            await draw.wait()
+            draw.clear()
+            applyResults(monitor)
+            dataWriter(monitor)
+            curses.doupdate()
+
+    tasks = [loop.create_task(scheduleTask()),
+             loop.create_task(renderTask())]
+    jobnotify = lambda: loop.call_soon_threadsafe(draw.set)
+    loop.add_reader(stdin.fileno(), readKeys)
+    loop.add_signal_handler(signal.SIGWINCH, terminalResized)
+    try:
+        while True:
+            pressed_key = await keys.get()
+            ## The submenus are modal, while one is open the event loop waits for it (the worker pool doesn't)
+            stop, ud_semi, ud_daily, ud_static = handleKey(monitor, pressed_key)
+            if stop:
+                break
+            updateIntervals()
+            if ud_semi:
+                scheduler.reset('semi')
+                startSemiOften()
+            if ud_daily:
+                scheduler.reset('daily')
+                startDaily()
+            if ud_static:
+                startJob('static')
+            rescheduled.set()
+            draw.set()
+    finally:
+        jobnotify = None
+        loop.remove_signal_handler(signal.SIGWINCH)
+        loop.remove_reader(stdin.fileno())
+        for task in tasks:
+            task.cancel()
+
+def packSnapshots(hostname, records):
+    '''packSnapshots(hostname, records): Documentation
+    Packs the records of an agent into one fleet packet, records is a list of (time, values) where values
+    has a float (NaN if it's unknown) for every one of fleet_metrics. Every record is a uint32 time and a float32
+    per metric, so a packet of 3 records is about 100 bytes.'''
+    name = hostname.encode('utf-8')[:255]
+    record = struct.Struct('<I{}f'.format(len(fleet_metrics)))
+    return b''.join([fleetheader.pack(fleetmagic, 1, len(name)), name, fleetcounts.pack(len(fleet_metrics), len(records))]
+                    + [record.pack(int(timestamp), *values) for timestamp, values in records])
+
+def unpackSnapshots(packet):
+    '''unpackSnapshots(packet): Documentation
+    Reverse of packSnapshots(), returns (hostname, records). Raises ValueError for anything that isn't a fleet packet.
+    A packet with more or fewer metrics per record (another version) is fine, only the known ones are used.'''
+    if len(packet) < fleetheader.size:
+        raise ValueError("Packet too short")
+    magic, version, namelength = fleetheader.unpack_from(packet)
+    if magic != fleetmagic or version != 1:
+        raise ValueError("Not a fleet packet")
+    offset = fleetheader.size + namelength
+    hostname = packet[fleetheader.size:offset].decode('utf-8', 'replace')
+    if len(packet) < offset + fleetcounts.size:
+        raise ValueError("Packet too short")
+    metrics, count = fleetcounts.unpack_from(packet, offset)
+    if metrics == 0:
+        raise ValueError("Packet has no metrics") ## FleetNode needs the first one, the temperature
+    offset += fleetcounts.size
+    record = struct.Struct('<I{}f'.format(metrics))
+    if len(packet) != offset + count * record.size:
+        raise ValueError("Packet has the wrong length")
+    return hostname, [(fields[0], fields[1:len(fleet_metrics) + 1]) for fields in record.iter_unpack(packet[offset:])]
+
+def portArgument(cmdarg, text):
+    '''portArgument(cmdarg, text): Documentation
+    Returns text, the port in the command line argument cmdarg, as a number. Exits with a message when it isn't a port.'''
+    if not text.isdigit() or not 0 < int(text) < 65536:
+        raise SystemExit("Not a port in '{}': '{}'".format(cmdarg, text))
+    return int(text)
+
+def agentLoop():
+    '''agentLoop(): Documentation
+    The main loop of an agent ('agent=<host>[:<port>]'): there's no screen, the metrics of updateOften() are collected
+    every interval and sent to the aggregator over UDP, fleet_batch records per packet. The network is checked
+    every semi_interval, for the internet latency. Runs until it's interrupted (Ctrl+C).'''
+    updateStaticInfo()
+    family, kind, protocol, name, address = socket.getaddrinfo(*agentaddress, type=socket.SOCK_DGRAM)[0] ## IPv4 or IPv6
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    sock.connect(address)
+    records = []
+    agentscheduler = Scheduler()
+    agentscheduler.add('network', staticvars['semi_interval'] * 60, schedule_groups['semi'][2], delay=0)
+    agentscheduler.add('often', staticvars['interval'], catchup='keep', delay=0)
+    while True:
+        time.sleep(agentscheduler.timeout())
+        due = agentscheduler.due()
+        if 'network' in due:
+            staticvars.update(collectNetwork())
+        if 'often' not in due:
+            continue
+        updateOften()
+        records.append((time.time(), [metricValue(name) for name in fleet_metrics]))
+        if len(records) >= fleet_batch:
+            try:
+                sock.send(packSnapshots(staticvars.get('hostname', socket.gethostname()), records))
+            except OSError:
+                pass ## The aggregator isn't there (yet), these records are lost, the next ones might make it
+            records = []
+
+class FleetNode:
+    '''FleetNode(hostname): Documentation
+    What the aggregator knows of one agent. Only the latest values and a fixed amount of temperature history
+    are kept, in arrays, so every agent takes the same, small amount of memory however long it keeps sending.'''
+    __slots__ = ('hostname', 'address', 'lastseen', 'packets', 'values', 'temperatures')
+
+    def __init__(self, hostname):
+        self.hostname = hostname
+        self.address = None
+        self.lastseen = 0
+        self.packets = 0
+        self.values = array.array('d', [float('nan')] * len(fleet_metrics))
+        self.temperatures = RingBuffer(fleet_history)
+
+    def update(self, address, records):
+        self.address = address
+        self.lastseen = time.monotonic()
+        self.packets += 1
+        for timestamp, values in records:
+            self.values[:len(values)] = array.array('d', values)
+            self.temperatures.append(values[0])
+
+class FleetProtocol(asyncio.DatagramProtocol):
+    '''FleetProtocol(nodes): Documentation
+    Receives the packets of the agents, on the aggregator's event loop, and keeps nodes (hostname: FleetNode) up to date.'''
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.received = 0
+        self.dropped = 0
+
+    def datagram_received(self, data, address):
+        try:
+            hostname, records = unpackSnapshots(data)
+        except (ValueError, struct.error):
+            self.dropped += 1
+            return
+        node = self.nodes.get(hostname)
+        if node == None:
+            if len(self.nodes) >= fleet_max_nodes:
+                self.dropped += 1
+                return
+            node = self.nodes[hostname] = FleetNode(hostname)
+        node.update(address, records)
+        self.received += 1
+
+def fleetSocket(port):
+    '''fleetSocket(port): Documentation
+    Returns a UDP socket bound to port for the aggregator, dual-stack (IPv6 with IPv4 mapped into it) so agents
+    can send over either, or only IPv4 where the system has no IPv6.'''
+    try:
+        sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+    except OSError:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('0.0.0.0', port))
+        return sock
+    try:
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)
+        sock.bind(('::', port))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+def fleetRows(nodes, first=0, count=None):
+    '''fleetRows(nodes, first=0, count=None): Documentation
+    Returns count rows of the fleet table (sorted by hostname), starting at row first, as lists of (text, attr)
+    segments of 57 characters. Only the rows that are asked for are formatted, there can be hundreds of agents.'''
+    now = time.monotonic()
+    rows = []
+    hostnames = sorted(nodes)
+    for hostname in hostnames[first:None if count == None else first + count]:
+        node = nodes[hostname]
+        age = now - node.lastseen
+        temperature, memory, processes, loadavg, quality, latency = node.values[:6]
+        stale = age > fleet_stale
+        segments = [("{:<12.12} ".format(hostname), curses.color_pair(1) | curses.A_BOLD if stale else curses.A_BOLD),
+                    ("{:>4} ".format(str(int(age)) + 's' if age < 1000 else '>15m'), curses.color_pair(1) if stale else curses.A_NORMAL),
+                    ("{:>5} ".format(fleetNumber(temperature, '{:.1f}')), curses.color_pair(1) if temperature > 65.0 else curses.A_NORMAL),
+                    ("{:>4} ".format(fleetNumber(memory, '{:.0f}')), curses.color_pair(1) if memory > 80.0 else curses.A_NORMAL),
+                    ("{:>5} {:>5} {:>5} ".format(fleetNumber(loadavg, '{:.2f}'), fleetNumber(processes, '{:.0f}'), fleetNumber(latency, '{:.0f}')), curses.A_NORMAL),
+                    (sparkline(node.temperatures, fleet_history), curses.color_pair(6))]
+        rows.append(segments)
+    return rows
+
+def fleetNumber(value, form):
+    '''fleetNumber(value, form): Documentation
+    Formats a value of the fleet table, '-' when it's unknown (NaN)'''
+    if value != value:
+        return '-'
+    return form.format(value)
+
+async def aggregatorLoop(monitor):
+    '''aggregatorLoop(monitor): Documentation
+    The main loop of the aggregator ('aggregator[=<port>]'): receives the packets of the agents on fleet_port
+    (FleetProtocol) and shows them in a table, a page at a time, redrawn every second. All of it runs on one event loop,
+    an agent is only a FleetNode and a dict entry. Keys: 'n'/'p' for the next/previous page, 'q' or 'x' to exit.
+    The page is as long as the screen allows (one row at least), everything is cut off at its right edge,
+    and after a resize (SIGWINCH, like asyncLoop()) it's worked out again.'''
+    loop = asyncio.get_running_loop()
+    nodes = {}
+    transport, protocol = await loop.create_datagram_endpoint(lambda: FleetProtocol(nodes), sock=fleetSocket(fleet_port))
+    keys = asyncio.Queue()
+
+    def readKeys():
+        while True:
+            try:
+                keys.put_nowait(monitor.getkey())
+            except curses.error:
+                break
+
+    def terminalResized():
+        resizeTerminal()
+        readKeys()
+
+    def show(y, x, segments):
+        ## writeSegments(), cut off at the edge of the screen, the last cell of it can't be written
+        height, width = monitor.getmaxyx()
+        width -= x + (y == height - 1)
+        if y < height and width > 0:
+            writeSegments(monitor, y, x, segments, width)
+
+    loop.add_reader(stdin.fileno(), readKeys)
+    loop.add_signal_handler(signal.SIGWINCH, terminalResized)
+    page = 0
+    try:
+        while True:
+            pagesize = max(1, monitor.getmaxyx()[0] - 7)
+            pages = max(1, (len(nodes) + pagesize - 1) // pagesize)
+            page = min(page, pages - 1)
+            rows = fleetRows(nodes, page * pagesize, pagesize)
+            stale = sum(1 for node in nodes.values() if time.monotonic() - node.lastseen > fleet_stale)
+            startFrame()
+            show(0, 1, (("Fleet overview - {} agent(s), {} stale".format(len(nodes), stale), curses.color_pair(5) | curses.A_BOLD),))
+            show(1, 40, ((time.strftime("%H :: %M"), curses.A_BOLD),))
+            show(3, 1, (("{:<12} {:>4} {:>5} {:>4} {:>5} {:>5} {:>5} {}".format('HOST', 'AGE', 'TEMP', 'MEM%', 'LOAD', 'PROCS', 'PING', 'TEMP HIST.'), curses.A_BOLD),))
+            show(4, 1, (("-" * 58, curses.color_pair(4)),))
+            for line in range(pagesize):
+                show(5 + line, 1, rows[line] if line < len(rows) else ())
+            show(5 + pagesize, 1, (("-" * 58, curses.color_pair(4)),))
+            show(6 + pagesize, 1, (("Page {}/{} | {} packets, {} dropped | n/p/q".format(page + 1, pages, protocol.received, protocol.dropped), curses.A_NORMAL),))
+            endFrame()
+            monitor.noutrefresh()
+            curses.doupdate()
+            try:
+                pressed_key = await asyncio.wait_for(keys.get(), 1)
+            except asyncio.TimeoutError:
+                continue
+            if pressed_key in ('q', 'x'):
+                break
+            elif pressed_key == 'KEY_RESIZE':
+                clearScreen(monitor)
+            elif pressed_key == 'n':
+                page = (page + 1) % pages
+            elif pressed_key == 'p':
+                page = (page - 1) % pages
+    finally:
+        loop.remove_signal_handler(signal.SIGWINCH)
+        loop.remove_reader(stdin.fileno())
+        transport.close()
+
+def aggregatorMain(monitor):
+    '''aggregatorMain(monitor): Documentation
+    Like main(), but for the aggregator, to be initiated from the curses.wrapper() function.'''
+    clearScreen(monitor)
+    curses.noecho()
+    curses.cbreak()
+    monitor.keypad(True)
+    initColours()
+    curses.curs_set(0)
+    monitor.nodelay(True)
+    asyncio.run(aggregatorLoop(monitor))
+    return False
+
+def handleKey(monitor, pressed_key):
+    '''handleKey(monitor, pressed_key): Documentation
+    Handles one key press from the main loop (None if nothing was pressed), which includes
+    bringing up and handling the submenus.
+    Returns (stop, ud_semi, ud_daily, ud_static): stop is True when the program should exit,
+    the others tell which data groups the user wants to have updated.'''
+    restore = redraw = ud_daily = ud_semi = ud_static = False
+    shown = pressed_key not in (None, 'KEY_RESIZE')
+    if shown:
+        showField(monitor, 'input', 'Input: ' + str(pressed_key))
+        monitor.refresh()
+    if pressed_key in popup_sizes and (popup_sizes[pressed_key][0] > layoutplan.rows or popup_sizes[pressed_key][1] > layoutplan.cols):
+        pressed_key = None ## The submenu doesn't fit on this screen
+    if pressed_key == 'u': ## Force update something
+        ### Brings up submenu
+        restore = True
+
+        submenu = getPopup('u')
+        submenu.refresh()
+
+        ### Wait until input
+        #submenu.nodelay(False)
+        selection = submenu.getch()
+        if selection == ord('1'):
+            ud_semi = True
+        elif selection == ord('2'):
+            ud_daily = True
+        elif selection == ord('3'):
+            ud_static = True
+        elif selection == ord('4'):
+            ud_semi = ud_daily = ud_static = True
+
+    elif pressed_key == 'p': ## Collector timings
+        ### Brings up submenu, the table is drawn again every second until a key is pressed
+        restore = True
+
+        submenu = getPopup('p')
+        submenu.timeout(1000)
+        while True:
+            drawTimings(submenu)
             submenu.refresh()
+            if submenu.getch() != -1:
+                break
 
-            ### Wait until keypress
-            #submenu.nodelay(False)
-            submenu.getkey()
-
-        elif pressed_key in ('q', 'x'): ## Exit
-            monitor.clear()
-            monitor.addstr(16,8,"  _____                 _ _                ", curses.A_BOLD)
-            monitor.addstr(17,8," / ____|               | | |               ", curses.A_BOLD)
-            monitor.addstr(18,8,"| |  __  ___   ___   __| | |__  _   _  ___ ", curses.A_BOLD)
-            monitor.addstr(19,8,"| | |_ |/ _ \\ / _ \\ / _` | '_ \\| | | |/ _ \\", curses.A_BOLD)
-            monitor.addstr(20,8,"| |__| _ (_) | (_) | (_| | |_) | |_| |  __/", curses.A_BOLD)
-            monitor.addstr(21,8," \\_____|\\___/ \\___/ \\__,_|_.__/ \\__, |\\___|", curses.A_BOLD)
-            monitor.addstr(22,8,"                                 __/ |     ", curses.A_BOLD)
-            monitor.addstr(23,8,"                                |___/     ", curses.A_BOLD)
-            monitor.refresh()
-            time.sleep(1)
-            return False
-
-        elif pressed_key == 'i': ## Set interval
-            ### Brings up submenu
-            restore = True
+    elif pressed_key == 'o': ## Top processes
+        ### Brings up submenu, scanned and drawn again every second until a key other than 'c' or 'm' is pressed
+        restore = True
 
-            submenu = curses.newwin(24, 46, 8, 7)
-            interval_container =          curses.newwin(1, 3, 14, 19)
-            semi_interval_container =     curses.newwin(1, 5, 19, 24)
-            internet_interval_container = curses.newwin(1, 2, 24, 20)
+        submenu = getPopup('o')
+        submenu.timeout(1000)
+        order = 'cpu'
+        while True:
             try:
-                submenu.addstr(0,0, "+" + 44 * '-' + "+", curses.A_STANDOUT | curses.color_pair(4))
-                submenu.addstr(0,18," Interval ", curses.A_BOLD | curses.color_pair(4))
-                submenu.addstr(23,0, "+" + 44 * '-' + "+", curses.A_STANDOUT | curses.color_pair(4))
-            except curses.error:
+                scanProcesses()
+            except OSError:
                 pass
-            for i in range(1,23):
-                submenu.addstr(i,0,"|", curses.A_STANDOUT | curses.color_pair(4))
-                submenu.addstr(i,45,"|", curses.A_STANDOUT | curses.color_pair(4))
-            submenu.addstr( 2,2,"Set new update interval in seconds.")
-            submenu.addstr( 3,2,"Current: {}s | Min: 1 - Max: 59".format(staticvars['interval']))
-            submenu.addstr( 4,2,"Warning!", curses.A_BOLD)
-            submenu.addstr(" Input is read ")
-            submenu.addstr("ONCE", curses.A_BOLD)
-            submenu.addstr(" every interval")
-            submenu.addstr( 6,2,"Interval: __ seconds")
-            submenu.addstr( 8,2,"Set new updateSemi() interval in minutes.")
-            submenu.addstr( 9,2,"Current: {}m | Min: 1 - Max: 1420".format(staticvars['semi_interval']))
-            submenu.addstr(11,2,"Semi Interval: ____ minutes")
-            submenu.addstr(13,2,"Set when internet speed is calculated")
-            submenu.addstr(14,2,"Current: once every {0} time(s)".format(staticvars['internet_interval']))
-            submenu.addstr(16,2,"Once every _ time(s) updateSemi() runs.")
-            submenu.addstr(18,2,"Input starts at first field, press enter")
-            submenu.addstr(19,2,"to select next field. Leave empty to keep")
-            submenu.addstr(20,2,"old value. Press 'c' to cancel without")
-            submenu.addstr(21,2,"saving. Press 's' to save changes.")
+            drawProcesses(submenu, order)
             submenu.refresh()
+            selection = submenu.getch()
+            if selection == ord('c'):
+                order = 'cpu'
+            elif selection == ord('m'):
+                order = 'rss'
+            elif selection != -1:
+                break
+
+    elif pressed_key == 'U': ## Force update all
+        ud_daily = ud_semi = ud_static = True
+
+    elif pressed_key == 'h': ## Bring up help screen
+        ### Brings up submenu
+        restore = True
+        
+        submenu = getPopup('h')
+        submenu.refresh()
+
+        ### Wait until keypress
+        #submenu.nodelay(False)
+        submenu.getkey()
+
+    elif pressed_key in ('q', 'x'): ## Exit
+        clearScreen(monitor)
+        top, left = centred(8, 43)
+        for row, line in enumerate(("  _____                 _ _                ",
+                                   " / ____|               | | |               ",
+                                   "| |  __  ___   ___   __| | |__  _   _  ___ ",
+                                   "| | |_ |/ _ \\ / _ \\ / _` | '_ \\| | | |/ _ \\",
+                                   "| |__| _ (_) | (_) | (_| | |_) | |_| |  __/",
+                                   " \\_____|\\___/ \\___/ \\__,_|_.__/ \\__, |\\___|",
+                                   "                                 __/ |     ",
+                                   "                                |___/     ")):
+            try:
+                monitor.addstr(top + row, left, line, curses.A_BOLD)
+            except curses.error: ## The screen is too small for it
+                pass
+        monitor.refresh()
+        time.sleep(1)
+        return True, False, False, False
+
+    elif pressed_key == 'i': ## Set interval
+        ### Brings up submenu
+        restore = True
+
+        submenu = getPopup('i')
+        top, left = submenu.getbegyx()
+        interval_container =          curses.newwin(1, 3, top + 6, left + 12)
+        semi_interval_container =     curses.newwin(1, 5, top + 11, left + 17)
+        internet_interval_container = curses.newwin(1, 2, top + 16, left + 13)
+        ### The current values are the only part of the submenu that changes
+        submenu.addstr( 3,2,"Current: {}s | Min: 1 - Max: 59".format(staticvars['interval']).ljust(42))
+        submenu.addstr( 9,2,"Current: {}m | Min: 1 - Max: 1420".format(staticvars['semi_interval']).ljust(42))
+        submenu.addstr(14,2,"Current: once every {0} time(s)".format(staticvars['internet_interval']).ljust(42))
+        submenu.refresh()
+
+        ### Input
+        stop = False
+        curses.curs_set(1) # Make the cursor visible again
+        ## Normal
+        textbox = curses.textpad.Textbox(interval_container)
+        textbox.edit()
+        check_interval = textbox.gather()
+        if check_interval == 'c':
+            stop = True
+        
+        ## Semi
+        if not stop:
+            textbox = curses.textpad.Textbox(semi_interval_container)
+            textbox.edit()
+            check_semi_interval = textbox.gather()
+            if check_semi_interval == 'c':
+                stop = True
 
-            ### Input
-            stop = False
-            curses.curs_set(1) # Make the cursor visible again
-            ## Normal
-            textbox = curses.textpad.Textbox(interval_container)
+        ## Internet
+        if not stop:
+            textbox = curses.textpad.Textbox(internet_interval_container)
             textbox.edit()
-            check_interval = textbox.gather()
-            if check_interval == 'c':
+            check_internet_interval = textbox.gather()
+            if check_internet_interval == 'c':
                 stop = True
+
+        ## Input checking
+        if not stop:
+            normal_change = semi_change = internet_change = False
+            # Normal
+            try:
+                int(check_interval)
+            except ValueError:
+                pass
+            else:
+                if int(check_interval) > 0 and int(check_interval) < 60:
+                    old_interval = staticvars['interval']
+                    staticvars['interval'] = int(check_interval)
+                    normal_change = True
+
+            try:
+                int(check_semi_interval)
+            except ValueError:
+                pass
+            else:
+                if int(check_semi_interval) > 0 and int(check_interval) < 1421:
+                    old_semi_interval = staticvars['semi_interval']
+                    staticvars['semi_interval'] = int(check_semi_interval)
+                    semi_change = True
+
+            try:
+                int(check_internet_interval)
+            except ValueError:
+                pass
+            else:
+                if int(check_internet_interval) > 0 and int(check_internet_interval) < 10:
+                    old_internet_interval = staticvars['internet_interval']
+                    staticvars['internet_interval'] = int(check_internet_interval)
+                    internet_change = True
+
+            changes = 0
+            for thingy in (normal_change, semi_change, internet_change):
+                if thingy == True:
+                    changes +=1
             
-            ## Semi
-            if not stop:
-                textbox = curses.textpad.Textbox(semi_interval_container)
-                textbox.edit()
-                check_semi_interval = textbox.gather()
-                if check_semi_interval == 'c':
-                    stop = True
-
-            ## Internet
-            if not stop:
-                textbox = curses.textpad.Textbox(internet_interval_container)
-                textbox.edit()
-                check_internet_interval = textbox.gather()
-                if check_internet_interval == 'c':
-                    stop = True
-
-            ## Input checking
-            if not stop:
-                normal_change = semi_change = internet_change = False
-                # Normal
+            if changes > 0:
+                height = changes + 6
+                message = curses.newwin(height, 42, *centred(height, 42))
+                
                 try:
-                    int(check_interval)
-                except ValueError:
+                    message.addstr(0,0,"+" + 40* '-' + "+", curses.color_pair(4) | curses.A_STANDOUT)
+                    message.addstr(0,10," Interval Value Check ", curses.color_pair(4))
+                    message.addstr(height-1,0,"+" + 40* '-' + "+", curses.color_pair(4) | curses.A_STANDOUT)
+                except curses.error:
                     pass
-                else:
-                    if int(check_interval) > 0 and int(check_interval) < 60:
-                        old_interval = staticvars['interval']
-                        staticvars['interval'] = int(check_interval)
-                        normal_change = True
-    
+
+                for i in range(1,height-1):
+                    message.addstr(i,0,"|", curses.color_pair(4) | curses.A_STANDOUT)
+                    message.addstr(i,41,"|", curses.color_pair(4) | curses.A_STANDOUT)
+
+                message.move(2,2)
+                if normal_change:
+                    message.addstr("Changed update interval from {} to {}".format(old_interval, staticvars['interval']))
+                    message.move(message.getyx()[0]+1,2)
+                if semi_change:
+                    message.addstr("Changed semi interval from {} to {}".format(old_semi_interval, staticvars['semi_interval']))
+                    message.move(message.getyx()[0]+1,2)
+                if internet_change:
+                    message.addstr("Changed internet interval from {} to {}".format(old_internet_interval, staticvars['internet_interval']))
+
+                message.addstr(changes+3,2,"Press 'c' to cancel, press 's' to save")
+
+                while True:
+                    ivc_action = message.getkey()
+                    if ivc_action == 'c':
+                        staticvars['interval'] = old_interval
+                        staticvars['semi_interval'] = old_semi_interval
+                        staticvars['internet_interval'] = old_internet_interval
+                        stop = True
+                        break
+                    elif ivc_action == 's':
+                        break
+
+            else:
+                message = curses.newwin(6, 22, *centred(6, 22))
                 try:
-                    int(check_semi_interval)
-                except ValueError:
+                    message.addstr(0,0,"+" * 22, curses.color_pair(4) | curses.A_STANDOUT)
+                    message.addstr(0,1," Interval Value Check ", curses.color_pair(4))
+                    message.addstr(5,0,"+" + '-' * 20 + "+", curses.color_pair(4) | curses.A_STANDOUT)
+                except curses.error:
                     pass
-                else:
-                    if int(check_semi_interval) > 0 and int(check_interval) < 1421:
-                        old_semi_interval = staticvars['semi_interval']
-                        staticvars['semi_interval'] = int(check_semi_interval)
-                        semi_change = True
-    
+                for i in range(1,5):
+                    message.addstr(i,0,"|", curses.color_pair(4) | curses.A_STANDOUT)
+                    message.addstr(i,21,"|", curses.color_pair(4) | curses.A_STANDOUT)
+                message.addstr(2,2,"No changes were made")
+                message.addstr(3,3,"Returning to home")
+                message.refresh()
+                curses.napms(1000)
+
+        if changes > 0:
+            if stop:
+                ### Cancel message
+                popup = curses.newwin(5, 12, *centred(5, 12))
                 try:
-                    int(check_internet_interval)
-                except ValueError:
+                    popup.addstr(0,0,"+" + 10*'-' + "+", curses.color_pair(1) | curses.A_STANDOUT)
+                    popup.addstr(4,0,"+" + 10*'-' + "+", curses.color_pair(1) | curses.A_STANDOUT)
+                except curses.error:
                     pass
-                else:
-                    if int(check_internet_interval) > 0 and int(check_internet_interval) < 10:
-                        old_internet_interval = staticvars['internet_interval']
-                        staticvars['internet_interval'] = int(check_internet_interval)
-                        internet_change = True
-    
-                changes = 0
-                for thingy in (normal_change, semi_change, internet_change):
-                    if thingy == True:
-                        changes +=1
-                
-                if changes > 0:
-                    height = changes + 6
-                    if changes == 2:
-                        message = curses.newwin(height, 42, int((40-height)/2), 9)
-                    else:
-                        message = curses.newwin(height, 42, int((39-height)/2), 9)
-                    
-                    try:
-                        message.addstr(0,0,"+" + 40* '-' + "+", curses.color_pair(4) | curses.A_STANDOUT)
-                        message.addstr(0,10," Interval Value Check ", curses.color_pair(4))
-                        message.addstr(height-1,0,"+" + 40* '-' + "+", curses.color_pair(4) | curses.A_STANDOUT)
-                    except curses.error:
-                        pass
-
-                    for i in range(1,height-1):
-                        message.addstr(i,0,"|", curses.color_pair(4) | curses.A_STANDOUT)
-                        message.addstr(i,41,"|", curses.color_pair(4) | curses.A_STANDOUT)
-
-                    message.move(2,2)
-                    if normal_change:
-                        message.addstr("Changed update interval from {} to {}".format(old_interval, staticvars['interval']))
-                        message.move(message.getyx()[0]+1,2)
-                    if semi_change:
-                        message.addstr("Changed semi interval from {} to {}".format(old_semi_interval, staticvars['semi_interval']))
-                        message.move(message.getyx()[0]+1,2)
-                    if internet_change:
-                        message.addstr("Changed internet interval from {} to {}".format(old_internet_interval, staticvars['internet_interval']))
-
-                    message.addstr(changes+3,2,"Press 'c' to cancel, press 's' to save")
-
-                    while True:
-                        ivc_action = message.getkey()
-                        if ivc_action == 'c':
-                            staticvars['interval'] = old_interval
-                            staticvars['semi_interval'] = old_semi_interval
-                            staticvars['internet_interval'] = old_internet_interval
-                            stop = True
-                            break
-                        elif ivc_action == 's':
-                            break
-
-                else:
-                    message = curses.newwin(6,22,17,19)
-                    try:
-                        message.addstr(0,0,"+" * 22, curses.color_pair(4) | curses.A_STANDOUT)
-                        message.addstr(0,1," Interval Value Check ", curses.color_pair(4))
-                        message.addstr(5,0,"+" + '-' * 20 + "+", curses.color_pair(4) | curses.A_STANDOUT)
-                    except curses.error:
-                        pass
-                    for i in range(1,5):
-                        message.addstr(i,0,"|", curses.color_pair(4) | curses.A_STANDOUT)
-                        message.addstr(i,21,"|", curses.color_pair(4) | curses.A_STANDOUT)
-                    message.addstr(2,2,"No changes were made")
-                    message.addstr(3,3,"Returning to home")
-                    message.refresh()
-                    curses.napms(1000)
+                for i in range(1,4):
+                    popup.addstr(i,0,"|", curses.color_pair(1) | curses.A_STANDOUT)
+                    popup.addstr(i,11,"|", curses.color_pair(1) | curses.A_STANDOUT)
 
-            if changes > 0:
-                if stop:
-                    ### Cancel message
-                    popup = curses.newwin(5,12,17,24)
-                    try:
-                        popup.addstr(0,0,"+" + 10*'-' + "+", curses.color_pair(1) | curses.A_STANDOUT)
-                        popup.addstr(4,0,"+" + 10*'-' + "+", curses.color_pair(1) | curses.A_STANDOUT)
-                    except curses.error:
-                        pass
-                    for i in range(1,4):
-                        popup.addstr(i,0,"|", curses.color_pair(1) | curses.A_STANDOUT)
-                        popup.addstr(i,11,"|", curses.color_pair(1) | curses.A_STANDOUT)
-    
-                    popup.addstr(2,2,"CANCELED", curses.color_pair(1) | curses.A_STANDOUT)
-                    popup.refresh()
-                    curses.napms(1200)
-    
-                else:
-                    ### Saved message
-                    popup = curses.newwin(5,18,17,21)
-                    try:
-                        popup.addstr(0,0,"+" + 16*'-' + "+", curses.color_pair(2) | curses.A_STANDOUT)
-                        popup.addstr(4,0,"+" + 16*'-' + "+", curses.color_pair(2) | curses.A_STANDOUT)
-                    except curses.error:
-                        pass
-                    for i in range(1,4):
-                        popup.addstr(i,0,"|", curses.color_pair(2) | curses.A_STANDOUT)
-                        popup.addstr(i,17,"|", curses.color_pair(2) | curses.A_STANDOUT)
-    
-                    popup.addstr(2,2,"CHANGES  SAVED", curses.color_pair(2) | curses.A_STANDOUT)
-                    popup.refresh()
-                    curses.napms(1200)
+                popup.addstr(2,2,"CANCELED", curses.color_pair(1) | curses.A_STANDOUT)
+                popup.refresh()
+                curses.napms(1200)
 
-            curses.curs_set(0) # Make the cursor invisible
-                    
-        elif pressed_key == 'v': ## Program info and version
-            ### Brings up submenu
-            restore = True
+            else:
+                ### Saved message
+                popup = curses.newwin(5, 18, *centred(5, 18))
+                try:
+                    popup.addstr(0,0,"+" + 16*'-' + "+", curses.color_pair(2) | curses.A_STANDOUT)
+                    popup.addstr(4,0,"+" + 16*'-' + "+", curses.color_pair(2) | curses.A_STANDOUT)
+                except curses.error:
+                    pass
+                for i in range(1,4):
+                    popup.addstr(i,0,"|", curses.color_pair(2) | curses.A_STANDOUT)
+                    popup.addstr(i,17,"|", curses.color_pair(2) | curses.A_STANDOUT)
 
-            submenu = curses.newwin(18,52,11,4)
-            try:
-                submenu.addstr( 0,0,"+" + 50 * '-' + "+", curses.A_STANDOUT | curses.color_pair(4))
-                submenu.addstr(0,13," Program Info and Version ", curses.color_pair(4))
-                submenu.addstr(17,0,"+" + 50 * '-' + "+", curses.A_STANDOUT | curses.color_pair(4))
-            except curses.error:
-                pass
-            for i in range(1,17):
-                submenu.addstr(i,0,"|", curses.A_STANDOUT | curses.color_pair(4))
-                submenu.addstr(i,51,"|", curses.A_STANDOUT | curses.color_pair(4))
-            submenu.addstr(2,2,"Raspberry PI Status Monitor V")
-            submenu.addstr(__version__, curses.A_BOLD | curses.color_pair(4))
-            submenu.addstr(3,2,"Created by ")
-            submenu.addstr("JTC", curses.color_pair(3))
-            submenu.addstr(", June-July 2019")
-            submenu.addstr(4,2,"Made for a small GPIO touch screen (60x40 chars)")
-            submenu.addstr(5,2,"480x320px SPI TFTLCD, mouse/touch not supported")
-            submenu.addstr(6,2,"Tested on a Raspberry PI 3b - Raspbian 9 CLI")
-            submenu.addstr(7,2,"Written in Python 3.7.3 on Arch Linux")
-            submenu.addstr(8,2,"Current Python version: " + str(version_info[0]) + '.' + str(version_info[1]) + '.' + str(version_info[2]))
-            submenu.addstr(10,2,"This software is completely free to use, modify")
-            submenu.addstr(11,2,"copy, distribute or do whatever else with.")
-            submenu.addstr(12,2,"Though it might be too specialised to be of")
-            submenu.addstr(13,2,"much use, you can do with it as you please.")
-            submenu.addstr(14,2,"If you do use (parts of) this program,")
-            submenu.addstr(15,2,"a shoutout is appreciated, but not mandatory.")
-            submenu.refresh()
+                popup.addstr(2,2,"CHANGES  SAVED", curses.color_pair(2) | curses.A_STANDOUT)
+                popup.refresh()
+                curses.napms(1200)
 
-            ### Wait for keypress
-            #submenu.nodelay(False)
-            submenu.getkey()
-        elif pressed_key == 'd': ## Redraw screen
-            monitor.clear()
-            uiDrawer(monitor)
-            dataWriter(monitor, updateall=True)
-        elif pressed_key == 't': ## Test functions
-            ### Brings up submenu
-            restore = True
-
-            submenu = curses.newwin(12,36,14,12)
-            try:
-                submenu.addstr(0,0,"+" + 34 * "-" + "+", curses.A_STANDOUT | curses.color_pair(4))
-                submenu.addstr(0,10," Test Functions ", curses.A_BOLD | curses.color_pair(4))
-                submenu.addstr(11,0,"+" + 34 * "-" + "+", curses.A_STANDOUT | curses.color_pair(4))
-            except curses.error:
-                pass
-            for i in range(1,11):
-                submenu.addstr(i,0,"|", curses.A_STANDOUT | curses.color_pair(4))
-                submenu.addstr(i,35,"|", curses.A_STANDOUT | curses.color_pair(4))
-            submenu.addstr(2,2,"1) testStyle()")
-            submenu.addstr(3,2,"  > Prints colours and effects")
-            submenu.addstr(4,2,"2) showAllInfo()")
-            submenu.addstr(5,2,"  > Shows all info unformatted")
-            submenu.addstr(6,2,"3) fillscreen()")
-            submenu.addstr(7,2,"  > Fills the screen with chars")
-            submenu.addstr(9,2,"Enter the number of the function")
-            submenu.refresh()
-
-            ### Wait for input
-            #submenu.nodelay(False)
-            selection = submenu.getch()
-            if selection in (ord('1'), ord('2'), ord('3')):
-                monitor.nodelay(False)
-            if selection == ord('1'):
-                testStyle(monitor)
-                monitor.refresh()
-                monitor.getkey()
-            elif selection == ord('2'):
-                showAllInfo(monitor)
-                monitor.refresh()
-                monitor.getkey()
-            elif selection == ord('3'):
-                fillscreen(monitor)
-                monitor.refresh()
-                monitor.getkey()
-
-        monitor.addstr(0,1," " * 20) # Remove the input message
-        monitor.refresh()
-        if restore:
-            monitor.clear()
-            monitor.nodelay(True)
-            uiDrawer(monitor)
-            dataWriter(monitor, updateall=True)
+        curses.curs_set(0) # Make the cursor invisible
+                
+    elif pressed_key == 'v': ## Program info and version
+        ### Brings up submenu
+        restore = True
+
+        submenu = getPopup('v')
+        submenu.refresh()
+
+        ### Wait for keypress
+        #submenu.nodelay(False)
+        submenu.getkey()
+    elif pressed_key == 'd': ## Redraw screen
+        redraw = True
+    elif pressed_key == 't': ## Test functions
+        ### Brings up submenu
+        restore = True
+
+        submenu = getPopup('t')
+        submenu.refresh()
+
+        ### Wait for input
+        #submenu.nodelay(False)
+        selection = submenu.getch()
+        if selection in (ord('1'), ord('2'), ord('3')):
+            monitor.nodelay(False)
+            redraw = True # The test functions use the whole screen
+        if selection == ord('1'):
+            testStyle(monitor)
             monitor.refresh()
-        if pressed_key != None: ## Clear the 'Input: ' message
-            monitor.addstr(0,1, 20*' ')
+            monitor.getkey()
+        elif selection == ord('2'):
+            showAllInfo(monitor)
             monitor.refresh()
-        ## Secondly, updating
-        ### Check what needs to be updated
-        if timeCalculator(staticvars['hour'],staticvars['minute'],staticvars['semi_update_hour'],staticvars['semi_update_minute'],staticvars['semi_interval']):
-            ud_semi = True
-        if timeCalculator(staticvars['hour'],staticvars['minute'],staticvars['daily_update_hour'],staticvars['daily_update_minute'],1420):
-            ud_daily = True
-        ### Check what needs to be updated next
-        time_till_semi  = timeCalTheSecond(staticvars['hour'], staticvars['minute'], staticvars['semi_update_hour'], staticvars['semi_update_minute'],staticvars['semi_interval'])
-        time_till_daily = timeCalTheSecond(staticvars['hour'], staticvars['minute'], staticvars['daily_update_hour'], staticvars['daily_update_minute'],1420)
-        if time_till_daily <= time_till_semi:
-            staticvars['nextupdate'] = 'daily'
-            staticvars['updatemin'] = time_till_daily
-        else:
-            staticvars['nextupdate'] = 'normal'
-            staticvars['updatemin'] = time_till_semi
+            monitor.getkey()
+        elif selection == ord('3'):
+            fillscreen(monitor)
+            monitor.refresh()
+            monitor.getkey()
 
-        ### Updating
-        updateOften()
-        dataWriter(monitor)
-        if ud_semi:
-            ud_semi = False
-            updateSemiOften()
-            dataWriter(monitor, semi_often=True)
-        if ud_daily:
-            ud_daily = False
-            updateDaily()
-            dataWriter(monitor, daily=True)
-        if ud_static:
-            ud_static = False
-            updateStaticInfo()
-            dataWriter(monitor, updateall=True)
-        
-        ## Remove the indication after updating is complete
-        monitor.addstr(0,29,"::", curses.color_pair(3))
-        monitor.refresh()
+    monitor.nodelay(True)
+    if pressed_key == 'KEY_RESIZE' or monitor.getmaxyx() != (layoutplan.rows, layoutplan.cols):
+        resizeScreen(monitor) ## Also when the terminal was resized while a submenu was open
+    elif redraw:
+        clearScreen(monitor)
+        uiDrawer(monitor)
+        dataWriter(monitor, updateall=True)
+    elif restore: ## Only the part of the screen under the submenu has to be drawn again
+        restoreRegion(monitor, submenu)
+    if shown: ## Clear the 'Input: ' message
+        showField(monitor, 'input', '')
+        monitor.noutrefresh()
+        curses.doupdate()
+    return False, ud_semi, ud_daily, ud_static
+
+def getPopup(key):
+    '''getPopup(key): Documentation
+    Returns the submenu window that belongs to a key ('u', 'h', 'i', 'v', 't', 'p' or 'o').
+    A submenu is only built the first time it's needed, after that the same window is used again,
+    touchwin() makes sure all of it is drawn again on the next refresh().'''
+    if key not in popups:
+        popups[key] = buildPopup(key)
+    popups[key].touchwin()
+    return popups[key]
+
+def buildPopup(key):
+    '''buildPopup(key): Documentation
+    Creates and draws the submenu window of a key, see getPopup(). It's the size in popup_sizes, in the middle of the screen.'''
+    height, width = popup_sizes[key]
+    submenu = curses.newwin(height, width, *centred(height, width))
+    if key == 'u': ## Force update
+        drawBox(submenu, 17, " Force Update ", curses.color_pair(4), curses.A_BOLD | curses.color_pair(4))
+        submenu.addstr(2,2,"Which data group would you like to update?")
+        submenu.addstr(3,2,"1) SemiOften (updated every 15 minutes)")
+        submenu.addstr(4,2,"  >IPs, Internet access, service statusses")
+        submenu.addstr(5,2,"2) Daily (updated daily)")
+        submenu.addstr(6,2,"  >OS Updates")
+        submenu.addstr(7,2,"3) Static (updated at program startup)")
+        submenu.addstr(8,2,"  >Hostname, OS, Kernel, BSSIDs")
+        submenu.addstr(9,2,"4) All")
+        submenu.addstr(11,2,"Please enter the number of the update group")
+
+    elif key == 'h': ## Help
+        drawBox(submenu, 18, " Help Menu ", curses.color_pair(4), curses.A_BOLD | curses.color_pair(4))
+        submenu.addstr(2,2,"Press 'q' or 'x' to exit the program")
+        submenu.addstr(3,2,"Press 'h' to bring up this menu")
+        submenu.addstr(4,2,"Press 'i' to set the refresh interval")
+        submenu.addstr(5,2,"Press 'v' to see program info and version")
+        submenu.addstr(6,2,"Press 'u' to update a data group")
+        submenu.addstr(7,2,"Press 'U' to update all data")
+        submenu.addstr(8,2,"Press 'd' to redraw the entire screen")
+        submenu.addstr(9,2,"Press 't' to see and use test functions")
+        submenu.addstr(10,2,"Press 'p' to see the collector timings")
+        submenu.addstr(11,2,"Press 'o' to see the top processes")
+        submenu.addstr(13,2,"Pressing any of these keys now does nothing")
+        submenu.addstr(14,2,"Press any key to close this box, the press")
+        submenu.addstr(15,2,"the key you want")
+
+    elif key == 'i': ## Interval, handleKey() fills in the current values
+        drawBox(submenu, 18, " Interval ", curses.color_pair(4), curses.A_BOLD | curses.color_pair(4))
+        submenu.addstr( 2,2,"Set new update interval in seconds.")
+        submenu.addstr( 6,2,"Interval: __ seconds")
+        submenu.addstr( 8,2,"Set new updateSemi() interval in minutes.")
+        submenu.addstr(11,2,"Semi Interval: ____ minutes")
+        submenu.addstr(13,2,"Set when internet speed is calculated")
+        submenu.addstr(16,2,"Once every _ time(s) updateSemi() runs.")
+        submenu.addstr(18,2,"Input starts at first field, press enter")
+        submenu.addstr(19,2,"to select next field. Leave empty to keep")
+        submenu.addstr(20,2,"old value. Press 'c' to cancel without")
+        submenu.addstr(21,2,"saving. Press 's' to save changes.")
+
+    elif key == 'v': ## Program info and version
+        drawBox(submenu, 13, " Program Info and Version ", curses.color_pair(4), curses.color_pair(4))
+        submenu.addstr(2,2,"Raspberry PI Status Monitor V")
+        submenu.addstr(__version__, curses.A_BOLD | curses.color_pair(4))
+        submenu.addstr(3,2,"Created by ")
+        submenu.addstr("JTC", curses.color_pair(3))
+        submenu.addstr(", June-July 2019")
+        submenu.addstr(4,2,"Made for a small GPIO touch screen (60x40 chars)")
+        submenu.addstr(5,2,"480x320px SPI TFTLCD, mouse/touch not supported")
+        submenu.addstr(6,2,"Tested on a Raspberry PI 3b - Raspbian 9 CLI")
+        submenu.addstr(7,2,"Written in Python 3.7.3 on Arch Linux")
+        submenu.addstr(8,2,"Current Python version: " + str(version_info[0]) + '.' + str(version_info[1]) + '.' + str(version_info[2]))
+        submenu.addstr(10,2,"This software is completely free to use, modify")
+        submenu.addstr(11,2,"copy, distribute or do whatever else with.")
+        submenu.addstr(12,2,"Though it might be too specialised to be of")
+        submenu.addstr(13,2,"much use, you can do with it as you please.")
+        submenu.addstr(14,2,"If you do use (parts of) this program,")
+        submenu.addstr(15,2,"a shoutout is appreciated, but not mandatory.")
+
+    elif key == 't': ## Test functions
+        drawBox(submenu, 10, " Test Functions ", curses.color_pair(4), curses.A_BOLD | curses.color_pair(4))
+        submenu.addstr(2,2,"1) testStyle()")
+        submenu.addstr(3,2,"  > Prints colours and effects")
+        submenu.addstr(4,2,"2) showAllInfo()")
+        submenu.addstr(5,2,"  > Shows all info unformatted")
+        submenu.addstr(6,2,"3) fillscreen()")
+        submenu.addstr(7,2,"  > Fills the screen with chars")
+        submenu.addstr(9,2,"Enter the number of the function")
+
+    elif key == 'p': ## Collector timings, drawTimings() fills in the table
+        drawBox(submenu, 19, " Collector Timings ", curses.color_pair(4), curses.A_BOLD | curses.color_pair(4))
+        submenu.addstr(2,2,"{:<21}{:>7}{:>7}{:>7}{:>7}{:>5}".format('Step', 'last', 'p50', 'p95', 'max', 'fail'), curses.A_BOLD)
+        submenu.addstr(26,2,"ms over the last {} runs, any key closes".format(timing_window))
+
+    elif key == 'o': ## Top processes, drawProcesses() fills in the list
+        drawBox(submenu, 17, " Top Processes ", curses.color_pair(4), curses.A_BOLD | curses.color_pair(4))
+        submenu.addstr(2,2,"{:>6} {:<20}{:>7}{:>10}".format('PID', 'Name', 'CPU%', 'Memory'), curses.A_BOLD)
+        submenu.addstr(process_top + 5,2,"'c' CPU, 'm' memory, any other key closes")
+    return submenu
+
+def drawProcesses(window, order):
+    '''drawProcesses(window, order): Documentation
+    Fills the list of the 'o' submenu with the process_top processes of the ProcessTable that use the most
+    CPU (order 'cpu') or memory ('rss'), and a line about the table.'''
+    top = processtable.top(process_top, order) if processtable != None else []
+    for row in range(process_top):
+        if row < len(top):
+            entry = top[row]
+            window.addstr(3 + row, 2, "{:>6} {:<20.20}{:>7.1f}{:>9.1f}M".format(entry.pid, entry.name, entry.cpu, entry.rss / 1048576),
+                          curses.A_BOLD if (entry.cpu if order == 'cpu' else 0) >= 50 else curses.A_NORMAL)
+        else:
+            window.addstr(3 + row, 2, 44 * ' ')
+    if processtable != None:
+        summary = "{} processes, {} read, by {}".format(processtable.count, processtable.lastread, 'CPU' if order == 'cpu' else 'memory')
+        window.addstr(process_top + 4, 2, summary.ljust(44), curses.A_DIM)
+
+def drawTimings(window):
+    '''drawTimings(window): Documentation
+    Fills the table of the 'p' submenu with the statistics of every StepTimer in timings.
+    Steps that take 1 second or more are shown in red, those that failed in yellow.'''
+    rows = 23 ## Rows 3 to 25
+    timers = list(timings.values())
+    for row in range(rows):
+        if row >= len(timers):
+            window.addstr(3 + row, 2, 54 * ' ')
+            continue
+        if row == rows - 1 and len(timers) > rows:
+            window.addstr(3 + row, 2, "... and {} more".format(len(timers) - row).ljust(54))
+            continue
+        timer = timers[row]
+        stats = timer.stats()
+        attr = curses.A_NORMAL
+        if timer.failures:
+            attr = curses.color_pair(3)
+        if stats['p95'] >= 1000:
+            attr = curses.color_pair(1)
+        cells = ['{:>7}'.format(timingText(stats[stat])) for stat in ('last', 'p50', 'p95', 'max')]
+        window.addstr(3 + row, 2, "{:<21.21}{}{:>5}".format(timer.name, ''.join(cells), timer.failures)[:54].ljust(54), attr)
+
+def timingText(milliseconds):
+    '''timingText(milliseconds): Documentation
+    A duration in milliseconds in at most 6 characters, as seconds when it's too long for that'''
+    if milliseconds != milliseconds: ## NaN, didn't finish yet
+        return '-'
+    if milliseconds < 10:
+        return '{:.2f}'.format(milliseconds)
+    if milliseconds < 10000:
+        return '{:.0f}'.format(milliseconds)
+    return '{:.0f}s'.format(milliseconds / 1000)
+
+def drawBox(window, title_x, title, colour, title_attr):
+    '''drawBox(window, title_x, title, colour, title_attr): Documentation
+    Draws the '+---+' border of a submenu around the edges of the window, with the title on the top border.'''
+    height, width = window.getmaxyx()
+    try: # Curses throws an error when drawing the last character of a window, as the cursor has no place to go
+        window.addstr(0,0,"+" + (width-2)*'-' + "+", curses.A_STANDOUT | colour)
+        window.addstr(0,title_x,title, title_attr)
+        window.addstr(height-1,0,"+" + (width-2)*'-' + "+", curses.A_STANDOUT | colour)
+    except curses.error: # We're catching that error and ignoring the hell out of it
+        pass
+    for i in range(1,height-1):
+        window.addstr(i,0,"|", curses.A_STANDOUT | colour)
+        window.addstr(i,width-1,"|", curses.A_STANDOUT | colour)
+
+def restoreRegion(monitor, window):
+    '''restoreRegion(monitor, window): Documentation
+    Puts back the part of the screen that was covered by a submenu window. Only the lines the window covered
+    are marked as changed in monitor, so the next curses.doupdate() only rewrites the cells under the submenu.'''
+    top = window.getbegyx()[0]
+    height = window.getmaxyx()[0]
+    monitor.touchline(top, height)
+    monitor.noutrefresh()
+
+def dueUpdates():
+    '''dueUpdates(): Documentation
+    Returns the names of the data groups (see schedule_groups) that are due for an update, the scheduler plans their next run.
+    Also fills in 'nextupdate' and 'updatemin' for the 'Next update' line on the screen.'''
+    due = scheduler.due()
+    time_till_semi = scheduler.remaining('semi')
+    time_till_daily = scheduler.remaining('daily')
+    if time_till_daily <= time_till_semi:
+        staticvars['nextupdate'] = 'daily'
+        staticvars['updatemin'] = max(0, int(-(-time_till_daily // 60))) ## Rounded up, it's 1 minute until it's done
+    else:
+        staticvars['nextupdate'] = 'normal'
+        staticvars['updatemin'] = max(0, int(-(-time_till_semi // 60)))
+    return due
+
+class LayoutPlan:
+    '''LayoutPlan(rows, cols): Documentation
+    The layout compiled for a screen of rows by cols, see compileLayout(). chrome is a flat list of (y, x, text, attr)
+    that drawChrome() draws as it is, fields has the (y, x, width) of every field that fits on the screen, by name,
+    and borders the border text under the fields that are on a border, which is what they show when they're empty.'''
+    __slots__ = ('rows', 'cols', 'chrome', 'fields', 'borders')
+
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.chrome = []
+        self.fields = {}
+        self.borders = {}
+
+    def add(self, y, x, text, attr, right):
+        '''Adds text to chrome, cut off at column right and at the edge of the screen, returns what's left of it'''
+        if y >= self.rows:
+            return ''
+        if y == self.rows - 1:
+            right = min(right, self.cols - 1) ## The last cell of the screen can't be written, curses has no place for the cursor
+        text = text[:max(0, min(right, self.cols) - x)]
+        if text:
+            self.chrome.append((y, x, text, attr))
+        return text
+
+def compileLayout(rows, cols):
+    '''compileLayout(rows, cols): Documentation
+    Compiles layout for a screen of rows by cols into a LayoutPlan. The header goes at the top, the panels below it,
+    in a new column of layout_width when a panel doesn't fit below the last one and there's room for another column.
+    With a single column the panels (their borders) get the whole width of the screen. What doesn't fit is cut off
+    at the right and the bottom, icons and fields are left out as a whole.'''
+    plan = LayoutPlan(rows, cols)
+    width = cols if cols < 2 * layout_width else layout_width
+    first = layout[0][0] ## The panels start below the header
+    top = left = 0
+    for number, (height, title, chrome, icon, fields) in enumerate(layout):
+        if number > 1 and top > first and top + height > rows and left + 2 * width <= cols:
+            left += width
+            top = first
+        right = left + width
+        if title != None:
+            border = ("-=-=- " + title + " " + "-=" * width)[:max(0, width - 2)]
+            plan.add(top, left + 1, border, curses.A_NORMAL, right)
+            plan.add(top, left + 7, title, curses.A_BOLD, right)
+        for row, col, text, pair, attr in chrome:
+            plan.add(top + row, left + col, text, curses.color_pair(pair) | attr, right)
+        if icon != None:
+            row, col, parts = icon
+            if (left + col + max(part[1] + len(part[2]) for part in parts) <= min(right, cols)
+                    and top + row + max(part[0] for part in parts) < rows):
+                for partrow, partcol, text, pair, attr in parts:
+                    plan.add(top + row + partrow, left + col + partcol, text, curses.color_pair(pair) | attr, right)
+        for name, (row, col, fieldwidth, label) in fields.items():
+            y = top + row
+            if y >= rows or (label and plan.add(y, left + col, label, curses.A_BOLD, right) != label):
+                continue
+            x = left + col + len(label)
+            fieldwidth = min(fieldwidth, min(right, cols - 1 if y == rows - 1 else cols) - x)
+            if fieldwidth > 0:
+                plan.fields[name] = (y, x, fieldwidth)
+                if row == 0 and title != None:
+                    plan.borders[name] = border[x - left - 1:x - left - 1 + fieldwidth]
+        top += height
+    return plan
+
+def useLayout(rows, cols):
+    '''useLayout(rows, cols): Documentation
+    Makes the LayoutPlan for a screen of rows by cols the current one, it's compiled the first time that size is seen.
+    Returns the plan.'''
+    global layoutplan
+    if (rows, cols) not in layoutplans:
+        layoutplans[(rows, cols)] = compileLayout(rows, cols)
+    layoutplan = layoutplans[(rows, cols)]
+    return layoutplan
+
+def resizeScreen(monitor):
+    '''resizeScreen(monitor): Documentation
+    Lays the screen out again after the terminal changed size (KEY_RESIZE): switches to the LayoutPlan of the new size,
+    throws away the chrome and the submenus that were made for the old one, and draws everything again.'''
+    global chromelayer
+    useLayout(*monitor.getmaxyx())
+    chromelayer = None
+    popups.clear()
+    clearScreen(monitor)
+    uiDrawer(monitor)
+    dataWriter(monitor, updateall=True)
 
-    # Testing
-    #fillscreen(monitor)
-    #showAllInfo(monitor)
-    #uiDrawer(monitor)
-    #dataWriter(monitor, updateall=True)
-    #testStyle(monitor)
+def centred(height, width):
+    '''centred(height, width): Documentation
+    Returns the (y, x) at which a window of height by width is in the middle of the screen'''
+    return max(0, (layoutplan.rows - height) // 2), max(0, (layoutplan.cols - width) // 2)
 
-    monitor.refresh()
-    monitor.getkey()
+def showBusy(monitor, busy):
+    '''showBusy(monitor, busy): Documentation
+    Highlights the '::' of the clock while the data is being updated, or puts it back to normal'''
+    place = layoutplan.fields.get('clock')
+    if place != None and place[2] >= 5:
+        monitor.addstr(place[0], place[1] + 3, "::", curses.color_pair(3) | curses.A_STANDOUT if busy else curses.color_pair(3))
 
 def uiDrawer(monitor):
     '''uiDrawer(monitor): Documentation
-    This functions writes the ASCII icons, created by myself, and other static UI parts, into the screen
-    They should be fine with being written once, but pressing 'i' will re-draw them.
+    Puts the static UI parts (title, borders and icons) on the screen. They're only drawn once per layout, by drawChrome(),
+    into a pad, after that the pad is copied onto the screen with overwrite(), which is used after every clear.
     '''
-    # Title
-    monitor.addstr(1,0," >" * 14 + " || " + "< " * 14, curses.color_pair(6) | curses.A_BOLD)
-    monitor.addstr(2,1," >" * 5 + 38 * ' ' + "< " * 5, curses.color_pair(6) | curses.A_BOLD)
-    monitor.addstr(2,12,"Raspberry PI - Activity Monitor V", curses.color_pair(5))
-    monitor.addstr(str(__version__), curses.color_pair(5) | curses.A_BOLD)
-
-    # Corona virus special edition
-    monitor.addstr(3,31,"CORONA VIRUS SPECIAL EDITION", curses.color_pair(1))
-
-    # Borders
-    monitor.addstr( 4,1,"-=-=-" + 20 * ' ' + 16 * '-=' + '-')
-    monitor.addstr(18,1,"-=-=-" + 16 * ' ' + 18 * '-=' + '-')
-    monitor.addstr(28,1,"-=-=-" + 14 * ' ' + 19 * '-=' + '-')
-    monitor.addstr( 4,7,"SYSTEM INFORMATION", curses.A_BOLD)
-    monitor.addstr(18,7,"NETWORK STATUS", curses.A_BOLD)
-    monitor.addstr(28,7,"CORONA VIRUS", curses.A_BOLD)
-
-    # SYSTEM INFORMATION - ICON
-    monitor.addstr( 6,47," *  *#*  * ", curses.color_pair(6))
-    monitor.addstr( 7,47,"*** *#* ***", curses.color_pair(6))
-    monitor.addstr( 8,47," *#######* ", curses.color_pair(6))
-    monitor.addstr( 9,47,"  ##   ##  ", curses.color_pair(6))
-    monitor.addstr(10,47,"**# +++ #**", curses.color_pair(6))
-    monitor.addstr(11,47,"### + + ###", curses.color_pair(6))
-    monitor.addstr(12,47,"**# +++ #**", curses.color_pair(6))
-    monitor.addstr(13,47,"  ##   ##  ", curses.color_pair(6))
-    monitor.addstr(14,47," *#######* ", curses.color_pair(6))
-    monitor.addstr(15,47,"*** *#* ***", curses.color_pair(6))
-    monitor.addstr(16,47," *  *#*  * ", curses.color_pair(6))
-    ## Change centre colour
-    monitor.addstr(10,51,"+++", curses.color_pair(6) | curses.A_STANDOUT)
-    monitor.addstr(11,51,"+ +", curses.color_pair(6) | curses.A_STANDOUT)
-    monitor.addstr(12,51,"+++", curses.color_pair(6) | curses.A_STANDOUT)
-    monitor.addstr(11,52," ", curses.color_pair(0))
-
-    # NETWORK STATUS - ICON
-    monitor.addstr(20,48,"//      \\\\", curses.color_pair(4) | curses.A_BOLD)
-    monitor.addstr(21,48,"|| /><\\ ||", curses.color_pair(4) | curses.A_BOLD)
-    monitor.addstr(22,48,"|| \\></ ||", curses.color_pair(4) | curses.A_BOLD)
-    monitor.addstr(23,48,"\\\\  ||  //", curses.color_pair(4) | curses.A_BOLD)
-    monitor.addstr(24,48,"    ||", curses.color_pair(4) | curses.A_BOLD)
-    monitor.addstr(25,48,"    ||", curses.color_pair(4) | curses.A_BOLD)
-    monitor.addstr(26,48,"   /||\\", curses.color_pair(4) | curses.A_BOLD)
-    ## Change antennae colour
-    monitor.addstr(21,51,"/><\\", curses.color_pair(1))
-    monitor.addstr(22,51,"\\></", curses.color_pair(1))
-
-    # CORONA - ICON
-    monitor.addstr(30,49,"    #", curses.color_pair(2) | curses.A_BOLD)
-    monitor.addstr(31,49," #  |  #", curses.color_pair(2) | curses.A_BOLD)
-    monitor.addstr(32,49,"  \\>|</", curses.color_pair(2) | curses.A_BOLD)
-    monitor.addstr(33,49,"  ˇ/ \\ˇ", curses.color_pair(2) | curses.A_BOLD)
-    monitor.addstr(34,49,"#--|+|--#", curses.color_pair(2) | curses.A_BOLD)
-    monitor.addstr(35,49,"  ˇ\\_/ˇ", curses.color_pair(2) | curses.A_BOLD)
-    monitor.addstr(36,49,"  />|<\\", curses.color_pair(2) | curses.A_BOLD)
-    monitor.addstr(37,49," #  |  #", curses.color_pair(2) | curses.A_BOLD)
-    monitor.addstr(38,49,"    #", curses.color_pair(2) | curses.A_BOLD)
-    ## Change 'knobs' colour
-    for coord in [[30,53],[31,50],[31,56],[34,49],[34,57],[37,50],[37,56],[38,53]]:
-        monitor.addstr(coord[0],coord[1],"#",curses.color_pair(1))
-    for coord in [[32,52],[32,54],[33,51],[33,55],[35,51],[35,55],[36,52],[36,54]]:
-        monitor.addstr(coord[0],coord[1],"ˇ",curses.color_pair(5)) # The 'ˇ' character is not supported, but instead shows a cube
-    monitor.addstr(34,53,"+", curses.color_pair(2) | curses.A_STANDOUT)
-
-def dataWriter(monitor, updateall=False,daily=False,semi_often=False):
+    global chromelayer
+    if layoutplan == None:
+        useLayout(*monitor.getmaxyx())
+    if chromelayer == None:
+        chromelayer = curses.newpad(layoutplan.rows, layoutplan.cols)
+        drawChrome(chromelayer)
+    rows, cols = monitor.getmaxyx()
+    chromelayer.overwrite(monitor, 0, 0, 0, 0, min(rows, layoutplan.rows)-1, min(cols, layoutplan.cols)-1)
+
+def drawChrome(window):
+    '''drawChrome(window): Documentation
+    This functions writes the ASCII icons, created by myself, and other static UI parts, into a window
+    They're the chrome of the LayoutPlan, already cut to the screen. Only used by uiDrawer(), which keeps the result around.
+    '''
+    for y, x, text, attr in layoutplan.chrome:
+        window.addstr(y, x, text, attr)
+
+def dataWriter(monitor, updateall=False,daily=False,semi_often=False,network=False,corona=False):
+    '''dataWriter(monitor, ...): Documentation
+    Writes the data onto the screen. The often updated data is always written, the flags select the other groups.
+    Everything goes through writeField(), so only the fields that changed since the last frame are written,
+    and the screen is only marked for refreshing (noutrefresh()), the caller flushes it with curses.doupdate().'''
     global staticvars
 
     if updateall:
         daily = True
         semi_often = True
+    if semi_often: # The semi often data is shown in two panels, which can also be redrawn on their own
+        network = True
+        corona = True
+    if layoutplan == None:
+        useLayout(*monitor.getmaxyx())
+    startFrame()
 
     # OFTEN UPDATES
     ## Time
-    monitor.addstr(0,26, str(staticvars['hour']), curses.A_BOLD)
-    monitor.addstr(' :: ', curses.color_pair(3))
-    monitor.addstr(str(staticvars['minute']), curses.A_BOLD)
+    showField(monitor, 'clock', ((str(staticvars['hour']), curses.A_BOLD),
+                                 (' :: ', curses.color_pair(3)),
+                                 (str(staticvars['minute']), curses.A_BOLD)))
 
     ## Processes
-    monitor.addstr(9,1, "Processes: ", curses.A_BOLD)
-    monitor.addstr(str(staticvars['processes']) + 5*' ') # From here on out, adding spaces to remove chars if the previous draw was longer
-    
+    if staticvars.get('top_process'):
+        showField(monitor, 'processes', "{} (top: {})".format(staticvars['processes'], staticvars['top_process'][:20]))
+    else:
+        showField(monitor, 'processes', str(staticvars['processes']))
+
+    ## CPU usage, all cores together and a bar per core
+    if 'cpu' in staticvars:
+        cpu = "{:>3}% ".format(staticvars['cpu']) if staticvars['cpu'] != 'ERR' else 'ERR '
+        showField(monitor, 'cpu', ((cpu, curses.color_pair(1) if staticvars['cpu'] != 'ERR' and staticvars['cpu'] >= 80 else curses.A_NORMAL),)
+                  + tuple(cpuBars(staticvars['cpu_cores'], 35)))
+
     ## CPU Temperature
-    monitor.addstr(10,1, "CPU Temperature: ", curses.A_BOLD)
     if staticvars['cputemp'] == 'ERR' or staticvars['cputemp'] > 65.0:
-        monitor.addstr(str(staticvars['cputemp']) + u"\N{DEGREE SIGN}" + 'C    ', curses.color_pair(1))
+        showField(monitor, 'cputemp', str(staticvars['cputemp']) + u"\N{DEGREE SIGN}" + 'C', curses.color_pair(1))
     else:
-        monitor.addstr(str(staticvars['cputemp']) + u"\N{DEGREE SIGN}" + 'C    ')
+        showField(monitor, 'cputemp', str(staticvars['cputemp']) + u"\N{DEGREE SIGN}" + 'C')
 
     ## Memory
-    monitor.addstr(11,1, "Memory: ", curses.A_BOLD)
-    if int(staticvars['used_mem']) / int(staticvars['total_mem']) > 0.8:
-        monitor.addstr(str(staticvars['used_mem']) + 'MiB', curses.color_pair(1))
+    if staticvars.get('used_mem') == None or staticvars.get('total_mem') == None: ## /proc/meminfo couldn't be read yet
+        showField(monitor, 'memory', placeholder, curses.A_DIM)
     else:
-        monitor.addstr(str(staticvars['used_mem']) + 'MiB')
-    monitor.addstr(" / " + str(staticvars['total_mem']) + 'MiB (' + str(round((int(staticvars['used_mem'])/int(staticvars['total_mem']))*100, 1)) + '%)    ')
+        showField(monitor, 'memory', ((str(staticvars['used_mem']) + 'MiB', curses.color_pair(1) if int(staticvars['used_mem']) / int(staticvars['total_mem']) > 0.8 else curses.A_NORMAL),
+                                      (" / " + str(staticvars['total_mem']) + 'MiB (' + str(round((int(staticvars['used_mem'])/int(staticvars['total_mem']))*100, 1)) + '%)', curses.A_NORMAL)))
 
     ## Uptime
-    monitor.addstr(16,1, "Uptime: ", curses.A_BOLD)
-    monitor.addstr(staticvars['uptime'] + 10*' ')
+    showField(monitor, 'uptime', staticvars['uptime'])
+
+    ## Traffic, behind the IPs of the interfaces, and the busiest of the others that are in use above them
+    rates = staticvars.get('net_rates', {})
+    showField(monitor, 'traffic_lan', trafficText(rates.get(lan_interface)), curses.color_pair(6))
+    showField(monitor, 'traffic_wlan', trafficText(rates.get(wlan_interface)), curses.color_pair(6))
+    others = sorted((interface for interface in rates if interface not in ('lo', lan_interface, wlan_interface) and sum(rates[interface][:2]) >= 1),
+                    key=lambda interface: -sum(rates[interface][:2]))
+    segments = []
+    for interface in others[:2]:
+        segments.append((interface[:8] + ' ', curses.A_BOLD))
+        segments.append((trafficText(rates[interface]) + '  ', curses.color_pair(6)))
+    showField(monitor, 'traffic_other', segments)
 
     ## Wifi info
-    monitor.addstr(24,1, "Connected to: ", curses.A_BOLD)
-    monitor.addnstr(staticvars['essid'] + 100*' ', 33)
-    monitor.addstr(25,1, "Signal Strength: ", curses.A_BOLD)
-    monitor.addstr(str(staticvars['sig_pow']) + 10*' ')
-    monitor.addstr(26,1, "Signal Quality :  ", curses.A_BOLD)
-    monitor.addstr(staticvars['sig_qua'] + 10*' ')
+    if staticvars.get('wifi_event'):
+        showField(monitor, 'essid', ((staticvars['essid'][:32 - len(staticvars['wifi_event'])] + ' ', curses.A_NORMAL),
+                                     (staticvars['wifi_event'], curses.color_pair(3))))
+    else:
+        showField(monitor, 'essid', staticvars['essid'])
+    showField(monitor, 'sig_pow', "{:<8} {}".format(str(staticvars['sig_pow']), staticvars.get('bitrate', '')))
+    showField(monitor, 'sig_qua', staticvars['sig_qua'])
+
+    ## History
+    showField(monitor, 'history_system', sparkRow((("Temp ", 'cputemp', None, None), ("Mem  ", 'memory', 0, 100)), curses.color_pair(6)))
+    showField(monitor, 'history_load', sparkRow((("Proc ", 'processes', None, None), ("Load ", 'loadavg', 0, None)), curses.color_pair(6)))
+    showField(monitor, 'history_network', sparkRow((("Sig  ", 'sig_qua', 0, 100), ("Ping ", 'www_latency', 0, None)), curses.color_pair(4)))
 
     ## Refresh interval
-    monitor.addstr(38,1,'Refresh Interval: ', curses.A_BOLD)
-    monitor.addstr(str(staticvars['interval']) + " seconds     ")
+    showField(monitor, 'interval', str(staticvars['interval']) + " seconds")
 
     ## Time till update
-    monitor.addstr(39,1,'Next update: ', curses.A_BOLD)
     if staticvars['nextupdate'] == 'daily':
-        monitor.addstr('Big update in ' + str(staticvars['updatemin']) + ' minute(s)     ')
+        showField(monitor, 'nextupdate', 'Big update in ' + str(staticvars['updatemin']) + ' minute(s)')
     else:
-        monitor.addstr('Normal update in ' + str(staticvars['updatemin']) + ' minute(s)     ')
+        showField(monitor, 'nextupdate', 'Normal update in ' + str(staticvars['updatemin']) + ' minute(s)')
 
     # SEMI OFTEN UPDATES
-    if semi_often:
+    if network:
         ## Internet access
-        monitor.addstr(20,1,'Internet Access: ', curses.A_BOLD)
-        if staticvars['www_access'] == 'Established':
-            monitor.addnstr("Established" + 100*' ', 30, curses.color_pair(2))
+        if staticvars['www_access'] == placeholder: ## The first check isn't done yet
+            showField(monitor, 'www_access', placeholder, curses.A_DIM)
+        elif staticvars['www_access'] == 'Established':
+            showField(monitor, 'www_access', "Established ({} ms)".format(staticvars['www_latency']), curses.color_pair(2))
         else:
-            monitor.addnstr(staticvars['www_access'] + 100*' ', 30, curses.color_pair(1))
+            showField(monitor, 'www_access', staticvars['www_access'], curses.color_pair(1))
 
         ## Internet speed
-        monitor.addstr(21,1,"Approx. speed: ", curses.A_BOLD)
-        if not staticvars['www_access'] == 'Established':
-            monitor.addnstr('No Internet Access' + 100*' ', 30, curses.color_pair(1) | curses.A_BOLD)
+        if staticvars['www_access'] == placeholder:
+            showField(monitor, 'speed', placeholder, curses.A_DIM)
+        elif not staticvars['www_access'] == 'Established':
+            showField(monitor, 'speed', 'No Internet Access', curses.color_pair(1) | curses.A_BOLD)
         elif testmode:
-            monitor.addnstr('DISABLED' + 100*' ', 30, curses.color_pair(1))
+            showField(monitor, 'speed', 'DISABLED', curses.color_pair(1))
         else:
-            monitor.addnstr(u'\N{DOWNWARDS ARROW}' + staticvars['speed_down'] + ' | ' + u'\N{UPWARDS ARROW}' + staticvars['speed_up'] + 100*' ', 30)
+            showField(monitor, 'speed', u'\N{DOWNWARDS ARROW}' + staticvars['speed_down'] + ' | ' + u'\N{UPWARDS ARROW}' + staticvars['speed_up'])
 
         ## IPs
-        monitor.addstr(22,1,"LAN IP : ", curses.A_BOLD)
-        monitor.addstr(staticvars['lipaddr'] + 13*' ')
-        monitor.addstr(23,1,"WLAN IP: ", curses.A_BOLD)
-        monitor.addstr(staticvars['wipaddr'] + 13*' ')
-
-        ## Corona virus
-        monitor.addstr(30,1,"COUNTRY     | INFECTIONS | DEATHS |", curses.A_BOLD)
-        monitor.addstr(31,1,"------------|------------|--------|", curses.A_BOLD)
-        monitor.addstr(32,1,"Worldwide   |            |        |", curses.A_BOLD)
-        monitor.addstr(33,1,"Netherlands |            |        |", curses.A_BOLD)
-        monitor.addstr(34,1,"China       |            |        |", curses.A_BOLD)
-        monitor.addstr(35,1,"Italy       |            |        |", curses.A_BOLD)
-        monitor.addstr(32,25-len(coronainfo['world_inf']),coronainfo['world_inf'])
-        monitor.addstr(33,25-len(coronainfo['nl_inf']),coronainfo['nl_inf'])
-        monitor.addstr(34,25-len(coronainfo['cn_inf']),coronainfo['cn_inf'])
-        monitor.addstr(35,25-len(coronainfo['it_inf']),coronainfo['it_inf'])
-        monitor.addstr(32,34-len(coronainfo['world_dead']),coronainfo['world_dead'])
-        monitor.addstr(33,34-len(coronainfo['nl_dead']),coronainfo['nl_dead'])
-        monitor.addstr(34,34-len(coronainfo['cn_dead']),coronainfo['cn_dead'])
-        monitor.addstr(35,34-len(coronainfo['it_dead']),coronainfo['it_dead'])
+        showField(monitor, 'lipaddr', staticvars['lipaddr'])
+        showField(monitor, 'wipaddr', staticvars['wipaddr'])
+
+    if corona:
+        ## Corona virus, the table around the numbers is part of the layout
+        for label, key in layout_corona:
+            showField(monitor, 'corona_' + key + '_inf', "{:>11}".format(coronainfo[key + '_inf']))
+            showField(monitor, 'corona_' + key + '_dead', "{:>7}".format(coronainfo[key + '_dead']))
 
         # Mainframe
-        #monitor.addstr(36,1,"Veldkamp-Mainframe: ", curses.A_BOLD)
-        #monitor.addstr(staticvars['vmf_stat'] + 5*' ', curses.color_pair(1) if staticvars['vmf_stat'] != 'Online' else curses.color_pair(2))
+        #showField(monitor, 'vmf_stat', staticvars['vmf_stat'], curses.color_pair(1) if staticvars['vmf_stat'] != 'Online' else curses.color_pair(2))
 
     # DAILY UPDATES
     if daily:
         ## Updates
-        monitor.addstr(37,1,"Updates: ", curses.A_BOLD)
         try:
             staticvars['updateamount'] = int(staticvars['updateamount'])
         except ValueError:
-            monitor.addstr(str(staticvars['updateamount']), curses.color_pair(1))
+            showField(monitor, 'updates', str(staticvars['updateamount']), curses.A_DIM if staticvars['updateamount'] == placeholder else curses.color_pair(1))
         else:
-            monitor.addstr(str(staticvars['updateamount']) + 5*' ', curses.A_DIM if staticvars['updateamount'] == 0 else curses.A_BOLD)
-    
+            showField(monitor, 'updates', str(staticvars['updateamount']), curses.A_DIM if staticvars['updateamount'] == 0 else curses.A_BOLD)
+
     # ONE-TIME UPDATES
     if updateall:
         ## hostname
-        monitor.addstr(6,1,"Hostname: ", curses.A_BOLD)
-        monitor.addstr(staticvars['hostname'])
+        showField(monitor, 'hostname', staticvars['hostname'])
 
         ## Kernel
-        monitor.addstr(7,1,"Kernel: ", curses.A_BOLD)
-        monitor.addstr(staticvars['kernel'])
+        showField(monitor, 'kernel', staticvars['kernel'])
 
         ## BSSIDs
-        monitor.addstr(13,1,"Eth MAC : ", curses.A_BOLD)
-        monitor.addstr(staticvars['eth_bssid'])
-        monitor.addstr(14,1,"Wifi MAC: ", curses.A_BOLD)
-        monitor.addstr(staticvars['wifi_bssid'])
+        showField(monitor, 'eth_bssid', staticvars['eth_bssid'])
+        showField(monitor, 'wifi_bssid', staticvars['wifi_bssid'])
+
+    ## Panels of which the data is being refreshed on the worker pool
+    panelStatus(monitor)
+    endFrame()
+    monitor.noutrefresh()
+
+def sparkRow(graphs, attr):
+    '''sparkRow(graphs, attr): Documentation
+    Returns the writeSegments() segments of a row with two sparklines, graphs is ((label, metric, low, high), ...)
+    Each one takes 21 characters (5 for the label), which keeps the row clear of the icons.'''
+    segments = []
+    for label, name, low, high in graphs:
+        if segments:
+            segments.append((' ', curses.A_NORMAL))
+        segments.append((label, curses.A_BOLD))
+        segments.append((sparkline(history.get(name), 16, low, high), attr))
+    return segments
+
+def panelStatus(monitor):
+    '''panelStatus(monitor): Documentation
+    Shows 'refreshing...' in the border of the panels of which the data is being refreshed on the
+    worker pool right now, and puts the border back once it's done. The updates panel gets it as its value,
+    that one is overwritten by dataWriter() when the job is done.'''
+    for jobnames, name in ((('network', 'speed'), 'network_status'), (('corona',), 'corona_status')):
+        if refreshing.intersection(jobnames):
+            showField(monitor, name, "refreshing...", curses.color_pair(3))
+        else:
+            showField(monitor, name, layoutplan.borders.get(name, ''))
+    if 'updates' in refreshing:
+        showField(monitor, 'updates', "refreshing...", curses.color_pair(3))
+
+def showField(monitor, name, segments, attr=curses.A_NORMAL):
+    '''showField(monitor, name, segments, attr=curses.A_NORMAL): Documentation
+    Writes a field of the layout, a text (in attr) or (text, attr) segments, where the LayoutPlan puts it,
+    cut off at its width, through writeSegments(). A field that doesn't fit on this screen isn't written.'''
+    place = layoutplan.fields.get(name)
+    if place == None:
+        return
+    if isinstance(segments, str):
+        segments = ((segments, attr),)
+    writeSegments(monitor, place[0], place[1], segments, place[2])
+
+def writeField(monitor, y, x, text, attr=curses.A_NORMAL, width=None):
+    '''writeField(monitor, y, x, text, attr=curses.A_NORMAL, width=None): Documentation
+    Writes text at y, x, but only if it's different from what this field showed last time, see writeSegments()'''
+    writeSegments(monitor, y, x, ((text, attr),), width)
+
+def writeSegments(monitor, y, x, segments, width=None):
+    '''writeSegments(monitor, y, x, segments, width=None): Documentation
+    Writes a field made of (text, attr) segments at y, x, if it changed since it was written last time.
+    screenfields remembers what every field (by its y, x) showed, when the new text is shorter,
+    exactly the leftover cells are blanked, instead of padding everything with a pile of spaces.
+    With width, the field is cut off at that many characters. Counts what it writes in framestats.'''
+    if width is not None:
+        cut = []
+        for text, attr in segments:
+            text = text[:width]
+            width -= len(text)
+            cut.append((text, attr))
+        segments = tuple(cut)
+    old = screenfields.get((y, x))
+    if old == segments:
+        return
+    oldlength = sum(len(text) for text, attr in old) if old else 0
+    newlength = 0
+    monitor.move(y, x)
+    for text, attr in segments:
+        monitor.addstr(text, attr)
+        newlength += len(text)
+        framestats['bytes'] += len(text.encode('utf-8'))
+    if oldlength > newlength:
+        monitor.addstr(' ' * (oldlength - newlength))
+        framestats['bytes'] += oldlength - newlength
+    framestats['fields'] += 1
+    framestats['cells'] += max(oldlength, newlength)
+    screenfields[(y, x)] = segments
+
+def forgetFields():
+    '''forgetFields(): Documentation
+    Forgets what's on the screen, so every field is written again next time.
+    Needs to be called whenever the screen is cleared, see clearScreen()'''
+    screenfields.clear()
+
+def clearScreen(monitor):
+    '''clearScreen(monitor): Documentation
+    Clears the screen and forgets all the fields that were on it.'''
+    monitor.clear()
+    forgetFields()
+
+def startFrame():
+    '''startFrame(): Documentation
+    Starts counting the fields, cells and bytes that are written for a new frame, see framestats.'''
+    framestats['fields'] = framestats['cells'] = framestats['bytes'] = 0
+
+def endFrame():
+    '''endFrame(): Documentation
+    Stores the counts of the frame that was just written as the last frame and adds them to the totals.'''
+    framestats['frames'] += 1
+    for count in ('fields', 'cells', 'bytes'):
+        framestats['last_' + count] = framestats[count]
+        framestats['total_' + count] += framestats[count]
 
 def testStyle(monitor):
     '''testStyle(monitor): Documentation
     This is a test function, it's sole purpose is for me to check how certain effects show up on screen.'''
-    monitor.clear()
+    clearScreen(monitor)
     line = 2
     colors = [' #RE#', ' #GR#', ' #YE#', ' #BL#', ' #MG#', ' #CY#', ' #WH#']
     monitor.addstr(line,1,"Blinking text", curses.A_BLINK)
@@ -1125,82 +3693,76 @@ def showAllInfo(monitor):
     '''statmon.py showAllInfo(monitor): Documentation
     This is a test function, it's a random collection of all info collected, to check
     whether the info is retrieved and/or formatted correctly.'''
-    monitor.clear()
-    linenum = 2
-    monitor.addstr(linenum,0,"Hostname (hostname): " + str(staticvars['hostname']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Kernel (kernel): " + str(staticvars['kernel']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Updates (updateamount): " + str(staticvars['updateamount']))
-    linenum += 1
-    monitor.addstr(linenum,0,"WLan Address (wipaddr): " + str(staticvars['wipaddr']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Lan Address (lipaddr):  " + str(staticvars['lipaddr']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Internet Access (www_access): " + str(staticvars['www_access']))
-    linenum += 1
-    monitor.addstr(linenum,0,"CPU Temp (cputemp): " + str(staticvars['cputemp']) + u'\N{degree sign}' + 'C')
-    linenum += 1
-    monitor.addstr(linenum,0,"Processes (processes): " + str(staticvars['processes']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Uptime (uptime): " + str(staticvars['uptime']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Signal strength (sig_pow): " + str(staticvars['sig_pow']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Signal quality (sig_qua): " + str(staticvars['sig_qua']))
-    linenum += 1
-    monitor.addstr(linenum,0,"ESSID (essid): " + str(staticvars['essid']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Memory usage (used_mem / total_mem): " + str(staticvars['used_mem']) + 'MiB / ' + str(staticvars['total_mem']) + 'MiB (' + str(round((int(staticvars['used_mem'])*100)/int(staticvars['total_mem']),0)) + '%)')
-    linenum += 1
-    monitor.addstr(linenum,0,"Current Hour (hour): " + str(staticvars['hour']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Current Minutes (minute): " + str(staticvars['minute']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Last SemiOften update hour (semi_update_hour): " + str(staticvars['semi_update_hour']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Last SemiOften update minutes (semi_update_minute): " + str(staticvars['semi_update_minute']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Last Daily update hour (daily_update_hour): " + str(staticvars['daily_update_hour']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Last Daily update minutes (daily_update_minute): " + str(staticvars['daily_update_minute']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Update interval (interval): " + str(staticvars['interval']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Type of next update (nextupdate): " + str(staticvars['nextupdate']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Time till next update (updatemin): " + str(staticvars['updatemin']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Internet Upload speed (speed_up): " + str(staticvars['speed_up']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Internet Download speed (speed_down): " + str(staticvars['speed_down']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Internet Ping (ping): " + str(staticvars['ping']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Apache Service Status (apache_stat): " + str(staticvars['apache_stat']))
-    linenum += 1
-    monitor.addstr(linenum,0,"SSL Service Status (ssl_stat): " + str(staticvars['ssl_stat']))
-    linenum += 1
-    monitor.addstr(linenum,0,"FTP Service Status (ftp_stat): " + str(staticvars['ftp_stat']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Veldkamp-Mainframe NAS Server reachable? (vmf_stat): " + str(staticvars['vmf_stat']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Ethernet MAC Address (eth_bssid): " + str(staticvars['eth_bssid']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Wifi MAC Address (wifi_bssid): " + str(staticvars['wifi_bssid']))
-    linenum += 1
-    monitor.addstr(linenum,0,"Version (__version__): " + str(__version__))
-    linenum += 1
-    monitor.addstr(linenum,0,"Testmode (testmode): " + str(testmode))
-    
-    #monitor.addstr(linenum,0,": " + str(staticvars['']))
-    #linenum += 1
+    lines = []
+    lines.append("Hostname (hostname): " + str(staticvars['hostname']))
+    lines.append("Kernel (kernel): " + str(staticvars['kernel']))
+    lines.append("Updates (updateamount): " + str(staticvars['updateamount']))
+    lines.append("WLan Address (wipaddr): " + str(staticvars['wipaddr']))
+    lines.append("Lan Address (lipaddr):  " + str(staticvars['lipaddr']))
+    lines.append("Internet Access (www_access): " + str(staticvars['www_access']) + ', ' + str(staticvars['www_latency']) + ' ms')
+    for (kind, address), probes in probehistory.items():
+        succeeded = [latency for checked, latency in probes if latency is not None]
+        lines.append("Probe {} {}: {}/{} ok, last {} ms".format(kind, address, len(succeeded), len(probes), probes[-1][1]))
+    lines.append("CPU Temp (cputemp): " + str(staticvars['cputemp']) + u'\N{degree sign}' + 'C')
+    lines.append("CPU usage (cpu, cpu_iowait, cpu_steal): {}% busy, {}% iowait, {}% steal".format(staticvars.get('cpu'), staticvars.get('cpu_iowait'), staticvars.get('cpu_steal')))
+    lines.append("CPU usage per core (cpu_cores): " + ' '.join("{}%".format(busy) for busy in staticvars.get('cpu_cores', [])))
+    lines.append("Processes (processes): " + str(staticvars['processes']))
+    lines.append("Uptime (uptime): " + str(staticvars['uptime']))
+    lines.append("Load average (loadavg): " + str(staticvars['loadavg']))
+    lines.append("Signal strength (sig_pow): " + str(staticvars['sig_pow']))
+    lines.append("Signal quality (sig_qua): " + str(staticvars['sig_qua']))
+    lines.append("ESSID (essid): " + str(staticvars['essid']))
+    lines.append("Bit rate (bitrate): " + str(staticvars.get('bitrate')))
+    if wirelessstats != None:
+        for when, kind, ap in wirelessstats.events:
+            lines.append("Wifi {} at {}: {}".format(kind, time.strftime('%H:%M:%S', time.localtime(when)), ap))
+    if staticvars.get('used_mem') == None or staticvars.get('total_mem') == None:
+        lines.append("Memory usage (used_mem / total_mem): " + placeholder)
+    else:
+        lines.append("Memory usage (used_mem / total_mem): " + str(staticvars['used_mem']) + 'MiB / ' + str(staticvars['total_mem']) + 'MiB (' + str(round((int(staticvars['used_mem'])*100)/int(staticvars['total_mem']),0)) + '%)')
+    lines.append("Current Hour (hour): " + str(staticvars['hour']))
+    lines.append("Current Minutes (minute): " + str(staticvars['minute']))
+    lines.append("Last SemiOften update hour (semi_update_hour): " + str(staticvars['semi_update_hour']))
+    lines.append("Last SemiOften update minutes (semi_update_minute): " + str(staticvars['semi_update_minute']))
+    lines.append("Last Daily update hour (daily_update_hour): " + str(staticvars['daily_update_hour']))
+    lines.append("Last Daily update minutes (daily_update_minute): " + str(staticvars['daily_update_minute']))
+    lines.append("Update interval (interval): " + str(staticvars['interval']))
+    lines.append("Type of next update (nextupdate): " + str(staticvars['nextupdate']))
+    lines.append("Time till next update (updatemin): " + str(staticvars['updatemin']))
+    lines.append("Internet Upload speed (speed_up): " + str(staticvars['speed_up']))
+    lines.append("Internet Download speed (speed_down): " + str(staticvars['speed_down']))
+    lines.append("Internet Ping (ping): " + str(staticvars['ping']))
+    lines.append("Apache Service Status (apache_stat): " + str(staticvars['apache_stat']))
+    lines.append("SSL Service Status (ssl_stat): " + str(staticvars['ssl_stat']))
+    lines.append("FTP Service Status (ftp_stat): " + str(staticvars['ftp_stat']))
+    lines.append("Veldkamp-Mainframe NAS Server reachable? (vmf_stat): " + str(staticvars['vmf_stat']))
+    for interface, rates in staticvars.get('net_rates', {}).items():
+        lines.append("Traffic {} (net_rates): {}/s, {:.0f} packets/s in, {:.0f} out".format(interface, trafficText(rates), rates[2], rates[3]))
+    lines.append("Ethernet MAC Address (eth_bssid): " + str(staticvars['eth_bssid']))
+    lines.append("Wifi MAC Address (wifi_bssid): " + str(staticvars['wifi_bssid']))
+    lines.append("History (history): {} metrics, {} samples each, {} bytes".format(len(history), history_size, sum(ring.samples.itemsize * ring.capacity for ring in history.values())))
+    lines.append("Metric log (metriclogs): " + ', '.join("{} {} records".format(group, len(log)) for group, log in metriclogs.items()))
+    lines.append("Last frame (last_fields/cells/bytes): {} fields, {} cells, {} bytes".format(framestats['last_fields'], framestats['last_cells'], framestats['last_bytes']))
+    lines.append("Version (__version__): " + str(__version__))
+    lines.append("Testmode (testmode): " + str(testmode))
+    #lines.append(": " + str(staticvars['']))
+
+    ## More info than fits on the little screen, so it's shown a page at a time
+    height, width = monitor.getmaxyx()
+    pagesize = height - 4
+    for start in range(0, len(lines), pagesize):
+        clearScreen(monitor)
+        for linenum, line in enumerate(lines[start:start + pagesize], 2):
+            monitor.addnstr(linenum,0,line,width - 1)
+        if start + pagesize < len(lines):
+            monitor.addstr(height - 1,0,"-- Press any key for more --", curses.A_BOLD)
+            monitor.getkey()
 
 def fillscreen(monitor): ## Fill the screen with #, have a border of *
     '''statmon.py fillscreen(monitor) documentation:
     This is a test function, it fills the screen with a 38x58 grid of
     hashtags, with a border of asterisks.'''
-    monitor.clear()
+    clearScreen(monitor)
     try:
         monitor.addstr(0,0,60*'*')
         for i in range(38):
@@ -1209,74 +3771,71 @@ def fillscreen(monitor): ## Fill the screen with #, have a border of *
     except curses.error: ## Because the screen in entirely filled, and the cursor has no space
         pass             ## to go to. This will return as error. Ignore it.
     
-def timeCalculator(current_hour, current_min, event_hour, event_min, time_passed):
-    '''timeCalculator(current_hour, current_min, event_hour, event_min, time_passed): Documentation
-    Sounds a whole lot more impressive than it is. Checks whether a certain time has passed between
-    a certain time (event time) and the current time.
-    All variables are required, all int. time_passed is given in minutes, one day is 1440 minutes.
-    Returns False is time has not passed. Returns True if time has passed. Returns False upon error
-    time_passed will need to be less than a day, as this condition will never be met
-    Examp: current_time 00:02 (2) and event_time 00:01 (1) yesterday. 1441 minutes have passed, but 2-1 = 1'''
-    try:
-        current_hour = int(current_hour)
-        current_min = int(current_min)
-        event_hour = int(event_hour)
-        event_min = int(event_min)
-        time_passed = int(time_passed)
-    except ValueError:
-        return False
-    current_time = current_hour * 60 + current_min
-    event_time = event_hour * 60 + event_min
-    if current_time < event_time:
-        current_time += 1440
-    if current_time - event_time > time_passed:
-        return True
+### Main
+## Only start the interface when this file is run, not when it's imported (by the benchmarks, for example)
+if __name__ == '__main__':
+    cmdargs = argv
+    metricsmode = aggregatormode = False
+    for cmdarg in cmdargs[1:]:
+        if cmdarg in ('debug', 'devel', 'test', 'testmode', 'dbm'):
+            testmode = True
+        elif cmdarg == 'async':
+            asyncmode = True
+        elif cmdarg.startswith('agent='):
+            host, port = cmdarg[len('agent='):], None
+            if host.startswith('[') and ']' in host: ## [IPv6 address]:port
+                host, port = host[1:].split(']', 1)
+                port = (port[1:] if port.startswith(':') else port) or None
+            elif host.count(':') == 1: ## More than one is an IPv6 address without a port
+                host, port = host.rsplit(':', 1)
+            if port != None:
+                fleet_port = portArgument(cmdarg, port)
+            agentaddress = (host, fleet_port)
+        elif cmdarg == 'aggregator' or cmdarg.startswith('aggregator='):
+            if '=' in cmdarg:
+                fleet_port = portArgument(cmdarg, cmdarg.split('=', 1)[1])
+            aggregatormode = True
+        elif cmdarg == 'metrics' or cmdarg.startswith('metrics='):
+            if '=' in cmdarg:
+                metrics_port = portArgument(cmdarg, cmdarg.split('=', 1)[1])
+            metricsmode = True
+
+    print(10*' ' + " >>>>> RPI Server Status Monitor <<<<< " + 10*' ' + '\n')
+    print(10*' ' + "   >>> statmon.py V{0}, JTC 2019 <<<   ".format(__version__) + 10*' ')
+    if testmode:
+        print("Developer mode initialised")
+    if asyncmode:
+        print("Asyncio mode initialised")
+    if metricsmode:
+        try:
+            startMetricsServer()
+        except OSError as e:
+            print("Metrics server could not be started on port {}: {}".format(metrics_port, e))
+        else:
+            print("Metrics served on port {}".format(metrics_port))
+    if agentaddress != None:
+        ## No screen at all, the metrics go to the aggregator
+        print("Agent initialised, sending to {}:{}".format(*agentaddress))
+        try:
+            agentLoop()
+        except KeyboardInterrupt:
+            pass
     else:
-        return False
+        print("Initialising Terminal User Interface...")
 
-def timeCalTheSecond(current_hour, current_min, event_hour, event_min, until_time):
-    '''timeCalTheSecond(current_hour, current_min, event_hour, event_min, until_time): Documentation
-    Another timeCalculator function. This one calculates the time left until a certain time:
-    All variables are required, all int. until_time is given in minutes.
-    current_time is obvious, event_time is when the last thing happened, until_time is the time to wait'''
-    try:
-        current_hour = int(current_hour)
-        current_min = int(current_min)
-        event_hour = int(event_hour)
-        event_min = int(event_min)
-        until_time = int(until_time)
-    except ValueError:
-        return False
-    current_time = 60 * current_hour + current_min
-    event_time = 60 * event_hour + event_min
-    next_time = event_time + until_time
-    if until_time < current_time:
-        until_time += 1440
-    time_left = next_time - current_time
-    return time_left
-
-### Main
-cmdargs = argv
-if len(cmdargs) > 1:
-    if cmdargs[1] in ('debug', 'devel', 'test', 'testmode', 'dbm'):
-        testmode = True
-
-print(10*' ' + " >>>>> RPI Server Status Monitor <<<<< " + 10*' ' + '\n')
-print(10*' ' + "   >>> statmon.py V{0}, JTC 2019 <<<   ".format(__version__) + 10*' ')
-if testmode:
-    print("Developer mode initialised")
-print("Initialising Terminal User Interface...")
-
-## Main program loop
-try:
-    curses.wrapper(main)
-except Exception as e:
-    ## Wrapper should normally do this itself, but just in case
-    curses.nocbreak()
-    curses.echo()
-    curses.endwin()
-    print(">>> Fatal error, restoring terminal")
-    print(">>> The following exception was caught:")
-    raise ## Re-raise the exception after the terminal has been restored.
+        ## Main program loop
+        try:
+            curses.wrapper(aggregatorMain if aggregatormode else main)
+        except Exception as e:
+            ## Wrapper should normally do this itself, but just in case
+            curses.nocbreak()
+            curses.echo()
+            curses.endwin()
+            print(">>> Fatal error, restoring terminal")
+            print(">>> The following exception was caught:")
+            raise ## Re-raise the exception after the terminal has been restored.
+        finally:
+            cancelSpeed() ## Don't keep the worker pool (and the exit) waiting for a running speed test
+            closeMetricLogs() ## Write out what's left of the metric history
 
 ### End Main